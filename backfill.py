@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史报告批量回补
+
+为一个日期区间内的每个交易日基于历史数据生成复盘报告。各交易日在线程池中并发生成，
+共用同一个 AI 模型管理器、响应缓存和历史序列，并按 AI 模型和 AkShare 接口分别限制并发数。
+
+进度记录在检查点文件中，每完成一天立即写入：中断后重新运行会跳过已完成的交易日。
+检查点同时记录生成时的提示词指纹，修改提示词后重新运行会自动重新生成全部交易日。
+
+用法: python backfill.py 2026-09-01 2026-09-30 [--workers 4] [--llm-concurrency "Gemini=2,DeepSeek=4"]
+                        [--source-concurrency "stock_board_industry_hist_em=4"] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+import metrics
+from concurrency_limits import ConcurrencyLimiter, parse_limits
+from logger_config import setup_logger, get_log_file_path, get_metrics_file_path
+from metrics import span
+
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+# 未配置时每个 AI 模型、每个 AkShare 接口同时进行的调用数
+DEFAULT_LLM_CONCURRENCY = 2
+DEFAULT_SOURCE_CONCURRENCY = 2
+
+
+def prompt_fingerprint(generator) -> str:
+    """报告提示词模板及生成方式的指纹，任何一项变化都意味着已有报告需要重新生成"""
+    import generate_report
+    
+    material = json.dumps([
+        generate_report.SYSTEM_INSTRUCTION,
+        generate_report.REPORT_INSTRUCTIONS,
+        generate_report.SECTION_INSTRUCTIONS,
+        generate_report.DATA_TABLE_INSTRUCTIONS,
+        generate_report.REPORT_SECTIONS,
+        generator.prompt_mode,
+        generator.prompt_token_budget,
+        generator.report_mode,
+        generator.data_tables,
+    ], ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:12]
+
+
+def build_limiter(spec: Optional[str], limits_var: str, default_var: str, default: int) -> ConcurrencyLimiter:
+    """环境变量配置的并发上限，命令行参数优先；都未配置默认上限时使用 default"""
+    limiter = ConcurrencyLimiter.from_env(limits_var, default_var)
+    if spec:
+        limiter.limits.update(parse_limits(spec))
+    if limiter.default is None:
+        limiter.default = default
+    return limiter
+
+
+class BackfillCheckpoint:
+    """回补进度检查点（JSON），每个交易日完成后原子写入"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except FileNotFoundError:
+            self.data = {}
+        except ValueError:
+            print(f"[WARN] ⚠️ 检查点文件损坏，将重新开始: {path}")
+            self.data = {}
+        self.data.setdefault('days', {})
+    
+    def is_done(self, trade_date: str, fingerprint: str) -> bool:
+        """该交易日已用相同的提示词成功生成，且报告文件仍存在"""
+        entry = self.data['days'].get(trade_date)
+        return bool(
+            entry and entry.get('status') == 'done' and entry.get('fingerprint') == fingerprint
+            and os.path.exists(entry.get('file', ''))
+        )
+    
+    def record(self, trade_date: str, **entry):
+        entry['updated_at'] = datetime.now(BEIJING_TZ).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self.data['days'][trade_date] = entry
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+class ReportBackfill:
+    """按日期区间并发生成历史报告"""
+    
+    def __init__(
+        self,
+        start_date: str,
+        end_date: str,
+        workers: Optional[int] = None,
+        output_dir: str = "reports",
+        checkpoint_path: Optional[str] = None,
+        llm_limiter: Optional[ConcurrencyLimiter] = None,
+        source_limiter: Optional[ConcurrencyLimiter] = None,
+        use_warehouse: bool = True,
+        reuse_archived: bool = True,
+        force: bool = False
+    ):
+        """
+        Args:
+            start_date: 开始日期 YYYY-MM-DD
+            end_date: 结束日期 YYYY-MM-DD（含）
+            workers: 同时生成的交易日数，默认读取 BACKFILL_WORKERS（默认 4）
+            output_dir: 报告输出目录
+            checkpoint_path: 检查点文件，默认读取 BACKFILL_CHECKPOINT（默认 data/backfill_checkpoint.json）
+            llm_limiter: 各 AI 模型的并发上限
+            source_limiter: 各 AkShare 接口的并发上限
+            use_warehouse: 是否读取并归档到历史数据仓库
+            reuse_archived: 仓库中已有当日完整数据时是否直接使用（否则重新从历史接口获取）
+            force: 忽略检查点，重新生成全部交易日
+        """
+        from data_cache import DataFrameCache
+        from historical_data import make_source
+        
+        self.start_date = start_date
+        self.end_date = end_date
+        self.workers = workers or int(os.getenv('BACKFILL_WORKERS', '4'))
+        self.output_dir = output_dir
+        self.checkpoint = BackfillCheckpoint(
+            checkpoint_path or os.getenv('BACKFILL_CHECKPOINT', os.path.join('data', 'backfill_checkpoint.json'))
+        )
+        self.llm_limiter = llm_limiter or build_limiter(
+            None, 'AI_PROVIDER_CONCURRENCY', 'AI_MAX_CONCURRENCY', DEFAULT_LLM_CONCURRENCY
+        )
+        self.source_limiter = source_limiter or build_limiter(
+            None, 'AKSHARE_CONCURRENCY', 'AKSHARE_MAX_CONCURRENCY', DEFAULT_SOURCE_CONCURRENCY
+        )
+        self.reuse_archived = reuse_archived
+        self.force = force
+        
+        self.warehouse = None
+        if use_warehouse:
+            from data_warehouse import MarketWarehouse
+            
+            self.warehouse = MarketWarehouse()
+        self.source = make_source(start_date, end_date, cache=DataFrameCache(), limiter=self.source_limiter)
+        self._ai_manager = None
+        self._ai_lock = threading.Lock()
+    
+    @property
+    def ai_manager(self):
+        """所有交易日共用的多模型管理器（连接池、响应缓存和并发上限）"""
+        with self._ai_lock:
+            if self._ai_manager is None:
+                from multi_model_client import MultiModelManager
+                
+                self._ai_manager = MultiModelManager(limiter=self.llm_limiter)
+            return self._ai_manager
+    
+    def _generator(self, trade_date: Optional[str] = None):
+        from generate_report import AStockReportGenerator
+        from historical_data import HistoricalDataFetcher
+        
+        fetcher = None
+        if trade_date is not None:
+            fetcher = HistoricalDataFetcher(
+                trade_date, self.source, warehouse=self.warehouse, reuse_archived=self.reuse_archived
+            )
+        # 多个交易日同时生成，不使用流式输出到控制台
+        return AStockReportGenerator(
+            stream=False, output_dir=self.output_dir, ai_manager=self.ai_manager,
+            data_fetcher=fetcher, warehouse=self.warehouse
+        )
+    
+    def trading_days(self) -> List[str]:
+        """区间内的交易日：以指数日线为准，获取失败时使用工作日"""
+        try:
+            days = self.source.trading_days()
+            if days:
+                return days
+        except Exception as e:
+            print(f"[WARN] ⚠️ 获取交易日历失败，按工作日回补: {e}")
+        day = datetime.strptime(self.start_date, "%Y-%m-%d")
+        end = datetime.strptime(self.end_date, "%Y-%m-%d")
+        days = []
+        while day <= end:
+            if day.weekday() < 5:
+                days.append(day.strftime("%Y-%m-%d"))
+            day += timedelta(days=1)
+        return days
+    
+    def run_day(self, trade_date: str, fingerprint: str) -> Dict:
+        """生成并保存一个交易日的报告，结果写入检查点"""
+        with span('backfill.day', trade_date=trade_date) as s:
+            try:
+                generator = self._generator(trade_date)
+                content = generator.generate_report(trade_date)
+                filepath = generator.save_report(content)
+            except Exception as e:
+                self.checkpoint.record(trade_date, status='failed', fingerprint=fingerprint,
+                                       error=f"{type(e).__name__}: {e}"[:300], seconds=round(s.elapsed(), 1))
+                raise
+            verification = generator.verification or {}
+            entry = {
+                'status': 'done',
+                'fingerprint': fingerprint,
+                'file': filepath,
+                'chars': len(content),
+                'issues': len(verification.get('issues', [])),
+                'seconds': round(s.elapsed(), 1),
+            }
+            s.set(chars=entry['chars'])
+        self.checkpoint.record(trade_date, **entry)
+        return entry
+    
+    def run(self) -> Dict[str, int]:
+        """
+        回补区间内所有未完成的交易日
+        
+        Returns:
+            {'done': 成功数, 'skipped': 跳过数, 'failed': 失败数}
+        """
+        fingerprint = prompt_fingerprint(self._generator())
+        with span('backfill.calendar'):
+            days = self.trading_days()
+        pending = [day for day in days if self.force or not self.checkpoint.is_done(day, fingerprint)]
+        counts = {'done': 0, 'skipped': len(days) - len(pending), 'failed': 0}
+        
+        print("\n" + "=" * 60)
+        print(f"📚 回补 {self.start_date} ~ {self.end_date}: 共 {len(days)} 个交易日，"
+              f"待生成 {len(pending)} 个（已完成 {counts['skipped']} 个），{self.workers} 个并发")
+        print(f"   提示词指纹: {fingerprint} | 检查点: {self.checkpoint.path}")
+        print("=" * 60)
+        if not pending:
+            return counts
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='backfill')
+        try:
+            futures = {executor.submit(self.run_day, day, fingerprint): day for day in pending}
+            for future in as_completed(futures):
+                day = futures[future]
+                try:
+                    entry = future.result()
+                    counts['done'] += 1
+                    print(f"[INFO] 📄 {day} 完成 ({entry['seconds']:.1f}秒，{entry['chars']} 字符): {entry['file']}"
+                          f" [{counts['done'] + counts['failed']}/{len(pending)}]")
+                except Exception as e:
+                    counts['failed'] += 1
+                    print(f"[ERROR] ❌ {day} 生成失败: {e} [{counts['done'] + counts['failed']}/{len(pending)}]")
+        except KeyboardInterrupt:
+            print("\n⏹️ 已中断，已完成的交易日已记录在检查点中，重新运行即可继续")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        return counts
+    
+    def close(self):
+        if self.warehouse is not None:
+            self.warehouse.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史报告批量回补")
+    parser.add_argument('start', help="开始日期 YYYY-MM-DD")
+    parser.add_argument('end', nargs='?', help="结束日期 YYYY-MM-DD（含），默认与开始日期相同")
+    parser.add_argument('--workers', type=int, help="同时生成的交易日数，默认读取 BACKFILL_WORKERS（默认 4）")
+    parser.add_argument('--llm-concurrency', help=f'各 AI 模型的并发上限，如 "Gemini=2,DeepSeek=4"（未配置的模型默认 {DEFAULT_LLM_CONCURRENCY}）')
+    parser.add_argument('--source-concurrency', help=f'各 AkShare 接口的并发上限（未配置的接口默认 {DEFAULT_SOURCE_CONCURRENCY}）')
+    parser.add_argument('--output-dir', default='reports', help="报告输出目录")
+    parser.add_argument('--checkpoint', help="检查点文件，默认读取 BACKFILL_CHECKPOINT（默认 data/backfill_checkpoint.json）")
+    parser.add_argument('--force', action='store_true', help="忽略检查点，重新生成全部交易日")
+    parser.add_argument('--refetch', action='store_true', help="不直接使用数据仓库中归档的当日数据，重新从历史接口获取")
+    parser.add_argument('--no-warehouse', action='store_true', help="不读取也不写入历史数据仓库")
+    args = parser.parse_args()
+    
+    end = args.end or args.start
+    for value in (args.start, end):
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            parser.error(f"日期格式应为 YYYY-MM-DD: {value}")
+    if end < args.start:
+        parser.error("结束日期早于开始日期")
+    
+    load_dotenv()
+    setup_logger(log_file=get_log_file_path())
+    metrics.configure(get_metrics_file_path())
+    
+    backfill = ReportBackfill(
+        args.start, end,
+        workers=args.workers,
+        output_dir=args.output_dir,
+        checkpoint_path=args.checkpoint,
+        llm_limiter=build_limiter(args.llm_concurrency, 'AI_PROVIDER_CONCURRENCY', 'AI_MAX_CONCURRENCY',
+                                  DEFAULT_LLM_CONCURRENCY),
+        source_limiter=build_limiter(args.source_concurrency, 'AKSHARE_CONCURRENCY', 'AKSHARE_MAX_CONCURRENCY',
+                                     DEFAULT_SOURCE_CONCURRENCY),
+        use_warehouse=not args.no_warehouse,
+        reuse_archived=not args.refetch,
+        force=args.force
+    )
+    try:
+        with span('backfill.run') as s:
+            counts = backfill.run()
+            s.set(**counts)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    finally:
+        metrics.print_summary()
+        backfill.close()
+    
+    print(f"\n✅ 回补完成: 生成 {counts['done']} 个，跳过 {counts['skipped']} 个，失败 {counts['failed']} 个 "
+          f"(耗时 {s.duration:.1f}秒)")
+    if counts['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告 HTML 渲染基准
+
+对比：每次新建转换器并拼接样式（旧实现）、复用转换器、命中渲染缓存。
+
+用法: python benchmarks/bench_html_render.py [--sections 40] [--rows 30] [--repeat 5]
+"""
+
+import argparse
+import random
+import tempfile
+
+from common import timeit, print_results
+
+import markdown
+
+from html_renderer import HtmlRenderer, HTML_HEAD, HTML_TAIL, REPORT_CSS, MARKDOWN_EXTENSIONS
+
+
+def build_report(sections: int, rows: int, seed: int = 7) -> str:
+    """生成包含大量章节和表格的模拟报告"""
+    rng = random.Random(seed)
+    lines = ["# A股晚间复盘报告（基准测试）", ""]
+    for i in range(1, sections + 1):
+        lines += [f"## {i}. 章节 {i}", "", f"上证指数收于 {rng.uniform(2800, 3600):.2f} 点，"
+                  f"涨跌幅 **{rng.uniform(-3, 3):+.2f}%**，两市成交额 {rng.uniform(6000, 15000):.0f} 亿元。", ""]
+        lines += ["| 排名 | 板块 | 涨跌幅 | 领涨股 |", "|---|---|---|---|"]
+        lines += [f"| {r} | 板块{r} | {rng.uniform(-10, 10):+.2f}% | 股票{r} |" for r in range(1, rows + 1)]
+        lines += ["", "> 风险提示：以上内容仅供参考。", "", "- 要点一\n- 要点二\n- 要点三", ""]
+    return "\n".join(lines)
+
+
+def legacy_render(text: str) -> str:
+    """旧实现：每次调用都新建转换器并格式化整页样式"""
+    body = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<style>{REPORT_CSS}</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="报告 HTML 渲染基准")
+    parser.add_argument('--sections', type=int, default=40, help="章节数")
+    parser.add_argument('--rows', type=int, default=30, help="每个表格的行数")
+    parser.add_argument('--repeat', type=int, default=5, help="计时次数")
+    args = parser.parse_args()
+    
+    report = build_report(args.sections, args.rows)
+    print(f"报告大小: {len(report.encode('utf-8')) / 1024:.1f} KB")
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        reused = HtmlRenderer(cache_dir='')
+        cached = HtmlRenderer(cache_dir=cache_dir)
+        cached.render(report)
+        disk_only = HtmlRenderer(cache_dir=cache_dir, memory_entries=0)
+        
+        results = {
+            '每次新建转换器': timeit(lambda: legacy_render(report), args.repeat),
+            '复用转换器': timeit(lambda: HTML_HEAD + reused.convert(report) + HTML_TAIL, args.repeat),
+            '磁盘缓存命中': timeit(lambda: disk_only.render(report), args.repeat),
+            '内存缓存命中': timeit(lambda: cached.render(report), args.repeat),
+        }
+    print_results("HTML 渲染耗时", results)
+
+
+if __name__ == "__main__":
+    main()
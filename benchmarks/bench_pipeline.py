@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告流程端到端基准
+
+用合成数据覆盖流程中由本项目代码完成的各步骤（不访问网络）：
+市场统计（5k/50k 行全市场行情）、板块与资金流向 TOP-N、提示词格式化与构建、
+10KB–1MB 报告的 HTML 渲染，以及邮件 MIME 组装。
+
+结果保存在 .benchmarks/pipeline/，默认与上一次结果对比，变慢超过阈值时以非零状态退出。
+
+用法: python benchmarks/bench_pipeline.py [--rows 5000 50000] [--repeat 5] [--only 关键字]
+                                         [--baseline 文件] [--threshold 0.1] [--no-save]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from unittest import mock
+
+from common import (
+    timeit, print_results, quiet, save_results, load_results, previous_results, compare_results
+)
+
+# 提示词构建需要至少一个模型客户端（只读取模型名称，不会发起请求）
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+import numpy as np
+import pandas as pd
+
+from bench_html_render import build_report
+from board_classifier import BoardClassifier
+from data_cache import DataFrameCache
+from fetch_data import AStockDataFetcher
+from generate_report import AStockReportGenerator
+from html_renderer import HtmlRenderer
+from llm_cache import LLMResponseCache
+from market_breadth import BreadthEngine
+from market_snapshot import MarketSnapshot
+from send_email import EmailSender
+
+# 报告大小 -> 章节数（每章含 30 行表格，约 1.3KB）
+REPORT_SIZES = {'10KB': 8, '100KB': 75, '1MB': 770}
+
+
+def code_pool():
+    """
+    合成行情的代码池及抽样权重
+    
+    各板块按代码前三位取全部 1000 个代码，主板占 5/8，创业板、科创板、北交所各占 1/8；
+    不重复抽样，保证代码唯一且为 6 位（板块识别依赖前三位）。
+    """
+    boards = [
+        (5, [*range(600, 610), *range(0, 10)]),  # 主板
+        (1, [300, 301, 302]),  # 创业板
+        (1, [688, 689]),  # 科创板
+        (1, [*range(830, 840), *range(870, 880), *range(430, 440), 920]),  # 北交所
+    ]
+    pool, weights = [], []
+    for share, prefixes in boards:
+        codes = np.concatenate([np.arange(prefix * 1000, prefix * 1000 + 1000) for prefix in prefixes])
+        pool.append(codes)
+        weights.append(np.full(len(codes), share / len(codes)))
+    weights = np.concatenate(weights)
+    return np.concatenate(pool), weights / weights.sum()
+
+
+def synthetic_spot(rows: int, seed: int = 7) -> pd.DataFrame:
+    """生成与 stock_zh_a_spot_em 列结构相同的全市场行情表"""
+    rng = np.random.default_rng(seed)
+    pool, weights = code_pool()
+    if rows > len(pool):
+        raise ValueError(f"行数不能超过代码池大小 {len(pool)}")
+    codes = [f"{code:06d}" for code in rng.choice(pool, rows, replace=False, p=weights)]
+    names = [f"{'ST' if i % 50 == 0 else ''}股票{i}" for i in range(rows)]
+    prev_close = rng.uniform(2, 200, rows).round(2)
+    pct = rng.normal(0, 3, rows).clip(-20, 20)
+    pct[rng.random(rows) < 0.02] = 10.0
+    last = (prev_close * (1 + pct / 100)).round(2)
+    return pd.DataFrame({
+        '代码': codes,
+        '名称': names,
+        '最新价': last,
+        '涨跌幅': pct.round(2),
+        '涨跌额': (last - prev_close).round(2),
+        '成交量': rng.uniform(1e4, 1e7, rows),
+        '成交额': rng.uniform(1e6, 1e10, rows),
+        '振幅': rng.uniform(0, 15, rows),
+        '最高': np.maximum(last, prev_close) * 1.01,
+        '最低': np.minimum(last, prev_close) * 0.99,
+        '今开': prev_close,
+        '昨收': prev_close,
+        '量比': rng.uniform(0.2, 5, rows),
+        '换手率': rng.uniform(0, 20, rows),
+        '总市值': rng.uniform(1e9, 1e12, rows),
+        '流通市值': rng.uniform(1e9, 1e12, rows),
+    })
+
+
+def synthetic_frames(rows: int, seed: int = 7) -> dict:
+    """各 AkShare 接口的合成返回值"""
+    rng = np.random.default_rng(seed)
+    spot = synthetic_spot(rows, seed)
+    sectors = 500
+    return {
+        'stock_zh_a_spot_em': spot,
+        'stock_board_industry_name_em': pd.DataFrame({
+            '板块名称': [f"板块{i}" for i in range(sectors)],
+            '涨跌幅': rng.normal(0, 2, sectors).round(2),
+            '领涨股票': [f"股票{i}" for i in range(sectors)],
+        }),
+        'stock_individual_fund_flow_rank': pd.DataFrame({
+            '名称': spot['名称'],
+            '代码': spot['代码'],
+            '主力净流入-净额': rng.normal(0, 2e8, rows),
+            '涨跌幅': spot['涨跌幅'],
+        }),
+    }
+
+
+class SyntheticAkShare:
+    """按接口名返回合成数据的 AkShare 替身"""
+    
+    def __init__(self, frames: dict):
+        self.frames = frames
+    
+    def __getattr__(self, endpoint):
+        frames = self.__dict__['frames']
+        if endpoint not in frames:
+            raise AttributeError(endpoint)
+        return lambda **kwargs: frames[endpoint]
+
+
+def make_fetcher(rows: int, cache_dir: str) -> AStockDataFetcher:
+    fetcher = AStockDataFetcher(cache=DataFrameCache(enabled=False))
+    fetcher._ak = SyntheticAkShare(synthetic_frames(rows))
+    fetcher.breadth_engine = BreadthEngine()
+    fetcher.board_classifier = BoardClassifier(cache_dir=cache_dir)
+    return fetcher
+
+
+def sample_market_data(fetcher: AStockDataFetcher) -> dict:
+    """用合成数据走一遍各数据源，得到 format_data_for_prompt 所需的 market_data"""
+    fetch = quiet(lambda: {
+        '获取时间': '2026-10-16 15:30:00',
+        '数据来源': 'AkShare (东方财富)',
+        '指数数据': {
+            name: {'收盘点位': 3000.0 + i, '涨跌幅': 0.5, '涨跌点': 15.0, '成交额': 4500.0, '成交量': 1e9,
+                   '昨收': 2985.0, '今开': 2990.0, '最高': 3010.0, '最低': 2980.0}
+            for i, name in enumerate(('上证指数', '深证成指', '创业板指', '科创50', '北证50'))
+        },
+        '市场统计': fetcher.fetch_market_stats(),
+        '板块数据': fetcher.fetch_sector_data(),
+        '资金流向': fetcher.fetch_capital_flow(),
+        '北向资金': {'沪股通': 12.3, '深股通': -4.5, '合计': 7.8},
+    })
+    return fetch()
+
+
+def run(args) -> dict:
+    results = {}
+    
+    def case(name, func):
+        if args.only and args.only not in name:
+            return
+        results[name] = timeit(quiet(func), args.repeat)
+        stats = results[name]
+        print(f"  {name}: 中位数 {stats['median']:.2f}ms")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        fetchers = {rows: make_fetcher(rows, os.path.join(tmp, f'board_{rows}')) for rows in args.rows}
+        for rows, fetcher in fetchers.items():
+            label = f"{rows // 1000}k" if rows >= 1000 else str(rows)
+            
+            def market_stats(fetcher=fetcher):
+                fetcher.snapshot = None
+                return fetcher.fetch_market_stats()
+            
+            def snapshot_only(fetcher=fetcher):
+                return MarketSnapshot.from_spot(fetcher._ak.frames['stock_zh_a_spot_em'])
+            
+            case(f"快照构建 {label}", snapshot_only)
+            case(f"fetch_market_stats {label}", market_stats)
+            case(f"fetch_sector_data {label}", fetcher.fetch_sector_data)
+            case(f"fetch_capital_flow {label}", fetcher.fetch_capital_flow)
+        
+        fetcher = fetchers[max(args.rows)]
+        market_data = sample_market_data(fetcher)
+        generator = quiet(lambda: AStockReportGenerator(
+            stream=False, data_cache=DataFrameCache(enabled=False),
+            llm_cache=LLMResponseCache(enabled=False), use_warehouse=False, output_dir=tmp
+        ))()
+        generator._data_fetcher = fetcher
+        quiet(lambda: generator.ai_manager)()
+        
+        case("format_data_for_prompt", lambda: fetcher.format_data_for_prompt(market_data))
+        generator.prompt_mode = 'compact'
+        case("_build_prompt_with_data compact", lambda: generator._build_prompt_with_data('2026-10-16', market_data))
+        generator.prompt_mode = 'full'
+        case("_build_prompt_with_data full", lambda: generator._build_prompt_with_data('2026-10-16', market_data))
+        
+        renderer = HtmlRenderer(cache_dir='', memory_entries=0)
+        sender = EmailSender(sender_email='bench@example.com', sender_password='benchmark', use_tls=False)
+        pages = {}
+        for size, sections in REPORT_SIZES.items():
+            report = build_report(sections, 30)
+            path = os.path.join(tmp, f"report_{size}.md")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(report)
+            
+            case(f"_markdown_to_html {size}", lambda report=report: renderer.render(report))
+            
+            # 只计 MIME 组装：HTML 预先渲染（上一个用例已单独计时），不经过共享渲染器及其 .cache/html 缓存
+            if args.only and args.only not in f"_create_message {size}":
+                continue
+            pages[report] = renderer.render(report)
+            with mock.patch('send_email.render_report_html', pages.__getitem__):
+                case(f"_create_message {size}", lambda report=report, path=path: EmailSender._flatten(
+                    sender._create_message(None, "基准测试", report, path)
+                ))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="报告流程端到端基准")
+    parser.add_argument('--rows', type=int, nargs='+', default=[5000, 50000], help="全市场行情行数")
+    parser.add_argument('--repeat', type=int, default=5, help="计时次数")
+    parser.add_argument('--only', help="只运行名称包含该关键字的用例")
+    parser.add_argument('--baseline', help="对比的基线结果文件，默认为上一次保存的结果")
+    parser.add_argument('--threshold', type=float, default=0.10, help="中位数变慢超过该比例视为回退")
+    parser.add_argument('--no-save', action='store_true', help="不保存本次结果")
+    args = parser.parse_args()
+    
+    print("运行基准用例...")
+    results = run(args)
+    print_results("报告流程耗时", results)
+    if not results:
+        print(f"\n❌ 没有名称包含 {args.only!r} 的用例")
+        sys.exit(1)
+    
+    saved = None if args.no_save else save_results('pipeline', results)
+    baseline = args.baseline or previous_results('pipeline', exclude=saved)
+    regressions = 0
+    if baseline:
+        regressions = compare_results(load_results(baseline), results, args.threshold)
+    if saved:
+        print(f"\n结果已保存: {os.path.relpath(saved)}")
+    if regressions:
+        print(f"\n❌ {regressions} 个用例出现性能回退")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
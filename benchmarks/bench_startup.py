@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准
+
+在子进程中以 python -X importtime 导入入口模块，输出累计导入耗时最长的模块，
+检查是否提前加载了 akshare、pandas 等重量级依赖，超出预算时以非零状态退出。
+
+用法: python benchmarks/bench_startup.py [--module main] [--budget-ms 500] [--top 15]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+from common import ROOT_DIR
+
+# 只应在首次实际使用时导入的模块
+HEAVY_MODULES = ('akshare', 'pandas', 'numpy', 'lxml', 'requests', 'markdown')
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def import_profile(module: str) -> list:
+    """
+    导入模块并解析 -X importtime 输出
+    
+    Returns:
+        [(模块名, 自身耗时 us, 累计耗时 us, 嵌套层级)]，按导入完成顺序
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument('--module', default='main', help="入口模块（默认 main）")
+    parser.add_argument('--budget-ms', type=float, default=500, help="导入耗时预算，单位毫秒")
+    parser.add_argument('--top', type=int, default=15, help="输出累计耗时最长的模块数")
+    args = parser.parse_args()
+    
+    rows = import_profile(args.module)
+    total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+    
+    print(f"导入 {args.module}: {total_ms:.1f}ms，共 {len(rows)} 个模块（预算 {args.budget_ms:.0f}ms）")
+    print(f"\n{'模块':<48}{'自身(ms)':>10}{'累计(ms)':>10}")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{'  ' * depth + name:<48}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+    
+    loaded = {name.split('.')[0] for name, _, _, _ in rows}
+    heavy = [name for name in HEAVY_MODULES if name in loaded]
+    if heavy:
+        print(f"\n⚠️ 启动时已加载重量级依赖: {', '.join(heavy)}")
+    
+    if total_ms > args.budget_ms:
+        print(f"\n❌ 导入耗时超出预算 ({total_ms:.1f}ms > {args.budget_ms:.0f}ms)")
+        sys.exit(1)
+    print("\n✅ 导入耗时在预算内")
+
+
+if __name__ == "__main__":
+    main()
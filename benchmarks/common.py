@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试公共工具
+
+各 bench_*.py 脚本可直接运行：python benchmarks/bench_xxx.py
+结果按提交保存在 .benchmarks/<基准名>/ 下，与上一次结果对比即可发现性能回退。
+"""
+
+import contextlib
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import statistics
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+# 让脚本可以直接导入项目根目录下的模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def timeit(func: Callable[[], object], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """
+    多次运行函数并统计耗时
+    
+    Args:
+        func: 无参数的被测函数
+        repeat: 计时次数
+        warmup: 不计时的预热次数
+    
+    Returns:
+        {'min', 'median', 'mean'}，单位毫秒
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+    }
+
+
+def print_results(title: str, results: Dict[str, Dict[str, float]]):
+    """以表格形式输出各用例的耗时"""
+    print(f"\n{title}")
+    if not results:
+        print("（没有运行任何用例）")
+        return
+    width = max(len(name) for name in results) + 2
+    print(f"{'用例':<{width}}{'最小(ms)':>12}{'中位数(ms)':>14}{'平均(ms)':>12}")
+    for name, stats in results.items():
+        print(f"{name:<{width}}{stats['min']:>12.2f}{stats['median']:>14.2f}{stats['mean']:>12.2f}")
+
+
+def quiet(func: Callable[[], object]) -> Callable[[], object]:
+    """屏蔽被测函数的控制台输出（数据获取等函数会逐行打印进度）"""
+    def wrapper():
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            return func()
+    return wrapper
+
+
+def git_revision() -> str:
+    """当前提交的短哈希，工作区有改动时加 -dirty 后缀"""
+    def git(*args) -> str:
+        return subprocess.run(['git', *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        revision = git('rev-parse', '--short', 'HEAD') or 'unknown'
+        if git('status', '--porcelain', '--untracked-files=no'):
+            revision += '-dirty'
+        return revision
+    except OSError:
+        return 'unknown'
+
+
+def results_dir(bench: str) -> str:
+    return os.path.join(ROOT_DIR, '.benchmarks', bench)
+
+
+def save_results(bench: str, results: Dict[str, Dict[str, float]]) -> str:
+    """
+    保存本次结果
+    
+    Returns:
+        结果文件路径（.benchmarks/<bench>/<时间>_<提交>.json）
+    """
+    revision = git_revision()
+    now = datetime.now()
+    record = {
+        'bench': bench,
+        'commit': revision,
+        'timestamp': now.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    os.makedirs(results_dir(bench), exist_ok=True)
+    path = os.path.join(results_dir(bench), f"{now:%Y%m%d-%H%M%S}_{revision}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_results(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def previous_results(bench: str, exclude: Optional[str] = None) -> Optional[str]:
+    """最近一次保存的结果文件（不含 exclude）"""
+    paths = sorted(glob.glob(os.path.join(results_dir(bench), '*.json')))
+    paths = [path for path in paths if path != exclude]
+    return paths[-1] if paths else None
+
+
+def compare_results(
+    baseline: Dict,
+    results: Dict[str, Dict[str, float]],
+    threshold: float = 0.10,
+    min_delta_ms: float = 0.5
+) -> int:
+    """
+    按中位数与基线对比并输出表格
+    
+    Args:
+        baseline: load_results 读取的基线记录
+        results: 本次结果
+        threshold: 变慢超过该比例视为回退
+        min_delta_ms: 变慢不足该毫秒数时忽略（亚毫秒级用例的计时抖动）
+    
+    Returns:
+        回退的用例数
+    """
+    print(f"\n对比基线: {baseline['commit']} ({baseline['timestamp']})，回退阈值 {threshold:.0%}")
+    if not results:
+        return 0
+    width = max(len(name) for name in results) + 2
+    print(f"{'用例':<{width}}{'基线(ms)':>12}{'本次(ms)':>12}{'变化':>10}")
+    regressions = 0
+    for name, stats in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print(f"{name:<{width}}{'-':>12}{stats['median']:>12.2f}{'新增':>10}")
+            continue
+        change = stats['median'] / old['median'] - 1 if old['median'] > 0 else 0.0
+        mark = ''
+        if change > threshold and stats['median'] - old['median'] >= min_delta_ms:
+            regressions += 1
+            mark = ' ⚠️'
+        print(f"{name:<{width}}{old['median']:>12.2f}{stats['median']:>12.2f}{change:>+10.1%}{mark}")
+    return regressions
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分板块涨跌停识别模块
+
+不同板块的涨跌幅限制不同：主板 10%，创业板/科创板 20%，北交所 30%，
+主板 ST 股 5%，新股上市初期不设涨跌幅限制。按昨收和最小价位（0.01 元）
+四舍五入计算每只股票的涨跌停价，再与最新价、最高价比较得到涨停、跌停和炸板。
+
+股票代码前缀与 ST 标记构成的板块索引每个交易日只计算一次，并缓存到本地磁盘。
+"""
+
+import os
+import pickle
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from data_cache import current_trade_date
+
+
+MAIN_BOARD, CHINEXT, STAR_MARKET, BSE = range(4)
+BOARD_NAMES = ('主板', '创业板', '科创板', '北交所')
+
+# 各板块涨跌幅限制
+BOARD_LIMITS = np.array([0.10, 0.20, 0.20, 0.30])
+ST_LIMIT = 0.05
+
+# 最小价位 0.01 元，比较时允许半个价位的误差（快照价格为 float32）
+TICK = 0.01
+HALF_TICK = TICK / 2
+
+
+def _build_prefix_table() -> np.ndarray:
+    """代码前三位 -> 板块编号"""
+    table = np.full(1000, MAIN_BOARD, dtype=np.int8)
+    table[[300, 301, 302]] = CHINEXT
+    table[[688, 689]] = STAR_MARKET
+    table[430:440] = BSE
+    table[830:840] = BSE
+    table[870:880] = BSE
+    table[920] = BSE
+    return table
+
+
+PREFIX_TABLE = _build_prefix_table()
+
+
+def round_to_tick(prices: np.ndarray) -> np.ndarray:
+    """按最小价位四舍五入（交易所规则为四舍五入，而非 NumPy 的银行家舍入）"""
+    return np.floor(prices / TICK + 0.5 + 1e-9) * TICK
+
+
+class BoardIndex:
+    """某个交易日的板块索引（按代码排序）"""
+    
+    def __init__(self, codes: np.ndarray, boards: np.ndarray, limits: np.ndarray, trade_date: str):
+        self.codes = codes
+        self.boards = boards
+        self.limits = limits
+        self.trade_date = trade_date
+    
+    @classmethod
+    def build(cls, codes: np.ndarray, names: np.ndarray, trade_date: str) -> 'BoardIndex':
+        """
+        由代码和名称构建索引
+        
+        Args:
+            codes: 数字形式的股票代码
+            names: 股票名称
+            trade_date: 交易日
+        """
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        names = names[order]
+        
+        boards = PREFIX_TABLE[np.clip(codes // 1000, 0, 999)]
+        limits = BOARD_LIMITS[boards].copy()
+        
+        names = names.astype(str)
+        is_st = np.char.find(np.char.upper(names), 'ST') >= 0
+        limits[is_st & (boards == MAIN_BOARD)] = ST_LIMIT
+        
+        # N 开头为上市首日，C 开头为创业板/科创板上市前五日，均不设涨跌幅限制
+        first = names.astype('<U1')
+        no_limit = (first == 'N') | ((first == 'C') & (boards != MAIN_BOARD))
+        limits[no_limit] = np.nan
+        
+        return cls(codes, boards, limits, trade_date)
+    
+    def align(self, codes: np.ndarray) -> Optional[np.ndarray]:
+        """
+        返回 codes 在索引中的位置
+        
+        Returns:
+            位置数组；存在索引中没有的代码时返回 None
+        """
+        if len(self.codes) == 0:
+            return None
+        positions = np.searchsorted(self.codes, codes)
+        np.clip(positions, 0, len(self.codes) - 1, out=positions)
+        if not np.array_equal(self.codes[positions], codes):
+            return None
+        return positions
+
+
+class BoardClassifier:
+    """分板块涨跌停识别器"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, trade_date: Optional[str] = None):
+        """
+        Args:
+            cache_dir: 板块索引缓存目录，默认读取 BOARD_INDEX_CACHE_DIR（默认 .cache/board_index）
+            trade_date: 固定的交易日（历史回补时使用），设置后索引只保存在内存中，不读写磁盘缓存
+        """
+        self.cache_dir = cache_dir or os.getenv('BOARD_INDEX_CACHE_DIR', os.path.join('.cache', 'board_index'))
+        self.trade_date = trade_date
+        self.index: Optional[BoardIndex] = None
+    
+    def _cache_path(self, trade_date: str) -> str:
+        return os.path.join(self.cache_dir, f"{trade_date}.pkl")
+    
+    def _load_index(self, trade_date: str) -> Optional[BoardIndex]:
+        """读取当日缓存的索引"""
+        try:
+            with open(self._cache_path(trade_date), 'rb') as f:
+                index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return index if isinstance(index, BoardIndex) else None
+    
+    def _save_index(self, index: BoardIndex):
+        """保存索引并清理以前交易日的缓存"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(index.trade_date)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.pkl') and name != os.path.basename(path):
+                    os.remove(os.path.join(self.cache_dir, name))
+        except OSError as e:
+            print(f"  ⚠️ 保存板块索引失败: {e}")
+    
+    def get_positions(self, codes: np.ndarray, names: np.ndarray) -> np.ndarray:
+        """
+        获取当日板块索引，并返回 codes 对应的位置
+        
+        优先使用内存中的索引，其次使用磁盘缓存；出现新代码时重新构建。
+        """
+        trade_date = self.trade_date or current_trade_date()
+        
+        if self.trade_date is None and (self.index is None or self.index.trade_date != trade_date):
+            self.index = self._load_index(trade_date)
+        
+        positions = self.index.align(codes) if self.index is not None else None
+        if positions is None:
+            self.index = BoardIndex.build(codes, names, trade_date)
+            if self.trade_date is None:
+                self._save_index(self.index)
+            positions = self.index.align(codes)
+        return positions
+    
+    def limit_flags(self, snapshot) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        逐只股票判断涨停、跌停、炸板
+        
+        Args:
+            snapshot: MarketSnapshot 全市场快照
+        
+        Returns:
+            (boards, limit_up, limit_down, broken, touched_up)，与快照行一一对应
+        """
+        codes = snapshot.code_numbers()
+        positions = self.get_positions(codes, snapshot.column('名称'))
+        boards = self.index.boards[positions]
+        limits = self.index.limits[positions]
+        
+        prev_close = snapshot.column('昨收').astype(np.float64)
+        price = snapshot.column('最新价').astype(np.float64)
+        high = snapshot.column('最高').astype(np.float64)
+        
+        # 去掉 float32 的尾数误差后再计算涨跌停价
+        prev_close = np.round(prev_close, 2)
+        up_price = round_to_tick(prev_close * (1 + limits))
+        down_price = round_to_tick(prev_close * (1 - limits))
+        
+        # 停牌（无最新价）、缺少昨收（涨跌停价为 0）及不设涨跌幅限制的股票比较结果均为 False
+        with np.errstate(invalid='ignore'):
+            valid = (prev_close > 0) & (price > 0)
+            touched_up = (high >= up_price - HALF_TICK) & (prev_close > 0)
+            limit_up = (price >= up_price - HALF_TICK) & valid
+            limit_down = (price <= down_price + HALF_TICK) & valid
+            broken = touched_up & ~limit_up & valid
+        return boards, limit_up, limit_down, broken, touched_up
+    
+    def classify(self, snapshot) -> Dict:
+        """
+        统计全市场及各板块的涨停、跌停、炸板家数
+        
+        Args:
+            snapshot: MarketSnapshot 全市场快照
+        
+        Returns:
+            {'涨停家数', '跌停家数', '炸板家数', '分板块': {板块: {...}}}
+        """
+        boards, limit_up, limit_down, broken, touched_up = self.limit_flags(snapshot)
+        
+        board_count = len(BOARD_NAMES)
+        totals = np.bincount(boards, minlength=board_count)
+        up_counts = np.bincount(boards[limit_up], minlength=board_count)
+        down_counts = np.bincount(boards[limit_down], minlength=board_count)
+        broken_counts = np.bincount(boards[broken], minlength=board_count)
+        
+        by_board = {}
+        for board, name in enumerate(BOARD_NAMES):
+            by_board[name] = {
+                '总家数': int(totals[board]),
+                '涨停': int(up_counts[board]),
+                '跌停': int(down_counts[board]),
+                '炸板': int(broken_counts[board]),
+            }
+        
+        touched = int(np.count_nonzero(touched_up))
+        return {
+            '涨停家数': int(up_counts.sum()),
+            '跌停家数': int(down_counts.sum()),
+            '炸板家数': int(broken_counts.sum()),
+            '封板率': f"{up_counts.sum() / touched * 100:.1f}%" if touched else '0.0%',
+            '分板块': by_board,
+        }
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发上限模块
+
+按名称（AI 模型、AkShare 接口）限制同时进行的调用数。多个报告并发生成时
+（如历史回补），所有线程共用同一个限制器，避免同一服务被同时打满而触发限流。
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """解析 "Gemini=2,DeepSeek=4" 形式的并发上限配置（名称不区分大小写）"""
+    limits = {}
+    for item in spec.split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip():
+            limits[name.strip().lower()] = int(value)
+    return limits
+
+
+class ConcurrencyLimiter:
+    """按名称分别计数的并发上限"""
+    
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default: Optional[int] = None):
+        """
+        Args:
+            limits: 名称 -> 同时进行的调用数上限
+            default: 未单独配置的名称的上限，为空时不限制
+        """
+        self.limits = {name.lower(): limit for name, limit in (limits or {}).items()}
+        self.default = default
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_env(cls, limits_var: str, default_var: str) -> 'ConcurrencyLimiter':
+        """
+        按环境变量创建
+        
+        Args:
+            limits_var: 各名称上限的环境变量，如 AI_PROVIDER_CONCURRENCY="Gemini=2,DeepSeek=4"
+            default_var: 默认上限的环境变量，未设置时不限制
+        """
+        default = os.getenv(default_var)
+        return cls(parse_limits(os.getenv(limits_var, '')), int(default) if default else None)
+    
+    def limit_for(self, name: str) -> Optional[int]:
+        limit = self.limits.get(name.lower(), self.default)
+        return limit if limit and limit > 0 else None
+    
+    def _semaphore(self, name: str) -> Optional[threading.BoundedSemaphore]:
+        limit = self.limit_for(name)
+        if limit is None:
+            return None
+        key = name.lower()
+        with self._lock:
+            semaphore = self._semaphores.get(key)
+            if semaphore is None:
+                semaphore = self._semaphores[key] = threading.BoundedSemaphore(limit)
+            return semaphore
+    
+    @contextmanager
+    def slot(self, name: str) -> Iterator[float]:
+        """
+        占用一个名额，未配置上限时直接执行
+        
+        用法:
+            with limiter.slot('Gemini') as waited:
+                ...  # waited 为排队等待的秒数
+        """
+        semaphore = self._semaphore(name)
+        if semaphore is None:
+            yield 0.0
+            return
+        start = time.perf_counter()
+        semaphore.acquire()
+        try:
+            yield time.perf_counter() - start
+        finally:
+            semaphore.release()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AkShare 原始数据本地缓存模块
+
+按 (接口名, 参数, 交易日) 将原始 DataFrame 以 pickle 格式缓存到本地磁盘，
+支持过期时间（TTL）、按总大小淘汰以及仅使用缓存的离线模式。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, Optional
+
+
+class CacheMissError(Exception):
+    """离线模式下缓存中没有所需数据"""
+
+
+def current_trade_date(now: Optional[datetime] = None) -> str:
+    """
+    获取当前对应的交易日（北京时间）
+    
+    开盘前（9:15 之前）及周末归属到上一个工作日。节假日不做处理，
+    节假日当天与上一交易日使用不同的缓存键，只会多请求一次。
+    
+    Returns:
+        str: 交易日，格式 YYYY-MM-DD
+    """
+    beijing_tz = timezone(timedelta(hours=8))
+    now = now or datetime.now(beijing_tz)
+    day = now.date()
+    if (now.hour, now.minute) < (9, 15):
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.strftime("%Y-%m-%d")
+
+
+def last_closed_trade_date(now: Optional[datetime] = None) -> str:
+    """
+    获取最近一个已收盘的交易日（北京时间）
+    
+    当前交易日 15:00 收盘前返回上一个工作日，此前获取的日线、北向资金等数据仍是盘中值。
+    
+    Returns:
+        str: 交易日，格式 YYYY-MM-DD
+    """
+    beijing_tz = timezone(timedelta(hours=8))
+    now = now or datetime.now(beijing_tz)
+    trade_date = current_trade_date(now)
+    if trade_date == now.strftime("%Y-%m-%d") and (now.hour, now.minute) < (15, 0):
+        return current_trade_date(now.replace(hour=0, minute=0))
+    return trade_date
+
+
+def _session_close(trade_date: str) -> float:
+    """交易日 15:00（北京时间）收盘的时间戳"""
+    beijing_tz = timezone(timedelta(hours=8))
+    close = datetime.strptime(trade_date, "%Y-%m-%d").replace(hour=15, tzinfo=beijing_tz)
+    return close.timestamp()
+
+
+class DataFrameCache:
+    """AkShare 原始数据缓存"""
+    
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        offline: Optional[bool] = None,
+        enabled: Optional[bool] = None,
+        trade_date: Optional[str] = None
+    ):
+        """
+        初始化缓存
+        
+        Args:
+            cache_dir: 缓存目录，默认读取 AKSHARE_CACHE_DIR（默认 .cache/akshare）
+            ttl: 缓存有效期（秒），默认读取 AKSHARE_CACHE_TTL（默认 4 小时）
+            max_bytes: 缓存总大小上限，默认读取 AKSHARE_CACHE_MAX_MB（默认 200MB）
+            offline: 离线模式，只从缓存读取，默认读取 AKSHARE_OFFLINE
+            enabled: 是否启用缓存，默认读取 AKSHARE_CACHE（默认开启）
+            trade_date: 固定使用的交易日（回放录制的数据时使用），默认按当前时间计算
+        """
+        self.cache_dir = cache_dir or os.getenv('AKSHARE_CACHE_DIR', os.path.join('.cache', 'akshare'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('AKSHARE_CACHE_TTL', str(4 * 3600)))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('AKSHARE_CACHE_MAX_MB', '200')) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        if offline is None:
+            offline = _env_flag('AKSHARE_OFFLINE', False)
+        self.offline = offline
+        if enabled is None:
+            enabled = _env_flag('AKSHARE_CACHE', True)
+        # 离线模式必须依赖缓存
+        self.enabled = enabled or offline
+        self.trade_date = trade_date
+        
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _key_path(self, endpoint: str, kwargs: Dict[str, Any], trade_date: str) -> str:
+        """生成缓存文件路径"""
+        args = json.dumps(kwargs, ensure_ascii=False, sort_keys=True, default=str)
+        digest = hashlib.sha1(f"{endpoint}|{args}".encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.cache_dir, trade_date, f"{endpoint}_{digest}.pkl")
+    
+    def get(self, endpoint: str, kwargs: Optional[Dict[str, Any]] = None, trade_date: Optional[str] = None):
+        """
+        读取缓存
+        
+        收盘前写入的缓存是盘中数据，收盘后即过期，不会在 TTL 内把盘中值当作收盘数据。
+        
+        Returns:
+            缓存的 DataFrame；未命中或已过期时返回 None（离线模式忽略过期时间）
+        """
+        import pandas as pd
+        
+        trade_date = trade_date or current_trade_date()
+        path = self._key_path(endpoint, kwargs or {}, trade_date)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        
+        if not self.offline:
+            now = time.time()
+            close = _session_close(trade_date)
+            if now - mtime > self.ttl or mtime < close <= now:
+                return None
+        
+        try:
+            df = pd.read_pickle(path)
+        except Exception as e:
+            print(f"  ⚠️ 缓存文件损坏，已忽略: {path} ({e})")
+            return None
+        
+        # 更新访问时间，供按大小淘汰时使用（LRU）
+        try:
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+        except OSError:
+            pass
+        return df
+    
+    def put(self, endpoint: str, df, kwargs: Optional[Dict[str, Any]] = None, trade_date: Optional[str] = None):
+        """写入缓存（先写临时文件再原子替换）"""
+        path = self._key_path(endpoint, kwargs or {}, trade_date or current_trade_date())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        
+        self._evict(keep=path)
+    
+    def get_or_fetch(self, endpoint: str, fetch: Callable[[], Any], kwargs: Optional[Dict[str, Any]] = None):
+        """
+        优先从缓存读取，未命中时调用 fetch 获取并写入缓存
+        
+        Args:
+            endpoint: AkShare 接口名
+            fetch: 实际请求数据的函数
+            kwargs: 接口参数（参与缓存键计算）
+        
+        Raises:
+            CacheMissError: 离线模式下缓存未命中
+        """
+        if not self.enabled:
+            return fetch()
+        
+        trade_date = self.trade_date or current_trade_date()
+        df = self.get(endpoint, kwargs, trade_date)
+        if df is not None:
+            self.hits += 1
+            print(f"  💾 命中缓存: {endpoint}")
+            return df
+        
+        self.misses += 1
+        if self.offline:
+            raise CacheMissError(f"离线模式下缓存中没有 {endpoint} ({trade_date}) 的数据")
+        
+        df = fetch()
+        try:
+            self.put(endpoint, df, kwargs, trade_date)
+        except Exception as e:
+            print(f"  ⚠️ 写入缓存失败: {endpoint} ({e})")
+        return df
+    
+    def _evict(self, keep: Optional[str] = None):
+        """缓存总大小超过上限时，按最近访问时间从旧到新删除（保留刚写入的 keep）"""
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith('.pkl'):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, path))
+                    total += stat.st_size
+            
+            if total <= self.max_bytes:
+                return
+            
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            
+            # 清理空的交易日目录
+            for name in os.listdir(self.cache_dir):
+                day_dir = os.path.join(self.cache_dir, name)
+                if os.path.isdir(day_dir) and not os.listdir(day_dir):
+                    os.rmdir(day_dir)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    """读取布尔型环境变量"""
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return value.lower() not in ('0', 'false', 'no', 'off')
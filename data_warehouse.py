@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史行情数据仓库
+
+将每次运行获取的 market_data 及全市场行情快照按交易日写入本地 SQLite。
+每个交易日是一个独立分区：重复运行只会替换当日数据，不会改动其他交易日。
+按 (序列, 交易日) 建立索引，读取 N 日数据时只查询需要的列。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from data_cache import current_trade_date
+
+
+INDEX_FIELDS = ('收盘点位', '涨跌幅', '涨跌点', '成交额', '成交量', '昨收', '今开', '最高', '最低')
+STATS_FIELDS = ('上涨家数', '下跌家数', '平盘家数', '总家数', '涨停家数', '跌停家数', '炸板家数')
+NORTH_FIELDS = ('沪股通', '深股通', '合计')
+# 历史日线序列的列；北向资金等单值序列的数值存放在 close 列
+HISTORY_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+SNAPSHOT_FIELDS = ('名称', '最新价', '涨跌幅', '成交量', '成交额', '最高', '最低', '今开', '昨收', '换手率', '流通市值')
+# 盘中轮询只记录发生变化的股票的这些列
+INTRADAY_FIELDS = ('最新价', '涨跌幅', '成交量', '成交额', '最高', '最低')
+INTRADAY_STATS_FIELDS = ('上涨家数', '下跌家数', '平盘家数', '涨停家数', '跌停家数', '炸板家数')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS market_data (
+    trade_date TEXT PRIMARY KEY,
+    fetched_at TEXT,
+    payload TEXT
+);
+CREATE TABLE IF NOT EXISTS index_daily (
+    trade_date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    {', '.join(f'"{field}" REAL' for field in INDEX_FIELDS)},
+    PRIMARY KEY (name, trade_date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS market_stats_daily (
+    trade_date TEXT PRIMARY KEY,
+    {', '.join(f'"{field}" INTEGER' for field in STATS_FIELDS)}
+);
+CREATE TABLE IF NOT EXISTS north_bound_daily (
+    trade_date TEXT PRIMARY KEY,
+    {', '.join(f'"{field}" REAL' for field in NORTH_FIELDS)}
+);
+CREATE TABLE IF NOT EXISTS sector_daily (
+    trade_date TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    "板块名称" TEXT,
+    "涨跌幅" REAL,
+    PRIMARY KEY (trade_date, direction, rank)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS capital_flow_daily (
+    trade_date TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    "股票代码" TEXT,
+    "股票名称" TEXT,
+    "金额" REAL,
+    "涨跌幅" REAL,
+    PRIMARY KEY (trade_date, direction, rank)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS spot_snapshot (
+    trade_date TEXT NOT NULL,
+    "代码" TEXT NOT NULL,
+    "名称" TEXT,
+    {', '.join(f'"{field}" REAL' for field in SNAPSHOT_FIELDS[1:])},
+    PRIMARY KEY (trade_date, "代码")
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_spot_snapshot_code ON spot_snapshot ("代码", trade_date);
+CREATE TABLE IF NOT EXISTS series_history (
+    series TEXT NOT NULL,
+    trade_date TEXT NOT NULL,
+    {', '.join(f'{field} REAL' for field in HISTORY_FIELDS)},
+    PRIMARY KEY (series, trade_date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS intraday_spot (
+    trade_date TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    "代码" TEXT NOT NULL,
+    {', '.join(f'"{field}" REAL' for field in INTRADAY_FIELDS)},
+    PRIMARY KEY (trade_date, "代码", ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS intraday_summary (
+    trade_date TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    {', '.join(f'"{field}" INTEGER' for field in INTRADAY_STATS_FIELDS)},
+    changed INTEGER,
+    events TEXT,
+    PRIMARY KEY (trade_date, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (
+    series TEXT PRIMARY KEY,
+    high_water TEXT NOT NULL,
+    synced_at TEXT
+);
+"""
+
+# 可通过 load_series 读取的序列及其分区之外的键列
+SERIES_KEYS = {
+    'index_daily': 'name',
+    'market_stats_daily': None,
+    'north_bound_daily': None,
+    'sector_daily': 'direction',
+    'capital_flow_daily': 'direction',
+    'spot_snapshot': '代码',
+}
+
+
+class MarketWarehouse:
+    """本地历史行情数据仓库"""
+    
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path: 数据库文件路径，默认读取 WAREHOUSE_PATH（默认 data/warehouse.sqlite）
+        """
+        self.db_path = db_path or os.getenv('WAREHOUSE_PATH', os.path.join('data', 'warehouse.sqlite'))
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._columns: Dict[str, List[str]] = {}
+    
+    def close(self):
+        """关闭数据库连接"""
+        self._conn.close()
+    
+    def _replace_partition(self, table: str, trade_date: str, rows: List[tuple], columns: Iterable[str]):
+        """替换某个交易日分区的全部数据（需在事务中调用）"""
+        columns = ['trade_date', *columns]
+        self._conn.execute(f"DELETE FROM {table} WHERE trade_date = ?", (trade_date,))
+        if rows:
+            quoted = ', '.join(f'"{c}"' for c in columns)
+            placeholders = ', '.join('?' * len(columns))
+            self._conn.executemany(
+                f"INSERT INTO {table} ({quoted}) VALUES ({placeholders})",
+                [(trade_date, *row) for row in rows]
+            )
+    
+    def append_market_data(self, market_data: Dict, trade_date: Optional[str] = None):
+        """
+        写入一次运行的 market_data
+        
+        Args:
+            market_data: fetch_all_data 的返回值
+            trade_date: 交易日，默认为当前交易日
+        """
+        trade_date = trade_date or current_trade_date()
+        
+        indices = market_data.get('指数数据') or {}
+        stats = market_data.get('市场统计') or {}
+        north = market_data.get('北向资金') or {}
+        sectors = market_data.get('板块数据') or {}
+        capital = market_data.get('资金流向') or {}
+        
+        with self._lock, self._conn:
+            # 市场统计为获取失败或不完整时的占位值（涨跌家数不可用）时不归档完整 market_data，
+            # 以后重新生成时重新获取，而不是复用占位值
+            if stats.get('总家数'):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO market_data (trade_date, fetched_at, payload) VALUES (?, ?, ?)",
+                    (trade_date, market_data.get('获取时间'), json.dumps(market_data, ensure_ascii=False))
+                )
+            
+            if indices:
+                self._replace_partition('index_daily', trade_date, [
+                    (name, *(data.get(field) for field in INDEX_FIELDS))
+                    for name, data in indices.items()
+                ], ['name', *INDEX_FIELDS])
+            
+            # 获取失败时的默认值（总家数为空）不写入，避免覆盖有效数据
+            if stats.get('总家数'):
+                self._replace_partition('market_stats_daily', trade_date, [
+                    tuple(stats.get(field) for field in STATS_FIELDS)
+                ], STATS_FIELDS)
+            
+            # 北向资金最新数据不是当前交易日时（带有 数据日期 标注）不归档到当前交易日
+            if any(north.get(field) for field in NORTH_FIELDS) and north.get('数据日期', trade_date) == trade_date:
+                self._replace_partition('north_bound_daily', trade_date, [
+                    tuple(north.get(field) for field in NORTH_FIELDS)
+                ], NORTH_FIELDS)
+            
+            if sectors.get('领涨板块') or sectors.get('领跌板块'):
+                rows = [
+                    ('领涨', rank, item['板块名称'], item['涨跌幅'])
+                    for rank, item in enumerate(sectors.get('领涨板块', []), 1)
+                ] + [
+                    ('领跌', rank, item['板块名称'], item['涨跌幅'])
+                    for rank, item in enumerate(sectors.get('领跌板块', []), 1)
+                ]
+                self._replace_partition('sector_daily', trade_date, rows, ['direction', 'rank', '板块名称', '涨跌幅'])
+            
+            if capital.get('净流入TOP10') or capital.get('净流出TOP10'):
+                rows = [
+                    ('净流入', rank, item['股票代码'], item['股票名称'], item['净流入'], item['涨跌幅'])
+                    for rank, item in enumerate(capital.get('净流入TOP10', []), 1)
+                ] + [
+                    ('净流出', rank, item['股票代码'], item['股票名称'], item['净流出'], item['涨跌幅'])
+                    for rank, item in enumerate(capital.get('净流出TOP10', []), 1)
+                ]
+                self._replace_partition(
+                    'capital_flow_daily', trade_date, rows,
+                    ['direction', 'rank', '股票代码', '股票名称', '金额', '涨跌幅']
+                )
+    
+    def append_snapshot(self, snapshot, trade_date: Optional[str] = None):
+        """
+        写入全市场行情快照
+        
+        Args:
+            snapshot: MarketSnapshot
+            trade_date: 交易日，默认为当前交易日
+        """
+        trade_date = trade_date or current_trade_date()
+        frame = snapshot.frame
+        fields = [field for field in SNAPSHOT_FIELDS if field in frame.columns]
+        
+        columns = [frame['代码'].astype(str).to_numpy()]
+        for field in fields:
+            series = frame[field]
+            if field == '名称':
+                columns.append(series.astype(str).to_numpy())
+            else:
+                # 去掉 float32 的尾数误差，NaN 写入为 NULL
+                values = series.astype('float64').round(4).to_numpy()
+                columns.append([None if v != v else float(v) for v in values])
+        
+        with self._lock, self._conn:
+            self._replace_partition('spot_snapshot', trade_date, list(zip(*columns)), ['代码', *fields])
+    
+    def append_intraday(self, ts: str, frame, stats: Dict, changed: int, events: Dict, trade_date: Optional[str] = None):
+        """
+        追加一次盘中轮询的结果（只追加，不替换已有数据）
+        
+        Args:
+            ts: 轮询时间 HH:MM:SS
+            frame: 发生变化的股票（包含 代码 及 INTRADAY_FIELDS 列的 DataFrame）
+            stats: 当前市场统计
+            changed: 变化的股票数
+            events: 本次检测到的事件（以 JSON 保存）
+            trade_date: 交易日，默认为当前交易日
+        """
+        trade_date = trade_date or current_trade_date()
+        fields = [field for field in INTRADAY_FIELDS if field in frame.columns]
+        
+        columns = [frame['代码'].astype(str).to_numpy()]
+        for field in fields:
+            values = frame[field].astype('float64').round(4).to_numpy()
+            columns.append([None if v != v else float(v) for v in values])
+        
+        quoted = ', '.join(f'"{c}"' for c in ['代码', *fields])
+        placeholders = ', '.join('?' * (len(fields) + 3))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO intraday_spot (trade_date, ts, {quoted}) VALUES ({placeholders})",
+                [(trade_date, ts, *row) for row in zip(*columns)]
+            )
+            stats_columns = ', '.join(f'"{field}"' for field in INTRADAY_STATS_FIELDS)
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO intraday_summary (trade_date, ts, {stats_columns}, changed, events) "
+                f"VALUES ({', '.join('?' * (len(INTRADAY_STATS_FIELDS) + 4))})",
+                (trade_date, ts, *(stats.get(field) for field in INTRADAY_STATS_FIELDS),
+                 changed, json.dumps(events, ensure_ascii=False))
+            )
+    
+    def _table_columns(self, table: str) -> List[str]:
+        """表的所有列名"""
+        if table not in self._columns:
+            rows = self._conn.execute(f"PRAGMA table_info({table})").fetchall()
+            self._columns[table] = [row[1] for row in rows]
+        return self._columns[table]
+    
+    def trade_dates(self, table: str = 'market_data', end_date: Optional[str] = None, days: Optional[int] = None) -> List[str]:
+        """返回已存储的交易日（升序）"""
+        if table not in SERIES_KEYS and table != 'market_data':
+            raise ValueError(f"未知的数据表: {table}")
+        sql = f"SELECT DISTINCT trade_date FROM {table}"
+        params: list = []
+        if end_date:
+            sql += " WHERE trade_date <= ?"
+            params.append(end_date)
+        sql += " ORDER BY trade_date DESC"
+        if days:
+            sql += " LIMIT ?"
+            params.append(days)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return sorted(row[0] for row in rows)
+    
+    def load_series(
+        self,
+        table: str,
+        days: int = 5,
+        columns: Optional[List[str]] = None,
+        key: Optional[str] = None,
+        end_date: Optional[str] = None
+    ):
+        """
+        读取最近 N 个交易日的某个序列
+        
+        Args:
+            table: 序列名，见 SERIES_KEYS
+            days: 交易日数量
+            columns: 需要的列（只查询这些列），默认全部
+            key: 键列取值，如 index_daily 的指数名称、spot_snapshot 的股票代码
+            end_date: 截止交易日（含），默认为最新
+        
+        Returns:
+            按交易日升序排列的 DataFrame
+        """
+        import pandas as pd
+        
+        if table not in SERIES_KEYS:
+            raise ValueError(f"未知的数据序列: {table}")
+        available = self._table_columns(table)
+        key_column = SERIES_KEYS[table]
+        
+        if columns:
+            unknown = [c for c in columns if c not in available]
+            if unknown:
+                raise ValueError(f"{table} 中没有列: {', '.join(unknown)}")
+            selected = list(dict.fromkeys(['trade_date', *([key_column] if key_column else []), *columns]))
+        else:
+            selected = available
+        
+        dates = self.trade_dates(table, end_date=end_date, days=days)
+        if not dates:
+            return pd.DataFrame(columns=selected)
+        
+        quoted = ', '.join(f'"{c}"' for c in selected)
+        sql = f"SELECT {quoted} FROM {table} WHERE trade_date BETWEEN ? AND ?"
+        params = [dates[0], dates[-1]]
+        if key is not None and key_column:
+            sql += f' AND "{key_column}" = ?'
+            params.append(key)
+        sql += " ORDER BY trade_date"
+        
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchall()
+        return pd.DataFrame(rows, columns=selected)
+    
+    def load_market_data(self, trade_date: str) -> Optional[Dict]:
+        """读取某个交易日归档的完整 market_data，未归档时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM market_data WHERE trade_date = ?", (trade_date,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def load_partition(self, table: str, trade_date: str, columns: Optional[List[str]] = None):
+        """
+        读取某个交易日分区的全部行
+        
+        Args:
+            table: 序列名，见 SERIES_KEYS
+            trade_date: 交易日
+            columns: 需要的列，默认全部
+        
+        Returns:
+            DataFrame（不含 trade_date 列），分区不存在时为空表
+        """
+        import pandas as pd
+        
+        if table not in SERIES_KEYS:
+            raise ValueError(f"未知的数据序列: {table}")
+        available = [c for c in self._table_columns(table) if c != 'trade_date']
+        selected = columns or available
+        unknown = [c for c in selected if c not in available]
+        if unknown:
+            raise ValueError(f"{table} 中没有列: {', '.join(unknown)}")
+        
+        quoted = ', '.join(f'"{c}"' for c in selected)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {quoted} FROM {table} WHERE trade_date = ?", (trade_date,)).fetchall()
+        return pd.DataFrame(rows, columns=selected)
+    
+    def high_water_mark(self, series: str) -> Optional[str]:
+        """某个历史序列已同步到的最新交易日"""
+        with self._lock:
+            row = self._conn.execute("SELECT high_water FROM sync_state WHERE series = ?", (series,)).fetchone()
+        return row[0] if row else None
+    
+    def merge_history(self, series: str, rows: List[tuple], synced_at: Optional[str] = None,
+                      closed_through: Optional[str] = None) -> int:
+        """
+        合并历史序列中比高水位更新的行，并推进高水位
+        
+        高水位只推进到 closed_through（最近一个已收盘的交易日）为止：盘中同步写入的
+        当日行不计入高水位，下次同步时会重新获取并覆盖，而不是把盘中值固定下来。
+        
+        Args:
+            series: 序列名，如 index:上证指数、north:沪股通
+            rows: (trade_date, open, high, low, close, volume, amount) 列表，缺失值为 None
+            synced_at: 同步时间
+            closed_through: 最近一个已收盘的交易日，默认所有行都已收盘
+        
+        Returns:
+            新写入的行数
+        """
+        high_water = self.high_water_mark(series)
+        new_rows = [row for row in rows if high_water is None or row[0] > high_water]
+        if not new_rows:
+            return 0
+        
+        closed = [row[0] for row in new_rows if closed_through is None or row[0] <= closed_through]
+        columns = ', '.join(['series', 'trade_date', *HISTORY_FIELDS])
+        placeholders = ', '.join('?' * (len(HISTORY_FIELDS) + 2))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO series_history ({columns}) VALUES ({placeholders})",
+                [(series, *row) for row in new_rows]
+            )
+            if closed:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (series, high_water, synced_at) VALUES (?, ?, ?)",
+                    (series, max(closed), synced_at)
+                )
+        return len(new_rows)
+    
+    def load_history(self, series: str, days: int, columns: Iterable[str] = ('close',), end_date: Optional[str] = None):
+        """
+        读取历史序列最近 N 个交易日
+        
+        Returns:
+            按交易日升序排列的 DataFrame（trade_date + columns）
+        """
+        import pandas as pd
+        
+        columns = list(columns)
+        unknown = [c for c in columns if c not in HISTORY_FIELDS]
+        if unknown:
+            raise ValueError(f"series_history 中没有列: {', '.join(unknown)}")
+        
+        sql = f"SELECT trade_date, {', '.join(columns)} FROM series_history WHERE series = ?"
+        params: list = [series]
+        if end_date:
+            sql += " AND trade_date <= ?"
+            params.append(end_date)
+        sql += " ORDER BY trade_date DESC LIMIT ?"
+        params.append(days)
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return pd.DataFrame(rows[::-1], columns=['trade_date', *columns])
+    
+    def recent_summary(self, days: int = 5, end_date: Optional[str] = None) -> List[Dict]:
+        """
+        最近 N 个交易日的主要指标，供报告做多日对比
+        
+        Returns:
+            按交易日升序排列的字典列表
+        """
+        dates = self.trade_dates('market_data', end_date=end_date, days=days)
+        if not dates:
+            return []
+        
+        sql = """
+            SELECT m.trade_date,
+                   sh."收盘点位", sh."涨跌幅", cy."收盘点位", cy."涨跌幅",
+                   sh."成交额" + IFNULL(sz."成交额", 0),
+                   s."上涨家数", s."下跌家数", s."涨停家数", s."跌停家数",
+                   n."合计"
+            FROM market_data m
+            LEFT JOIN index_daily sh ON sh.trade_date = m.trade_date AND sh.name = '上证指数'
+            LEFT JOIN index_daily sz ON sz.trade_date = m.trade_date AND sz.name = '深证成指'
+            LEFT JOIN index_daily cy ON cy.trade_date = m.trade_date AND cy.name = '创业板指'
+            LEFT JOIN market_stats_daily s ON s.trade_date = m.trade_date
+            LEFT JOIN north_bound_daily n ON n.trade_date = m.trade_date
+            WHERE m.trade_date BETWEEN ? AND ?
+            ORDER BY m.trade_date
+        """
+        with self._lock:
+            rows = self._conn.execute(sql, (dates[0], dates[-1])).fetchall()
+        
+        names = ('交易日', '上证指数', '上证涨跌幅', '创业板指', '创业板涨跌幅', '两市成交额',
+                 '上涨家数', '下跌家数', '涨停家数', '跌停家数', '北向合计')
+        return [dict(zip(names, row)) for row in rows]
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件投递队列
+
+报告写入后只把投递任务（收件人 + 报告文件）写入本地 SQLite 发件箱即返回，
+由后台 worker 按报告分组批量发送，失败后指数退避重试，超过最大次数进入死信。
+任务在发送前已落盘，程序中途崩溃或 SMTP 卡死时，下次运行会继续投递。
+
+用法: python delivery_queue.py [--wait 秒数] [--stats] [--retry-dead]
+"""
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from metrics import span
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient TEXT NOT NULL,
+    report_path TEXT NOT NULL,
+    content_hash TEXT,
+    subject TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (recipient, report_path)
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries (status, next_attempt_at);
+"""
+
+# 任务状态：pending 待发送，sending 已被 worker 领取，sent 已发送，dead 超过重试次数
+STATUSES = ('pending', 'sending', 'sent', 'dead')
+
+# 收件人被拒、邮件被拒等 5xx 永久错误不再重试，如 "(554, b'...')"，
+# 以及收件人被拒（SMTPRecipientsRefused）的 "{'a@b.c': (550, b'no such user')}"
+PERMANENT_ERROR = re.compile(r'\(5\d\d,')
+
+
+def _file_hash(path: str) -> Optional[str]:
+    """报告文件内容的哈希，文件不存在时为 None"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class DeliveryQueue:
+    """基于 SQLite 的持久化发件箱"""
+    
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        retry_base_delay: Optional[float] = None,
+        retry_max_delay: Optional[float] = None,
+        lease: float = 600
+    ):
+        """
+        Args:
+            db_path: 数据库文件路径，默认读取 DELIVERY_QUEUE_PATH（默认 data/outbox.sqlite）
+            max_attempts: 最大发送次数，超过后进入死信，默认读取 DELIVERY_MAX_ATTEMPTS（默认 5）
+            retry_base_delay: 首次重试等待秒数，之后翻倍，默认读取 DELIVERY_RETRY_BASE_DELAY（默认 30）
+            retry_max_delay: 重试等待上限秒数，默认读取 DELIVERY_RETRY_MAX_DELAY（默认 3600）
+            lease: 领取后未完成的任务在多少秒后可被重新领取（处理崩溃或卡死的运行）
+        """
+        self.db_path = db_path or os.getenv('DELIVERY_QUEUE_PATH', os.path.join('data', 'outbox.sqlite'))
+        self.max_attempts = max_attempts or int(_env_float('DELIVERY_MAX_ATTEMPTS', 5))
+        self.retry_base_delay = retry_base_delay if retry_base_delay is not None else _env_float('DELIVERY_RETRY_BASE_DELAY', 30)
+        self.retry_max_delay = retry_max_delay if retry_max_delay is not None else _env_float('DELIVERY_RETRY_MAX_DELAY', 3600)
+        self.lease = lease
+        
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+    
+    def _migrate(self):
+        """为旧版发件箱补充 content_hash 列（已有任务按当前文件内容记录哈希）"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(deliveries)")]
+        if 'content_hash' in columns:
+            return
+        self._conn.execute("ALTER TABLE deliveries ADD COLUMN content_hash TEXT")
+        paths = [row[0] for row in self._conn.execute("SELECT DISTINCT report_path FROM deliveries")]
+        self._conn.executemany(
+            "UPDATE deliveries SET content_hash = ? WHERE report_path = ?",
+            [(_file_hash(path), path) for path in paths]
+        )
+    
+    def close(self):
+        """关闭数据库连接"""
+        self._conn.close()
+    
+    def enqueue(self, recipients: List[str], report_path: str, subject: Optional[str] = None) -> int:
+        """
+        写入投递任务
+        
+        同一收件人、同一报告文件只保留一个任务；内容未变时，已进入死信或已发送的任务
+        不会被重复写入。报告重新生成（文件内容哈希变化）后任务重置为待发送。
+        
+        Returns:
+            新写入或重置的任务数
+        """
+        report_path = os.path.abspath(report_path)
+        content_hash = _file_hash(report_path)
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "INSERT INTO deliveries (recipient, report_path, content_hash, subject, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (recipient, report_path) DO UPDATE SET "
+                "content_hash = excluded.content_hash, subject = excluded.subject, status = 'pending', attempts = 0, "
+                "next_attempt_at = excluded.next_attempt_at, last_error = NULL, updated_at = excluded.updated_at "
+                "WHERE deliveries.content_hash IS NOT excluded.content_hash",
+                [(recipient, report_path, content_hash, subject, now, now, now) for recipient in dict.fromkeys(recipients)]
+            )
+            return cursor.rowcount
+    
+    def claim(self, limit: int = 500, now: Optional[float] = None) -> List[Dict]:
+        """
+        领取已到期的任务（包括租约过期的 sending 任务）
+        
+        Returns:
+            [{'id', 'recipient', 'report_path', 'subject', 'attempts'}]
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, recipient, report_path, subject, attempts FROM deliveries "
+                "WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at, id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            # 领取即递增次数并设置租约：即使本次运行崩溃，也不会无限重试
+            self._conn.executemany(
+                "UPDATE deliveries SET status = 'sending', attempts = attempts + 1, "
+                "next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                [(now + self.lease, now, row[0]) for row in rows]
+            )
+        return [
+            {'id': row[0], 'recipient': row[1], 'report_path': row[2], 'subject': row[3], 'attempts': row[4] + 1}
+            for row in rows
+        ]
+    
+    def mark_sent(self, job_ids: List[int]):
+        """标记任务已发送"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE deliveries SET status = 'sent', last_error = NULL, updated_at = ? WHERE id = ?",
+                [(now, job_id) for job_id in job_ids]
+            )
+    
+    def backoff(self, attempts: int) -> float:
+        """第 attempts 次失败后的等待秒数（指数退避，带随机抖动）"""
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.0)
+    
+    def mark_failed(self, job: Dict, error: str, permanent: bool = False) -> str:
+        """
+        记录发送失败
+        
+        未超过最大次数时按退避时间重新排队，否则（或 permanent 为 True 时）进入死信。
+        
+        Returns:
+            任务的新状态（pending / dead）
+        """
+        now = time.time()
+        status = 'dead' if permanent or job['attempts'] >= self.max_attempts else 'pending'
+        next_attempt_at = now + self.backoff(job['attempts']) if status == 'pending' else now
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE deliveries SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                (status, error[:500], next_attempt_at, now, job['id'])
+            )
+        return status
+    
+    def retry_dead(self) -> int:
+        """将死信任务重新放回队列（例如修正 SMTP 配置后）"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE deliveries SET status = 'pending', attempts = 0, next_attempt_at = ?, updated_at = ? "
+                "WHERE status = 'dead'",
+                (now, now)
+            )
+            return cursor.rowcount
+    
+    def next_due(self) -> Optional[float]:
+        """最早一个未完成任务的计划发送时间"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM deliveries WHERE status IN ('pending', 'sending')"
+            ).fetchone()
+        return row[0]
+    
+    def stats(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM deliveries GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+    
+    def dead_letters(self, limit: int = 20) -> List[Tuple[str, str, str]]:
+        """最近的死信任务 [(收件人, 报告文件, 错误信息)]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT recipient, report_path, last_error FROM deliveries WHERE status = 'dead' "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+
+class DeliveryWorker:
+    """从发件箱领取任务并发送邮件"""
+    
+    def __init__(self, queue: DeliveryQueue, sender=None, batch_size: int = 500):
+        """
+        Args:
+            queue: 发件箱
+            sender: EmailSender 实例，默认按环境变量创建
+            batch_size: 每次领取的任务数
+        """
+        self.queue = queue
+        self.batch_size = batch_size
+        self._sender = sender
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def sender(self):
+        if self._sender is None:
+            from send_email import EmailSender
+            self._sender = EmailSender()
+        return self._sender
+    
+    def process_once(self) -> Dict[str, int]:
+        """
+        发送一批已到期的任务（同一报告的收件人共用一个 SMTP 会话）
+        
+        Returns:
+            {'sent', 'retry', 'dead'} 本批各结果的任务数
+        """
+        counts = {'sent': 0, 'retry': 0, 'dead': 0}
+        jobs = self.queue.claim(self.batch_size)
+        if not jobs:
+            return counts
+        
+        try:
+            sender = self.sender
+        except ValueError as e:
+            # 未配置发件邮箱等配置错误重试也不会成功，直接转入死信（修正后用 --retry-dead 重新发送）
+            for job in jobs:
+                self.queue.mark_failed(job, f"邮件配置错误: {e}", permanent=True)
+            counts['dead'] += len(jobs)
+            print(f"[WARN] ⚠️ 邮件配置错误，{len(jobs)} 封邮件已转入死信: {e}")
+            return counts
+        
+        groups: Dict[Tuple[str, Optional[str]], List[Dict]] = {}
+        for job in jobs:
+            groups.setdefault((job['report_path'], job['subject']), []).append(job)
+        
+        for (report_path, subject), group in groups.items():
+            if not os.path.exists(report_path):
+                for job in group:
+                    self.queue.mark_failed(job, f"报告文件不存在: {report_path}", permanent=True)
+                counts['dead'] += len(group)
+                continue
+            
+            try:
+                with span('delivery.batch', recipients=len(group)) as s:
+                    result = sender.send_report_batch([job['recipient'] for job in group], report_path, subject)
+                    s.set(sent=len(result['sent']), failed=len(result['failed']))
+                sent, failed = set(result['sent']), result['failed']
+            except Exception as e:
+                sent, failed = set(), {job['recipient']: str(e) for job in group}
+            
+            self.queue.mark_sent([job['id'] for job in group if job['recipient'] in sent])
+            counts['sent'] += sum(1 for job in group if job['recipient'] in sent)
+            for job in group:
+                if job['recipient'] in sent:
+                    continue
+                error = failed.get(job['recipient'], "未知错误")
+                status = self.queue.mark_failed(job, error, permanent=bool(PERMANENT_ERROR.search(error)))
+                counts['retry' if status == 'pending' else 'dead'] += 1
+                if status == 'dead':
+                    print(f"[WARN] ⚠️ {job['recipient']} 投递失败 {job['attempts']} 次，已转入死信: {error}")
+        return counts
+    
+    def drain(self, wait: float = 0) -> Dict[str, int]:
+        """
+        发送所有已到期的任务
+        
+        Args:
+            wait: 在这段时间（秒）内等待并发送到期的重试任务，0 表示只发送当前已到期的任务
+        
+        Returns:
+            {'sent', 'retry', 'dead'} 累计结果
+        """
+        deadline = time.time() + wait
+        totals = {'sent': 0, 'retry': 0, 'dead': 0}
+        while not self._stop.is_set():
+            counts = self.process_once()
+            for key, value in counts.items():
+                totals[key] += value
+            if any(counts.values()):
+                continue
+            
+            due = self.queue.next_due()
+            if due is None or due > deadline:
+                break
+            self._stop.wait(max(0.0, due - time.time()))
+        return totals
+    
+    def start(self, wait: float = 0) -> threading.Thread:
+        """在后台线程中执行 drain，立即返回"""
+        self._thread = threading.Thread(target=self.drain, args=(wait,), name='delivery-worker', daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待后台线程结束
+        
+        超时后通知线程在当前批次结束后停止；仍未完成的任务留在发件箱，下次运行时继续投递。
+        
+        Returns:
+            后台线程是否已结束
+        """
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self._stop.set()
+            return False
+        return True
+
+
+def main():
+    """发送发件箱中积压的邮件"""
+    import argparse
+    from dotenv import load_dotenv
+    
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="发送发件箱中积压的报告邮件")
+    parser.add_argument('--wait', type=float, default=0, help="等待并发送到期重试任务的最长秒数")
+    parser.add_argument('--stats', action='store_true', help="只显示队列状态")
+    parser.add_argument('--retry-dead', action='store_true', help="将死信任务重新放回队列")
+    args = parser.parse_args()
+    
+    queue = DeliveryQueue()
+    if args.retry_dead:
+        print(f"♻️ 已重新排队 {queue.retry_dead()} 个死信任务")
+    if not args.stats:
+        totals = DeliveryWorker(queue).drain(args.wait)
+        print(f"📮 投递结果: 成功 {totals['sent']}，待重试 {totals['retry']}，死信 {totals['dead']}")
+    
+    print(f"📦 发件箱: {queue.stats()}")
+    for recipient, report_path, error in queue.dead_letters():
+        print(f"  ☠️ {recipient} {os.path.basename(report_path)}: {error}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,39 +5,160 @@ A股数据获取模块 - 使用 AkShare
 """
 
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Optional
 import json
 
+from concurrency_limits import ConcurrencyLimiter
+from data_cache import DataFrameCache
+from frame_utils import top_n_records
+from market_snapshot import MarketSnapshot
+from metrics import span
+
 
 class AStockDataFetcher:
     """A股数据获取器"""
     
-    def __init__(self):
-        """初始化数据获取器"""
-        self.check_akshare()
+    def __init__(
+        self,
+        concurrent: Optional[bool] = None,
+        max_workers: Optional[int] = None,
+        fetch_timeout: Optional[float] = None,
+        cache: Optional[DataFrameCache] = None,
+        sector_top_n: Optional[int] = None,
+        sector_bottom_n: Optional[int] = None,
+        capital_flow_top_n: Optional[int] = None,
+        limiter: Optional[ConcurrencyLimiter] = None
+    ):
+        """
+        初始化数据获取器
+        
+        Args:
+            concurrent: 是否并发获取各类数据，默认读取 FETCH_CONCURRENT（默认开启）
+            max_workers: 并发线程数上限，默认读取 FETCH_MAX_WORKERS（默认 5）
+            fetch_timeout: 单个数据源超时时间（秒），默认读取 FETCH_TIMEOUT（默认 60）
+            cache: 原始数据缓存，默认根据 AKSHARE_CACHE* 环境变量创建
+            sector_top_n: 领涨板块数量，默认读取 SECTOR_TOP_N（默认 10）
+            sector_bottom_n: 领跌板块数量，默认读取 SECTOR_BOTTOM_N（默认 5）
+            capital_flow_top_n: 主力净流入/净流出个股数量，默认读取 CAPITAL_FLOW_TOP_N（默认 10）
+            limiter: 各 AkShare 接口同时进行的请求数上限（缓存命中不占用），默认读取
+                AKSHARE_CONCURRENCY（如 "stock_board_industry_hist_em=4"）和 AKSHARE_MAX_CONCURRENCY（默认不限制）
+        """
+        if concurrent is None:
+            concurrent = os.getenv('FETCH_CONCURRENT', '1').lower() not in ('0', 'false', 'no')
+        self.concurrent = concurrent
+        self.max_workers = max_workers or int(os.getenv('FETCH_MAX_WORKERS', '5'))
+        self.fetch_timeout = fetch_timeout or float(os.getenv('FETCH_TIMEOUT', '60'))
+        self.sector_top_n = sector_top_n or int(os.getenv('SECTOR_TOP_N', '10'))
+        self.sector_bottom_n = sector_bottom_n or int(os.getenv('SECTOR_BOTTOM_N', '5'))
+        self.capital_flow_top_n = capital_flow_top_n or int(os.getenv('CAPITAL_FLOW_TOP_N', '10'))
+        self.limiter = limiter or ConcurrencyLimiter.from_env('AKSHARE_CONCURRENCY', 'AKSHARE_MAX_CONCURRENCY')
+        # 数据对应的交易日，为空表示当前交易日（历史回补时为指定交易日）
+        self.trade_date: Optional[str] = None
+        
+        # 最近一次 fetch_all_data 中各数据源的耗时（秒）
+        self.fetch_timings: Dict[str, float] = {}
+        
+        # 全市场行情快照，每次 fetch_all_data 只下载一次
+        self.snapshot: Optional[MarketSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+        # 市场宽度计算器和分板块涨跌停识别器，首次统计时创建，盘中多次快照可复用
+        self.breadth_engine = None
+        self.board_classifier = None
+        
+        # 历史序列增量同步（需调用 enable_history 启用）
+        self.history_sync = None
+        
+        self.cache = cache or DataFrameCache()
+        if self.cache.offline:
+            print("📴 离线模式：仅使用本地缓存数据")
+        
+        # AkShare 在首次实际请求接口时才导入（缓存命中的运行不需要加载）
+        self._ak = None
+        self._ak_lock = threading.Lock()
+        self._import_error: Optional[ImportError] = None
+    
+    @property
+    def ak(self):
+        """
+        AkShare 模块，首次访问时导入
+        
+        导入 akshare 会连带加载 pandas、lxml 等，耗时数秒，因此不在初始化时导入。
+        
+        Raises:
+            ImportError: 未安装 AkShare
+        """
+        with self._ak_lock:
+            if self._ak is None:
+                self._ak = self.check_akshare()
+            return self._ak
     
     def check_akshare(self):
-        """检查并导入 AkShare"""
+        """导入 AkShare，未安装时给出明确的安装提示（不在运行中自动安装）"""
         try:
-            import akshare as ak
-            self.ak = ak
-            print("✅ AkShare 已加载")
-        except ImportError:
-            print("❌ 未安装 AkShare，正在安装...")
-            import subprocess
-            import sys
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "akshare", "-i", "https://pypi.tuna.tsinghua.edu.cn/simple"])
-            import akshare as ak
-            self.ak = ak
-            print("✅ AkShare 安装成功")
+            with span('import.akshare'):
+                import akshare as ak
+        except ImportError as e:
+            self._import_error = ImportError("未安装 AkShare，请先运行: pip install -r requirements.txt")
+            raise self._import_error from e
+        print("✅ AkShare 已加载")
+        return ak
+    
+    def enable_history(self, warehouse):
+        """
+        启用历史序列增量同步
+        
+        启用后北向资金改为从本地数据仓库读取（只同步新增部分），
+        并额外计算指数均线和北向资金多日累计。
+        
+        Args:
+            warehouse: MarketWarehouse 本地数据仓库
+        """
+        from history_sync import HistorySync
+        
+        self.history_sync = HistorySync(warehouse, self)
+    
+    def _call(self, endpoint: str, **kwargs):
+        """调用 AkShare 接口，优先使用本地缓存"""
+        with span('akshare', endpoint=endpoint) as s:
+            downloaded = []
+            
+            def fetch():
+                downloaded.append(True)
+                with self.limiter.slot(endpoint) as waited:
+                    s.set(queue_ms=round(waited * 1000, 1))
+                    return getattr(self.ak, endpoint)(**kwargs)
+            
+            df = self.cache.get_or_fetch(endpoint, fetch, kwargs)
+            s.set(cache_hit=not downloaded, rows=len(df))
+            return df
+    
+    def get_market_snapshot(self, refresh: bool = False) -> MarketSnapshot:
+        """
+        获取全市场行情快照
+        
+        同一次运行中只下载一次，市场统计及其他模块共享同一份数据。
+        
+        Args:
+            refresh: 是否强制重新获取
+        """
+        with self._snapshot_lock:
+            if self.snapshot is None or refresh:
+                df = self._call('stock_zh_a_spot_em')
+                with span('snapshot.build', rows=len(df)):
+                    self.snapshot = MarketSnapshot.from_spot(df)
+                print(f"  ✅ 全市场快照: {len(self.snapshot)} 只股票，占用 {self.snapshot.memory_usage() / 1024 / 1024:.1f}MB")
+            return self.snapshot
     
     def fetch_index_data(self) -> Dict:
         """获取主要指数数据"""
         print("\n📊 正在获取指数数据...")
         
         try:
-            df = self.ak.stock_zh_index_spot_em()
+            df = self._call('stock_zh_index_spot_em')
             
             index_codes = {
                 '上证指数': '000001',
@@ -83,67 +204,65 @@ class AStockDataFetcher:
         print("\n📈 正在获取市场统计数据...")
         
         try:
-            df = self.ak.stock_zh_a_spot_em()
-            
-            up_count = len(df[df['涨跌幅'] > 0])
-            down_count = len(df[df['涨跌幅'] < 0])
-            flat_count = len(df[df['涨跌幅'] == 0])
-            total = len(df)
-            
-            limit_up = len(df[df['涨跌幅'] >= 9.9])
-            limit_down = len(df[df['涨跌幅'] <= -9.9])
-            
-            stats = {
-                '上涨家数': up_count,
-                '下跌家数': down_count,
-                '平盘家数': flat_count,
-                '总家数': total,
-                '涨跌比': f"{up_count}/{down_count}",
-                '涨停家数': limit_up,
-                '跌停家数': limit_down,
-            }
+            from market_breadth import BreadthEngine
+            from board_classifier import BoardClassifier
+            
+            snapshot = self.get_market_snapshot()
+            if self.breadth_engine is None:
+                self.breadth_engine = BreadthEngine()
+                self.board_classifier = BoardClassifier()
+            stats = self.breadth_engine.compute(snapshot.column('涨跌幅'))
+            
+            # 按各板块实际涨跌停价统计，替代统一的 ±9.9% 阈值
+            limits = self.board_classifier.classify(snapshot)
+            stats['涨停家数'] = limits['涨停家数']
+            stats['跌停家数'] = limits['跌停家数']
+            stats['炸板家数'] = limits['炸板家数']
+            stats['封板率'] = limits['封板率']
+            stats['分板块涨跌停'] = limits['分板块']
+            
+            up_count = stats['上涨家数']
+            down_count = stats['下跌家数']
+            flat_count = stats['平盘家数']
+            limit_up = stats['涨停家数']
+            limit_down = stats['跌停家数']
             
             print(f"  ✅ 上涨: {up_count} | 下跌: {down_count} | 平盘: {flat_count}")
-            print(f"  ✅ 涨停: {limit_up} | 跌停: {limit_down}")
+            print(f"  ✅ 涨停: {limit_up} | 跌停: {limit_down} | 炸板: {stats['炸板家数']}")
             print(f"✅ 市场统计数据获取成功")
             
             return stats
             
         except Exception as e:
             print(f"❌ 获取市场统计失败: {e}")
-            return {
-                '上涨家数': 0,
-                '下跌家数': 0,
-                '平盘家数': 0,
-                '总家数': 0,
-                '涨跌比': '0/0',
-                '涨停家数': 0,
-                '跌停家数': 0,
-            }
+            return self._empty_market_stats()
     
-    def fetch_sector_data(self) -> Dict:
-        """获取板块数据"""
+    def fetch_sector_data(self, top_n: Optional[int] = None, bottom_n: Optional[int] = None) -> Dict:
+        """
+        获取板块数据
+        
+        Args:
+            top_n: 领涨板块数量，默认使用初始化时的配置
+            bottom_n: 领跌板块数量，默认使用初始化时的配置
+        """
         print("\n📊 正在获取板块数据...")
         
         try:
-            df = self.ak.stock_board_industry_name_em()
-            df_sorted = df.sort_values('涨跌幅', ascending=False)
-            
-            top_gainers = []
-            for idx, row in df_sorted.head(10).iterrows():
-                top_gainers.append({
-                    '板块名称': row['板块名称'],
-                    '涨跌幅': float(row['涨跌幅']),
-                    '领涨股票': row['领涨股票'],
-                })
-            
-            top_losers = []
-            for idx, row in df_sorted.tail(5).iterrows():
-                top_losers.append({
-                    '板块名称': row['板块名称'],
-                    '涨跌幅': float(row['涨跌幅']),
-                    '领跌股票': row['领涨股票'],
-                })
+            df = self._call('stock_board_industry_name_em')
+            
+            top_gainers = top_n_records(
+                df, '涨跌幅', top_n or self.sector_top_n,
+                columns={'板块名称': '板块名称', '涨跌幅': '涨跌幅', '领涨股票': '领涨股票'},
+                numeric={'涨跌幅': 1}
+            )
+            
+            # 领跌板块按跌幅从大到小排列
+            top_losers = top_n_records(
+                df, '涨跌幅', bottom_n or self.sector_bottom_n,
+                columns={'板块名称': '板块名称', '涨跌幅': '涨跌幅', '领涨股票': '领跌股票'},
+                largest=False,
+                numeric={'涨跌幅': 1}
+            )
             
             if top_gainers and top_losers:
                 print(f"  ✅ 领涨板块: {top_gainers[0]['板块名称']} ({top_gainers[0]['涨跌幅']:+.2f}%)")
@@ -157,36 +276,33 @@ class AStockDataFetcher:
             
         except Exception as e:
             print(f"❌ 获取板块数据失败: {e}")
-            return {
-                '领涨板块': [],
-                '领跌板块': [],
-            }
+            return self._empty_sector_data()
     
-    def fetch_capital_flow(self) -> Dict:
-        """获取资金流向数据"""
+    def fetch_capital_flow(self, top_n: Optional[int] = None) -> Dict:
+        """
+        获取资金流向数据
+        
+        Args:
+            top_n: 净流入/净流出个股数量，默认使用初始化时的配置
+        """
         print("\n💰 正在获取资金流向数据...")
         
         try:
-            df = self.ak.stock_individual_fund_flow_rank(indicator="今日")
-            
-            top_inflow = []
-            for idx, row in df.head(10).iterrows():
-                top_inflow.append({
-                    '股票名称': row['名称'],
-                    '股票代码': row['代码'],
-                    '净流入': float(row['主力净流入-净额']) / 100000000,
-                    '涨跌幅': float(row['涨跌幅']),
-                })
-            
-            df_sorted = df.sort_values('主力净流入-净额', ascending=True)
-            top_outflow = []
-            for idx, row in df_sorted.head(10).iterrows():
-                top_outflow.append({
-                    '股票名称': row['名称'],
-                    '股票代码': row['代码'],
-                    '净流出': float(row['主力净流入-净额']) / 100000000,
-                    '涨跌幅': float(row['涨跌幅']),
-                })
+            df = self._call('stock_individual_fund_flow_rank', indicator="今日")
+            top_n = top_n or self.capital_flow_top_n
+            
+            top_inflow = top_n_records(
+                df, '主力净流入-净额', top_n,
+                columns={'名称': '股票名称', '代码': '股票代码', '主力净流入-净额': '净流入', '涨跌幅': '涨跌幅'},
+                numeric={'净流入': 1 / 100000000, '涨跌幅': 1}
+            )
+            
+            top_outflow = top_n_records(
+                df, '主力净流入-净额', top_n,
+                columns={'名称': '股票名称', '代码': '股票代码', '主力净流入-净额': '净流出', '涨跌幅': '涨跌幅'},
+                largest=False,
+                numeric={'净流出': 1 / 100000000, '涨跌幅': 1}
+            )
             
             if top_inflow and top_outflow:
                 print(f"  ✅ 净流入最大: {top_inflow[0]['股票名称']} ({top_inflow[0]['净流入']:.2f}亿)")
@@ -200,21 +316,21 @@ class AStockDataFetcher:
             
         except Exception as e:
             print(f"❌ 获取资金流向失败: {e}")
-            return {
-                '净流入TOP10': [],
-                '净流出TOP10': [],
-            }
+            return self._empty_capital_flow()
     
     def fetch_north_bound_flow(self) -> Dict:
         """获取北向资金流向"""
         print("\n🌏 正在获取北向资金数据...")
         
+        if self.history_sync is not None:
+            return self._fetch_north_bound_incremental()
+        
         try:
-            df = self.ak.stock_em_hsgt_north_net_flow_in(indicator="沪股通")
+            df = self._call('stock_em_hsgt_north_net_flow_in', indicator="沪股通")
             latest = df.iloc[-1]
             hgt_flow = float(latest['当日资金流入'])
             
-            df = self.ak.stock_em_hsgt_north_net_flow_in(indicator="深股通")
+            df = self._call('stock_em_hsgt_north_net_flow_in', indicator="深股通")
             latest = df.iloc[-1]
             sgt_flow = float(latest['当日资金流入'])
             
@@ -233,23 +349,194 @@ class AStockDataFetcher:
             
         except Exception as e:
             print(f"❌ 获取北向资金失败: {e}")
-            return {
-                '沪股通': 0,
-                '深股通': 0,
-                '合计': 0,
+            return self._empty_north_bound_flow()
+    
+    def _fetch_north_bound_incremental(self) -> Dict:
+        """增量同步北向资金历史，并从本地数据计算当日值和多日累计"""
+        try:
+            for channel in ('沪股通', '深股通'):
+                added = self.history_sync.sync_north_bound(channel)
+                if added:
+                    print(f"  ✅ {channel}: 新增 {added} 个交易日")
+            
+            north = self.history_sync.north_bound_summary()
+            if '数据日期' in north:
+                print(f"  ⚠️ 北向资金最新数据为 {north['数据日期']}，不是当前交易日")
+            
+            print(f"  ✅ 沪股通: {north['沪股通']:.2f}亿")
+            print(f"  ✅ 深股通: {north['深股通']:.2f}亿")
+            print(f"  ✅ 合计: {north['合计']:.2f}亿")
+            print(f"✅ 北向资金数据获取成功")
+            
+            return north
+            
+        except Exception as e:
+            print(f"❌ 获取北向资金失败: {e}")
+            return self._empty_north_bound_flow()
+    
+    def fetch_index_indicators(self) -> Dict:
+        """增量同步指数日线，并基于本地数据计算均线"""
+        print("\n📐 正在同步指数日线...")
+        
+        try:
+            from history_sync import INDEX_SYMBOLS
+            
+            for name in INDEX_SYMBOLS:
+                added = self.history_sync.sync_index(name)
+                if added:
+                    print(f"  ✅ {name}: 新增 {added} 个交易日")
+            
+            indicators = self.history_sync.index_indicators()
+            print(f"✅ 指数均线计算完成 ({len(indicators)} 个指数)")
+            return indicators
+            
+        except Exception as e:
+            print(f"❌ 同步指数日线失败: {e}")
+            return {}
+    
+    @staticmethod
+    def _empty_index_data() -> Dict:
+        return {}
+    
+    @staticmethod
+    def _empty_market_stats() -> Dict:
+        # 涨跌家数、涨跌停家数不可用时为 None（提示词和报告表格中省略），不能当作 0 家
+        return {
+            '上涨家数': None,
+            '下跌家数': None,
+            '平盘家数': None,
+            '总家数': None,
+            '涨跌比': None,
+            '涨停家数': None,
+            '跌停家数': None,
+            '涨跌分布': {},
+        }
+    
+    @staticmethod
+    def _empty_sector_data() -> Dict:
+        return {
+            '领涨板块': [],
+            '领跌板块': [],
+        }
+    
+    @staticmethod
+    def _empty_capital_flow() -> Dict:
+        return {
+            '净流入TOP10': [],
+            '净流出TOP10': [],
+        }
+    
+    @staticmethod
+    def _empty_north_bound_flow() -> Dict:
+        return {
+            '沪股通': 0,
+            '深股通': 0,
+            '合计': 0,
+        }
+    
+    def _fetch_tasks(self) -> Dict[str, tuple]:
+        """数据源列表：名称 -> (获取函数, 失败时的默认值函数)"""
+        tasks = {
+            '指数数据': (self.fetch_index_data, self._empty_index_data),
+            '市场统计': (self.fetch_market_stats, self._empty_market_stats),
+            '板块数据': (self.fetch_sector_data, self._empty_sector_data),
+            '资金流向': (self.fetch_capital_flow, self._empty_capital_flow),
+            '北向资金': (self.fetch_north_bound_flow, self._empty_north_bound_flow),
+        }
+        if self.history_sync is not None:
+            tasks['技术指标'] = (self.fetch_index_indicators, dict)
+        return tasks
+    
+    @staticmethod
+    def _timed_fetch(name: str, fetch: Callable[[], Dict], timings: Dict[str, float]) -> Dict:
+        """执行单个数据源并将耗时记录到 timings"""
+        start = time.perf_counter()
+        try:
+            with span(f'fetch.{name}'):
+                return fetch()
+        finally:
+            # 超时的数据源已记为超时时间，线程晚到的结果不再覆盖
+            timings.setdefault(name, time.perf_counter() - start)
+    
+    def _fetch_sequential(self, tasks: Dict[str, tuple]) -> Dict[str, Dict]:
+        """依次获取各数据源"""
+        results = {}
+        for name, (fetch, fallback) in tasks.items():
+            try:
+                results[name] = self._timed_fetch(name, fetch, self.fetch_timings)
+            except Exception as e:
+                print(f"❌ {name} 获取异常: {e}")
+                results[name] = fallback()
+        return results
+    
+    def _fetch_concurrent(self, tasks: Dict[str, tuple]) -> Dict[str, Dict]:
+        """
+        在有界线程池中并发获取各数据源
+        
+        各数据源之间相互独立，总耗时约等于最慢的一个。
+        超时或异常的数据源返回与串行模式相同的默认值。
+        """
+        results = {}
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(tasks)),
+            thread_name_prefix='akshare-fetch'
+        )
+        try:
+            futures = {
+                name: executor.submit(self._timed_fetch, name, fetch, self.fetch_timings)
+                for name, (fetch, _) in tasks.items()
             }
+            # 所有数据源同时开始，统一的截止时间即为每个数据源的超时时间
+            wait(futures.values(), timeout=self.fetch_timeout)
+            
+            for name, future in futures.items():
+                fallback = tasks[name][1]
+                if not future.done():
+                    future.cancel()
+                    self.fetch_timings[name] = self.fetch_timeout
+                    print(f"❌ {name} 获取超时 ({self.fetch_timeout:.0f}秒)，使用默认值")
+                    results[name] = fallback()
+                    continue
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"❌ {name} 获取异常: {e}")
+                    results[name] = fallback()
+        finally:
+            # 不等待超时的线程，避免拖慢整个流程
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return results
     
-    def fetch_all_data(self) -> Dict:
-        """获取所有市场数据"""
+    def fetch_all_data(self, concurrent: Optional[bool] = None) -> Dict:
+        """
+        获取所有市场数据
+        
+        Args:
+            concurrent: 是否并发获取，默认使用初始化时的配置
+        """
+        if concurrent is None:
+            concurrent = self.concurrent
+        
         print("\n" + "="*60)
-        print("🚀 开始获取A股市场数据（AkShare）")
+        print(f"🚀 开始获取A股市场数据（AkShare，{'并发' if concurrent else '串行'}模式）")
         print("="*60)
         
-        indices = self.fetch_index_data()
-        stats = self.fetch_market_stats()
-        sectors = self.fetch_sector_data()
-        capital = self.fetch_capital_flow()
-        north_bound = self.fetch_north_bound_flow()
+        self.fetch_timings = {}
+        self.snapshot = None
+        self._import_error = None
+        tasks = self._fetch_tasks()
+        
+        with span('fetch_all', mode='concurrent' if concurrent else 'sequential', sources=len(tasks)) as s:
+            if concurrent:
+                results = self._fetch_concurrent(tasks)
+            else:
+                results = self._fetch_sequential(tasks)
+            elapsed = s.elapsed()
+        
+        # 缺少依赖时各数据源都会退回默认值，直接报错而不是用空数据生成报告
+        if self._import_error is not None:
+            raise self._import_error
         
         # 获取北京时间
         beijing_tz = timezone(timedelta(hours=8))
@@ -258,15 +545,21 @@ class AStockDataFetcher:
         market_data = {
             '获取时间': beijing_time,
             '数据来源': 'AkShare (东方财富)',
-            '指数数据': indices,
-            '市场统计': stats,
-            '板块数据': sectors,
-            '资金流向': capital,
-            '北向资金': north_bound,
+            '指数数据': results['指数数据'],
+            '市场统计': results['市场统计'],
+            '板块数据': results['板块数据'],
+            '资金流向': results['资金流向'],
+            '北向资金': results['北向资金'],
         }
+        if '技术指标' in results:
+            market_data['技术指标'] = results['技术指标']
         
         print("\n" + "="*60)
         print("✅ 数据获取完成")
+        for name in tasks:
+            if name in self.fetch_timings:
+                print(f"  ⏱️ {name}: {self.fetch_timings[name]:.2f}秒")
+        print(f"  ⏱️ 总耗时: {elapsed:.2f}秒")
         print("="*60 + "\n")
         
         return market_data
@@ -292,12 +585,22 @@ class AStockDataFetcher:
         
         lines.append("### 市场统计")
         stats = market_data['市场统计']
-        lines.append(f"- 上涨家数：{stats['上涨家数']}")
-        lines.append(f"- 下跌家数：{stats['下跌家数']}")
-        lines.append(f"- 平盘家数：{stats['平盘家数']}")
-        lines.append(f"- 涨跌比：{stats['涨跌比']}")
-        lines.append(f"- 涨停家数：{stats['涨停家数']}")
-        lines.append(f"- 跌停家数：{stats['跌停家数']}")
+        if stats.get('上涨家数') is not None:
+            lines.append(f"- 上涨家数：{stats['上涨家数']}")
+            lines.append(f"- 下跌家数：{stats['下跌家数']}")
+            lines.append(f"- 平盘家数：{stats['平盘家数']}")
+            lines.append(f"- 涨跌比：{stats['涨跌比']}")
+        for field in ('涨停家数', '跌停家数'):
+            if stats.get(field) is not None:
+                lines.append(f"- {field}：{stats[field]}")
+        if stats.get('炸板家数') is not None and stats.get('封板率') is not None:
+            lines.append(f"- 炸板家数：{stats['炸板家数']}（封板率 {stats['封板率']}）")
+        for board, counts in stats.get('分板块涨跌停', {}).items():
+            if counts['总家数']:
+                lines.append(f"  - {board}：涨停 {counts['涨停']} | 跌停 {counts['跌停']} | 炸板 {counts['炸板']}")
+        distribution = stats.get('涨跌分布')
+        if distribution:
+            lines.append("- 涨跌分布：" + " | ".join(f"{name} {count}家" for name, count in distribution.items()))
         lines.append("")
         
         lines.append("### 板块表现")
@@ -332,17 +635,61 @@ class AStockDataFetcher:
         
         lines.append("### 北向资金")
         north = market_data['北向资金']
+        if '数据日期' in north:
+            lines.append(f"- 数据日期：{north['数据日期']}（当日数据尚未发布，以下为该日数值）")
         lines.append(f"- 沪股通：{north['沪股通']:.2f}亿元")
         lines.append(f"- 深股通：{north['深股通']:.2f}亿元")
         lines.append(f"- **合计**：{north['合计']:.2f}亿元")
+        rolling = [f"{key} {north[key]:.2f}亿元" for key in ('5日累计', '20日累计', '60日累计') if key in north]
+        if rolling:
+            lines.append(f"- 多日累计：{' | '.join(rolling)}")
         lines.append("")
         
+        indicators = market_data.get('技术指标')
+        if indicators:
+            lines.append("### 指数均线")
+            for name, values in indicators.items():
+                lines.append(f"- {name}：" + " | ".join(f"{key} {value:.2f}" for key, value in values.items()))
+            lines.append("")
+        
+        recent = market_data.get('近期走势')
+        if recent and len(recent) > 1:
+            lines.append(f"### 近{len(recent)}个交易日对比")
+            lines.append("| 交易日 | 上证指数 | 涨跌幅 | 创业板指 | 涨跌幅 | 成交额(亿) | 涨/跌家数 | 涨停/跌停 | 北向(亿) |")
+            lines.append("|---|---|---|---|---|---|---|---|---|")
+            for row in recent:
+                lines.append(
+                    f"| {row['交易日']} | {_fmt(row['上证指数'], '.2f')} | {_fmt(row['上证涨跌幅'], '+.2f', '%')} "
+                    f"| {_fmt(row['创业板指'], '.2f')} | {_fmt(row['创业板涨跌幅'], '+.2f', '%')} "
+                    f"| {_fmt(row['两市成交额'], '.0f')} | {_fmt(row['上涨家数'], 'd')}/{_fmt(row['下跌家数'], 'd')} "
+                    f"| {_fmt(row['涨停家数'], 'd')}/{_fmt(row['跌停家数'], 'd')} | {_fmt(row['北向合计'], '.2f')} |"
+                )
+            lines.append("")
+        
         return "\n".join(lines)
 
 
+def _fmt(value, spec: str, suffix: str = '') -> str:
+    """格式化可能缺失的数值"""
+    if value is None:
+        return '-'
+    return f"{value:{spec}}{suffix}"
+
+
 def main():
     """测试数据获取"""
-    fetcher = AStockDataFetcher()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="获取A股市场数据")
+    parser.add_argument('--offline', action='store_true', help="离线模式，只使用本地缓存数据")
+    parser.add_argument('--no-cache', action='store_true', help="不使用本地缓存，强制重新下载")
+    args = parser.parse_args()
+    
+    cache = DataFrameCache(
+        offline=True if args.offline else None,
+        enabled=False if args.no_cache else None
+    )
+    fetcher = AStockDataFetcher(cache=cache)
     market_data = fetcher.fetch_all_data()
     formatted = fetcher.format_data_for_prompt(market_data)
     print(formatted)
@@ -350,6 +697,15 @@ def main():
     with open('market_data.json', 'w', encoding='utf-8') as f:
         json.dump(market_data, f, ensure_ascii=False, indent=2)
     print("\n💾 数据已保存到 market_data.json")
+    
+    if not args.offline:
+        from data_warehouse import MarketWarehouse
+        
+        warehouse = MarketWarehouse()
+        warehouse.append_market_data(market_data)
+        if fetcher.snapshot is not None:
+            warehouse.append_snapshot(fetcher.snapshot)
+        print(f"💾 数据已写入历史数据仓库 {warehouse.db_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DataFrame 通用工具
+"""
+
+from typing import Dict, List, Optional
+
+
+def top_n_records(
+    df,
+    column: str,
+    n: int,
+    columns: Dict[str, str],
+    largest: bool = True,
+    numeric: Optional[Dict[str, float]] = None
+) -> List[Dict]:
+    """
+    取某列最大（或最小）的前 N 行，返回字典列表
+    
+    先收窄到需要的列，再用 nlargest/nsmallest 选取（O(n log N)，无需全表排序），
+    最后一次性 to_dict('records')，不逐行循环。
+    
+    Args:
+        df: 原始 DataFrame
+        column: 排序依据的列
+        n: 返回的行数
+        columns: 输出列映射，原列名 -> 输出字段名（按此顺序输出）
+        largest: True 取最大的 N 行（降序），False 取最小的 N 行（升序）
+        numeric: 需要转为浮点数的输出字段 -> 乘数，如 {'净流入': 1e-8} 将元转换为亿元
+    
+    Returns:
+        记录列表
+    """
+    import pandas as pd
+    
+    if n <= 0 or df is None or df.empty:
+        return []
+    
+    needed = list(dict.fromkeys([column, *columns]))
+    narrow = df[needed].copy()
+    narrow[column] = pd.to_numeric(narrow[column], errors='coerce')
+    # 无法解析的值（停牌为 '-' 或 NaN）不参与排名；N 超过有效行数时 nlargest 会保留 NaN 行
+    narrow = narrow[narrow[column].notna()]
+    
+    picked = narrow.nlargest(n, column) if largest else narrow.nsmallest(n, column)
+    result = picked[list(columns)].rename(columns=columns)
+    
+    for name, factor in (numeric or {}).items():
+        result[name] = pd.to_numeric(result[name], errors='coerce').astype(float) * factor
+    
+    return result.to_dict('records')
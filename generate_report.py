@@ -5,75 +5,49 @@ A股晚间复盘报告生成器 - 支持多模型
 """
 
 import os
+import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Optional
-from fetch_data import AStockDataFetcher
-from multi_model_client import MultiModelManager
+from typing import Dict, List, Optional, Tuple
+from logger_config import setup_logger, get_log_file_path, get_metrics_file_path
+from prompt_compactor import compact_sections, fit_to_budget, estimate_tokens
+from report_templates import render_tables
+from report_verifier import ReportVerifier, split_sections, format_issues
+from html_renderer import render_report_html
+import metrics
+from metrics import span
 
 
-class AStockReportGenerator:
-    """A股复盘报告生成器"""
-    
-    def __init__(self, preferred_model: Optional[str] = None):
-        """
-        初始化报告生成器
-        
-        Args:
-            preferred_model: 首选模型 (Gemini/StepFun/DeepSeek)，如果为 None 则自动选择
-        """
-        print("[INFO] 初始化 A股复盘报告生成器")
-        
-        self.preferred_model = preferred_model or os.getenv('PREFERRED_AI_MODEL')
-        if self.preferred_model:
-            print(f"[INFO] 首选模型: {self.preferred_model}")
-        
-        # 初始化多模型管理器
-        self.ai_manager = MultiModelManager()
-        
-        # 初始化数据获取器
-        self.data_fetcher = AStockDataFetcher()
-        print("[INFO] ✅ 初始化完成")
-    
-    def generate_report(self, date_str: Optional[str] = None) -> str:
-        if date_str is None:
-            # 使用北京时间
-            beijing_tz = timezone(timedelta(hours=8))
-            date_str = datetime.now(beijing_tz).strftime("%Y-%m-%d")
-        
-        print(f"\n正在生成 {date_str} 的A股复盘报告...")
-        print("="*60)
-        
-        print("\n步骤 1/3: 获取市场数据 (AkShare)")
-        market_data = self.data_fetcher.fetch_all_data()
-        
-        if not market_data.get('指数数据'):
-            print("警告: 未获取到指数数据")
-        
-        print("\n步骤 2/3: 构建提示词")
-        prompt = self._build_prompt_with_data(date_str, market_data)
-        
-        print("\n步骤 3/3: 生成报告")
-        report_content, used_model = self._call_ai_api(prompt)
-        
-        print(f"\n✅ 使用模型: {used_model}")
-        print("\n" + "="*60)
-        print("报告生成完成")
-        print("="*60 + "\n")
-        
-        return report_content
-    
-    def _build_prompt_with_data(self, date_str: str, market_data: Dict) -> str:
-        """构建中文提示词"""
-        year, month, day = date_str.split('-')
-        real_data = self.data_fetcher.format_data_for_prompt(market_data)
-        
-        prompt = f"""请基于以下**真实市场数据**生成一份【{year}年{month}月{day}日】A股晚间复盘报告。
+# 提示词中的占位符（生成后填入）
+DATA_TIME_PLACEHOLDER = '{数据获取时间}'
+REPORT_TIME_PLACEHOLDER = '{报告生成时间}'
+DATA_SOURCE_PLACEHOLDER = '{数据来源}'
 
-{real_data}
+# 报告末尾的数据来源与免责声明
+REPORT_FOOTER = """---
 
-**重要说明**：
-1. ✅ **必须使用上述真实数据**作为报告的基础
+## 数据来源
+
+- **数据获取时间**：{数据获取时间}
+- **数据来源**：{数据来源}
+- **数据准确性**：✅ 真实市场数据
+
+## 免责声明
+
+本报告基于公开市场数据生成，仅供参考，不构成任何投资建议。
+投资有风险，入市需谨慎。
+
+---
+
+**报告生成时间**：{报告生成时间} (北京时间)  
+**版本**：v2.1.0 (Multi-Model)
+"""
+
+# 固定的报告要求，每次调用逐字节相同
+REPORT_INSTRUCTIONS = """**重要说明**：
+1. ✅ **必须使用提供的真实数据**作为报告的基础
 2. ✅ 指数点位、涨跌幅、成交额**必须与真实数据完全一致**
 3. ✅ 涨跌家数**必须与真实数据完全一致**
 4. ✅ 板块涨跌、资金流向**必须基于真实数据**
@@ -150,61 +124,588 @@ class AStockReportGenerator:
 报告末尾必须注明：
 
 ```markdown
----
-
-## 数据来源
-
-- **数据获取时间**：{market_data['获取时间']}
-- **数据来源**：{market_data['数据来源']}
-- **数据准确性**：✅ 真实市场数据
-
-## 免责声明
-
-本报告基于公开市场数据生成，仅供参考，不构成任何投资建议。
-投资有风险，入市需谨慎。
+""" + REPORT_FOOTER + """```
+
+请严格按照以上要求生成**中文**报告，**确保所有数值数据的准确性**。
+（{数据获取时间}、{报告生成时间}、{数据来源} 为占位符，请原样保留。）"""
+
+
+SYSTEM_INSTRUCTION = "你是一个专业的A股市场分析师。你必须严格基于提供的真实数据进行分析，不能编造或修改任何数值。你的分析应该客观、专业，基于数据给出合理的市场解读和投资建议。你必须使用中文回复。"
+
+# 分章节生成：(章节标题, 章节要求, 所需数据段落, 由模板直接渲染的数据表格)
+# 数据段落名称见 prompt_compactor.compact_sections，表格名称见 report_templates.TABLE_RENDERERS
+REPORT_SECTIONS = [
+    ("市场概况", "- 主要指数表现（**使用真实数据，精确到小数点后2位**）\n- 市场特征总结（基于真实的涨跌家数、成交额）\n- 外围市场表现（可简要提及）",
+     ('core', 'breadth', 'history'), ('indices', 'stats')),
+    ("板块表现分析", "- 领涨板块TOP10（使用真实数据）\n- 领跌板块TOP5（使用真实数据）\n- 分析板块涨跌的驱动因素",
+     ('sector',), ('sectors',)),
+    ("资金流向分析", "- 主力资金净流入/流出TOP10（使用真实数据）\n- 北向资金流向（使用真实数据）\n- 分析资金流向特征",
+     ('capital', 'north'), ('capital', 'north')),
+    ("热点题材深度解析", "- 基于领涨板块和资金流向，分析3-5个核心热点\n- 每个热点包括：催化剂、产业逻辑、代表个股",
+     ('sector', 'capital'), ()),
+    ("技术面分析", "- 上证指数：基于真实点位进行技术分析\n- 创业板指：基于真实点位进行技术分析\n- 支撑阻力位、趋势判断",
+     ('core', 'indicator', 'history'), ('indicators',)),
+    ("投资策略建议", "- 短期策略（1-2周）\n- 中长期策略（1-3个月）\n- 基于当日市场表现给出合理建议",
+     ('core', 'sector', 'capital', 'north'), ()),
+    ("风险提示", "- 五大风险维度分析",
+     ('core', 'breadth', 'north'), ()),
+    ("总结与展望", "- 当日市场特征总结\n- 后市展望",
+     ('core', 'sector', 'north', 'history'), ()),
+]
+
+# 已由模板表格给出的数据段落，提示词中不再重复附带
+TABLE_DATA_KEYS = {'sectors': 'sector', 'capital': 'capital', 'north': 'north', 'indicators': 'indicator'}
+
+# 分章节生成时每个章节共用的要求（放在最前面，可命中模型前缀缓存）
+SECTION_INSTRUCTIONS = """你正在撰写A股晚间复盘报告中的一个章节，其他章节由别人同时撰写。
 
----
+**重要说明**：
+1. ✅ **必须使用提供的真实数据**，指数点位、涨跌幅、成交额、涨跌家数必须与真实数据完全一致
+2. ❌ **严禁编造或修改任何数值数据**
+3. ✅ 点位、涨跌幅（带正负号）、成交额保留2位小数
+4. ✅ 使用Markdown格式，可使用表格；符号：🔥 热点题材、📊 数据分析、💰 资金流向、✅ 正面因素、⚠️ 风险提示
+5. ✅ 专业、客观、简洁，**必须使用中文**
+6. ❌ 只输出本章节内容，以指定的二级标题开头；不要输出报告标题、其他章节、数据来源或免责声明"""
+
+# 数据表格由模板渲染时，整篇生成的提示词中附加的说明（固定内容，紧跟 REPORT_INSTRUCTIONS 之后）
+DATA_TABLE_INSTRUCTIONS = """**数据表格说明**：
+以下数据表格由系统在报告生成后插入对应章节标题之后，**不要输出这些表格，也不要逐项罗列其中的数值**，
+直接撰写分析段落（可引用关键数值）：
+- 市场概况：主要指数表现、涨跌家数与涨跌停统计
+- 板块表现分析：领涨/领跌板块排行
+- 资金流向分析：主力净流入/净流出个股、北向资金
+- 技术面分析：指数均线
+
+各章节使用"## 序号. 章节名称"格式的二级标题（如"## 1. 市场概况"）。"""
+
+
+class ReportStreamWriter:
+    """流式生成时将内容实时写入报告文件并输出到控制台"""
+    
+    def __init__(self, filepath: str, echo: bool = True):
+        self.filepath = filepath
+        self.echo = echo
+        self._file = None
+    
+    def begin(self, model_name: str):
+        """开始一次新的生成尝试（切换模型时清空已写入的内容）"""
+        self.close()
+        os.makedirs(os.path.dirname(self.filepath) or '.', exist_ok=True)
+        self._file = open(self.filepath, 'w', encoding='utf-8')
+        print(f"[INFO] 流式写入报告: {self.filepath} ({model_name})")
+    
+    def write(self, chunk: str):
+        self._file.write(chunk)
+        self._file.flush()
+        if self.echo:
+            print(chunk, end='', flush=True)
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
-**报告生成时间**：{datetime.now(timezone(timedelta(hours=8))).strftime("%Y-%m-%d %H:%M:%S")} (北京时间)  
-**版本**：v2.1.0 (Multi-Model)
-```
 
-请严格按照以上要求生成**中文**报告，**确保所有数值数据的准确性**。"""
+class AStockReportGenerator:
+    """A股复盘报告生成器"""
+    
+    def __init__(
+        self,
+        preferred_model: Optional[str] = None,
+        stream: Optional[bool] = None,
+        data_cache=None,
+        llm_cache=None,
+        use_warehouse: Optional[bool] = None,
+        output_dir: str = "reports",
+        ai_manager=None,
+        data_fetcher=None,
+        warehouse=None
+    ):
+        """
+        初始化报告生成器
+        
+        Args:
+            preferred_model: 首选模型 (Gemini/StepFun/DeepSeek)，如果为 None 则自动选择
+            stream: 是否流式生成并实时写入报告文件，默认读取 REPORT_STREAM（默认开启）
+            data_cache: AkShare 原始数据缓存（DataFrameCache），默认按环境变量创建
+            llm_cache: AI 响应缓存（LLMResponseCache），默认按环境变量创建
+            use_warehouse: 是否使用历史数据仓库，默认读取 WAREHOUSE_ENABLED（默认开启）
+            output_dir: 报告输出目录
+            ai_manager: 已创建的多模型管理器（多个报告并发生成时共用），默认首次使用时创建
+            data_fetcher: 已创建的数据获取器（如历史回补的 HistoricalDataFetcher），默认首次使用时创建
+            warehouse: 与 data_fetcher 配合使用的历史数据仓库
+        """
+        print("[INFO] 初始化 A股复盘报告生成器")
+        
+        self.preferred_model = preferred_model or os.getenv('PREFERRED_AI_MODEL')
+        if self.preferred_model:
+            print(f"[INFO] 首选模型: {self.preferred_model}")
+        
+        if stream is None:
+            stream = os.getenv('REPORT_STREAM', '1').lower() not in ('0', 'false', 'no')
+        self.stream = stream
+        
+        # 提示词格式：compact（紧凑表格，默认）或 full（逐行列出）
+        self.prompt_mode = os.getenv('PROMPT_MODE', 'compact').lower()
+        self.prompt_token_budget = int(os.getenv('PROMPT_TOKEN_BUDGET', '6000'))
+        
+        # 生成方式：single（整篇一次生成，默认）或 sections（按章节并发生成后拼接）
+        self.report_mode = os.getenv('REPORT_MODE', 'single').lower()
+        self.section_workers = int(os.getenv('REPORT_SECTION_WORKERS', '4'))
+        # 指数、涨跌统计、板块、资金流向等数据表格由模板直接渲染，模型只撰写分析（默认开启）
+        self.data_tables = os.getenv('REPORT_DATA_TABLES', '1').lower() not in ('0', 'false', 'no')
+        
+        # 生成后校验报告数值（默认开启），可选对出错章节定向重新生成
+        self.verify = os.getenv('REPORT_VERIFY', '1').lower() not in ('0', 'false', 'no')
+        self.verify_regenerate = os.getenv('REPORT_VERIFY_REGENERATE', '0').lower() in ('1', 'true', 'yes')
+        self.verification = None
+        
+        if use_warehouse is None:
+            use_warehouse = os.getenv('WAREHOUSE_ENABLED', '1').lower() not in ('0', 'false', 'no')
+        self.use_warehouse = use_warehouse
+        self.output_dir = output_dir
+        
+        # 多模型管理器、数据获取器和历史数据仓库在首次使用时才创建（连带导入 requests、pandas 等）
+        self._data_cache = data_cache
+        self._llm_cache = llm_cache
+        self._ai_manager = ai_manager
+        self._data_fetcher = data_fetcher
+        self.warehouse = warehouse
+        # 最近一次生成的报告日期，保存报告时用于文件名
+        self.report_date: Optional[str] = None
+        print("[INFO] ✅ 初始化完成")
+    
+    @property
+    def ai_manager(self):
+        """多模型管理器（首次访问时创建）"""
+        if self._ai_manager is None:
+            from multi_model_client import MultiModelManager
+            
+            with span('init.ai_manager'):
+                self._ai_manager = MultiModelManager(cache=self._llm_cache)
+        return self._ai_manager
+    
+    @property
+    def data_fetcher(self):
+        """数据获取器（首次访问时创建，同时打开历史数据仓库）"""
+        if self._data_fetcher is None:
+            from fetch_data import AStockDataFetcher
+            
+            with span('init.data_fetcher'):
+                fetcher = AStockDataFetcher(cache=self._data_cache)
+                
+                # 历史数据仓库（WAREHOUSE_ENABLED=0 可关闭）
+                if self.use_warehouse:
+                    try:
+                        from data_warehouse import MarketWarehouse
+                        
+                        self.warehouse = MarketWarehouse()
+                        fetcher.enable_history(self.warehouse)
+                    except Exception as e:
+                        print(f"[WARN] ⚠️ 历史数据仓库初始化失败: {e}")
+            self._data_fetcher = fetcher
+        return self._data_fetcher
+    
+    def generate_report(self, date_str: Optional[str] = None) -> str:
+        if date_str is None:
+            # 使用北京时间
+            beijing_tz = timezone(timedelta(hours=8))
+            date_str = datetime.now(beijing_tz).strftime("%Y-%m-%d")
+        self.report_date = date_str
+        
+        print(f"\n正在生成 {date_str} 的A股复盘报告...")
+        print("="*60)
+        
+        print("\n步骤 1/3: 获取市场数据 (AkShare)")
+        market_data = self.data_fetcher.fetch_all_data()
+        
+        if not market_data.get('指数数据'):
+            print("警告: 未获取到指数数据")
+        
+        self._archive_market_data(market_data)
+        
+        if self.report_mode == 'sections':
+            print("\n步骤 2/3: 构建提示词")
+            with span('prompt.build', mode='sections') as s:
+                section_prompts = self._build_section_prompts(date_str, market_data)
+                s.set(sections=len(section_prompts), chars=sum(len(prompt) for _, prompt, _ in section_prompts))
+            
+            print("\n步骤 3/3: 分章节生成报告")
+            with span('report.generate', mode='sections') as s:
+                report_content, used_model = self._generate_sections(date_str, section_prompts)
+                s.set(model=used_model, chars=len(report_content))
+            report_content = self._verify_report(report_content, market_data, used_model)
+            report_content = self._fill_placeholders(report_content, market_data)
+            
+            print(f"\n✅ 使用模型: {used_model}")
+            print("\n" + "="*60)
+            print("报告生成完成")
+            print("="*60 + "\n")
+            
+            return report_content
+        
+        print("\n步骤 2/3: 构建提示词")
+        with span('prompt.build', mode=self.prompt_mode) as s:
+            prompt = self._build_prompt_with_data(date_str, market_data)
+            tables = self._render_section_tables(market_data)
+            s.set(chars=len(prompt), tokens=estimate_tokens(prompt))
+        
+        print("\n步骤 3/3: 生成报告")
+        stream_writer = ReportStreamWriter(self._report_filepath()) if self.stream else None
+        try:
+            with span('report.generate', mode='single', stream=self.stream) as s:
+                report_content, used_model = self._call_ai_api(
+                    prompt, stream_writer=stream_writer,
+                    fallback_tables="\n\n".join(f"### {title}\n\n{text}" for title, text in tables)
+                )
+                s.set(model=used_model, chars=len(report_content))
+        finally:
+            if stream_writer is not None:
+                stream_writer.close()
+        report_content = self._verify_report(report_content, market_data, used_model)
+        if used_model != "Fallback":
+            report_content = self._insert_tables(report_content, tables)
+        report_content = self._fill_placeholders(report_content, market_data)
+        
+        print(f"\n✅ 使用模型: {used_model}")
+        print("\n" + "="*60)
+        print("报告生成完成")
+        print("="*60 + "\n")
+        
+        return report_content
+    
+    def _archive_market_data(self, market_data: Dict):
+        """写入历史数据仓库，并附上近期走势供多日对比"""
+        if self.warehouse is None or self.data_fetcher.cache.offline:
+            return
+        
+        # 历史回补时按数据所属的交易日归档，近期走势也截止到该交易日
+        trade_date = self.data_fetcher.trade_date
+        try:
+            with span('warehouse.archive'):
+                self.warehouse.append_market_data(market_data, trade_date=trade_date)
+                if self.data_fetcher.snapshot is not None:
+                    self.warehouse.append_snapshot(self.data_fetcher.snapshot, trade_date=trade_date)
+                market_data['近期走势'] = self.warehouse.recent_summary(days=5, end_date=trade_date)
+        except Exception as e:
+            print(f"[WARN] ⚠️ 写入历史数据仓库失败: {e}")
+    
+    def _build_prompt_with_data(self, date_str: str, market_data: Dict) -> str:
+        """
+        构建中文提示词
         
+        compact 模式下固定的报告要求放在最前面（每天逐字节相同，可命中模型服务端的前缀缓存），
+        市场数据以紧凑表格附在其后，并按 token 预算裁剪次要段落；full 模式保持逐行列出的格式。
+        时间戳和数据来源使用占位符，生成后再填入。启用数据表格时要求模型不再输出数据表格。
+        """
+        year, month, day = date_str.split('-')
+        heading = f"请基于以下**真实市场数据**生成一份【{year}年{month}月{day}日】A股晚间复盘报告。"
+        instructions = f"{REPORT_INSTRUCTIONS}\n\n{DATA_TABLE_INSTRUCTIONS}" if self.data_tables else REPORT_INSTRUCTIONS
+        
+        if self.prompt_mode != 'compact':
+            real_data = self.data_fetcher.format_data_for_prompt(dict(market_data, 获取时间=DATA_TIME_PLACEHOLDER))
+            prompt = f"{heading}\n\n{real_data}\n\n{instructions}"
+            self._report_prompt_tokens(prompt)
+            return prompt
+        
+        providers = [name for name, _ in self.ai_manager.clients]
+        reserved = max(estimate_tokens(f"{instructions}\n\n{heading}", name) for name in providers or [None])
+        sections = compact_sections(dict(market_data, 获取时间=DATA_TIME_PLACEHOLDER))
+        real_data, dropped = fit_to_budget(sections, self.prompt_token_budget, providers, reserved)
+        if dropped:
+            print(f"[INFO] 提示词超出预算 {self.prompt_token_budget} tokens，已省略: {', '.join(dropped)}")
+        
+        prompt = f"{instructions}\n\n---\n\n{heading}\n\n{real_data}"
+        self._report_prompt_tokens(prompt)
         return prompt
     
-    def _call_ai_api(self, prompt: str) -> tuple:
+    def _render_section_tables(self, market_data: Dict) -> List[Tuple[str, str]]:
+        """
+        各章节由模板渲染的数据表格
+        
+        Returns:
+            [(章节标题, 数据表格)]，按报告顺序排列；未启用数据表格时为空
+        """
+        if not self.data_tables:
+            return []
+        tables = [(title, render_tables(market_data, table_names)) for title, _, _, table_names in REPORT_SECTIONS]
+        return [(title, text) for title, text in tables if text]
+    
+    @staticmethod
+    def _insert_tables(content: str, tables: List[Tuple[str, str]]) -> str:
+        """
+        把数据表格插入整篇生成的报告中对应章节的标题之后
+        
+        找不到章节标题的表格放在数据来源之前（没有时放在末尾）。
+        """
+        if not tables:
+            return content
+        
+        headings = [(m.group(0), m.end()) for m in re.finditer(r'^#{1,3}[ \t]+[^\n]*$', content, re.MULTILINE)]
+        inserts, missing = [], []
+        position = 0
+        for title, text in tables:
+            found = next(((line, end) for line, end in headings if end > position and title in line), None)
+            if found is None:
+                missing.append(text)
+                continue
+            position = found[1]
+            inserts.append((position, text))
+        
+        if missing:
+            footer = re.search(r'^(?:---[ \t]*\n+)?#{1,3}[ \t]*数据来源', content, re.MULTILINE)
+            position = footer.start() if footer else len(content)
+            inserts.append((position, "## 数据表格\n\n" + "\n\n".join(missing)))
+        
+        for position, text in sorted(inserts, key=lambda item: item[0], reverse=True):
+            content = f"{content[:position].rstrip()}\n\n{text}\n\n{content[position:].lstrip()}"
+        return content
+    
+    def _build_section_prompts(self, date_str: str, market_data: Dict) -> List[Tuple[str, str, str]]:
+        """
+        为每个章节构建提示词，只附带该章节需要的数据段落
+        
+        启用数据表格时，章节中的纯数据部分由 report_templates 直接渲染，
+        模型只需撰写分析段落。
+        
+        Returns:
+            [(章节标题, 提示词, 数据表格)]，按报告顺序排列
+        """
+        year, month, day = date_str.split('-')
+        data = {key: text for _, key, text in compact_sections(dict(market_data, 获取时间=DATA_TIME_PLACEHOLDER))}
+        
+        prompts = []
+        for i, (title, requirements, keys, table_names) in enumerate(REPORT_SECTIONS, 1):
+            tables = render_tables(market_data, table_names) if self.data_tables else ""
+            if tables:
+                covered = {TABLE_DATA_KEYS.get(name) for name in table_names}
+                keys = [key for key in keys if key not in covered]
+            slices = "\n\n".join(data[key] for key in keys if key in data)
+            
+            prompt = (
+                f"{SECTION_INSTRUCTIONS}\n\n---\n\n"
+                f"请基于以下**真实市场数据**撰写【{year}年{month}月{day}日】A股晚间复盘报告的第{i}章。\n\n"
+                f"## {i}. {title}\n\n本章要求：\n{requirements}\n\n"
+            )
+            if tables:
+                prompt += (
+                    "以下数据表格已由系统插入本章开头，请不要重复这些表格或逐项罗列其中的数值，"
+                    "不要输出章节标题，直接撰写分析段落（可引用关键数值）：\n\n"
+                    f"{tables}\n\n"
+                )
+            prompt += slices
+            prompts.append((title, prompt, tables))
+        
+        total = sum(estimate_tokens(prompt) for _, prompt, _ in prompts)
+        print(f"[INFO] 共 {len(prompts)} 个章节，提示词合计估算 ~{total} tokens")
+        return prompts
+    
+    def _generate_sections(self, date_str: str, section_prompts: List[Tuple[str, str, str]]) -> tuple:
+        """
+        并发生成各章节并按顺序拼接
+        
+        章节轮流分配给已配置的模型作为首选（首选模型排第一），失败时各自故障转移；
+        单个章节失败时保留数据表格和占位说明，全部失败时使用备用报告。
+        
+        Returns:
+            (content, model_summary): 拼接后的报告和各模型负责的章节数
+        """
+        providers = [name for name, _ in self.ai_manager.ordered_clients(self.preferred_model)]
+        
+        def generate_section(index: int, prompt: str) -> tuple:
+            with span('report.section', section=section_prompts[index][0]) as s:
+                content, model_name = self.ai_manager.generate(
+                    prompt=prompt,
+                    system_instruction=SYSTEM_INSTRUCTION,
+                    preferred_model=providers[index % len(providers)]
+                )
+                s.set(model=model_name)
+                return content.strip(), model_name, s.elapsed()
+        
+        start = time.perf_counter()
+        results = [None] * len(section_prompts)
+        with ThreadPoolExecutor(max_workers=max(1, self.section_workers)) as executor:
+            futures = {
+                executor.submit(generate_section, i, prompt): i
+                for i, (_, prompt, _) in enumerate(section_prompts)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                title = section_prompts[i][0]
+                try:
+                    results[i] = future.result()
+                    print(f"  ⏱️ {i + 1}. {title}: {results[i][2]:.1f}秒 ({results[i][1]})")
+                except Exception as e:
+                    print(f"[ERROR] 章节 {i + 1}. {title} 生成失败: {e}")
+        print(f"  ⏱️ 分章节生成总耗时: {time.perf_counter() - start:.1f}秒")
+        
+        if not any(results):
+            print("[ERROR] 所有章节生成失败")
+            prompt = "\n\n".join(prompt for _, prompt, _ in section_prompts)
+            tables = "\n\n".join(f"### {title}\n\n{tables}" for title, _, tables in section_prompts if tables)
+            return self._generate_fallback_report(prompt, tables), "Fallback"
+        
+        year, month, day = date_str.split('-')
+        parts = [f"# A股晚间复盘报告（{year}年{month}月{day}日）"]
+        used = {}
+        for i, ((title, _, tables), result) in enumerate(zip(section_prompts, results), 1):
+            if result is None:
+                content = "> ⚠️ 本章节生成失败，请参考其他章节及数据。"
+            else:
+                content, model_name, _ = result
+                used[model_name] = used.get(model_name, 0) + 1
+            
+            # 统一使用本地生成的章节标题，去掉模型自行输出的标题行
+            first_line, _, rest = content.partition("\n")
+            if first_line.startswith('#') and title in first_line:
+                content = rest.strip()
+            
+            parts.append("\n\n".join(part for part in (f"## {i}. {title}", tables, content) if part))
+        parts.append(REPORT_FOOTER.rstrip())
+        
+        summary = ", ".join(f"{name}×{count}" for name, count in used.items())
+        return "\n\n".join(parts) + "\n", summary
+    
+    def _verify_report(self, content: str, market_data: Dict, used_model: str) -> str:
+        """
+        校验报告中的数值与真实数据是否一致
+        
+        开启 verify_regenerate 时，只重新生成存在错误数值的章节并替换。
+        
+        Returns:
+            报告内容（可能已替换部分章节）
+        """
+        if not self.verify or used_model == "Fallback":
+            return content
+        
+        with span('report.verify') as s:
+            verifier = ReportVerifier(market_data)
+            result = verifier.verify(content)
+            s.set(checked=result['checked'], issues=len(result['issues']))
+        self._print_verification(result)
+        
+        if result['issues'] and self.verify_regenerate:
+            content = self._regenerate_sections(content, result['issues'], market_data)
+            result = verifier.verify(content)
+            print("[INFO] 重新生成后再次校验:")
+            self._print_verification(result)
+        
+        self.verification = result
+        return content
+    
+    @staticmethod
+    def _print_verification(result: Dict):
+        issues = result['issues']
+        print(f"[INFO] 数值校验: 检查 {result['checked']} 处，{len(issues)} 处与真实数据不符 "
+              f"(耗时 {result['elapsed_ms']:.1f}ms)")
+        for line in format_issues(issues):
+            print(f"  ⚠️ {line}")
+    
+    def _regenerate_sections(self, content: str, issues: List[Dict], market_data: Dict) -> str:
+        """对存在错误数值的二级标题章节定向重新生成，其余内容保持不变"""
+        sections = split_sections(content)
+        targets = {}
+        for issue in issues:
+            for section in sections:
+                if section[1] <= issue['offset'] < section[2]:
+                    targets.setdefault(section, []).append(issue)
+                    break
+        if not targets:
+            return content
+        
+        data = "\n\n".join(text for _, _, text in compact_sections(dict(market_data, 获取时间=DATA_TIME_PLACEHOLDER)))
+        
+        def regenerate(section, section_issues) -> str:
+            title, start, end = section
+            original = content[start:end].strip()
+            problems = "\n".join(f"- {line}" for line in format_issues(section_issues, limit=None))
+            prompt = (
+                f"{SECTION_INSTRUCTIONS}\n\n---\n\n"
+                f"以下是A股晚间复盘报告中的「{title}」章节，其中这些数值与真实数据不符：\n{problems}\n\n"
+                "请对照真实数据修正数值，输出修正后的完整章节（保留原标题和结构），不要输出其他内容。\n\n"
+                f"### 原章节\n\n{original}\n\n{data}"
+            )
+            fixed, model_name = self.ai_manager.generate(
+                prompt=prompt,
+                system_instruction=SYSTEM_INSTRUCTION,
+                preferred_model=self.preferred_model
+            )
+            fixed = fixed.strip()
+            if not fixed.startswith('#'):
+                fixed = f"{original.splitlines()[0]}\n\n{fixed}"
+            print(f"[INFO] 已重新生成章节: {title} ({model_name})")
+            return fixed
+        
+        print(f"[INFO] 重新生成 {len(targets)} 个存在错误数值的章节...")
+        replacements = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.section_workers)) as executor:
+            futures = {executor.submit(regenerate, section, section_issues): section for section, section_issues in targets.items()}
+            for future in as_completed(futures):
+                section = futures[future]
+                try:
+                    replacements[section] = future.result()
+                except Exception as e:
+                    print(f"[WARN] ⚠️ 章节 {section[0]} 重新生成失败，保留原内容: {e}")
+        
+        for (title, start, end), text in sorted(replacements.items(), key=lambda item: item[0][1], reverse=True):
+            content = content[:start] + text + "\n\n" + content[end:].lstrip("\n")
+        return content
+    
+    def _report_prompt_tokens(self, prompt: str):
+        """输出提示词在各模型下的估算 token 数"""
+        counts = [f"{name} ~{estimate_tokens(prompt, name)}" for name, _ in self.ai_manager.clients]
+        print(f"[INFO] 提示词 {len(prompt)} 字符，估算 tokens: {' | '.join(counts)}")
+    
+    @staticmethod
+    def _fill_placeholders(content: str, market_data: Dict) -> str:
+        """填入提示词中的时间和数据来源占位符"""
+        report_time = datetime.now(timezone(timedelta(hours=8))).strftime("%Y-%m-%d %H:%M:%S")
+        return (content
+                .replace(DATA_TIME_PLACEHOLDER, market_data.get('获取时间', ''))
+                .replace(REPORT_TIME_PLACEHOLDER, report_time)
+                .replace(DATA_SOURCE_PLACEHOLDER, market_data.get('数据来源', '')))
+    
+    def _call_ai_api(
+        self,
+        prompt: str,
+        stream_writer: Optional[ReportStreamWriter] = None,
+        fallback_tables: str = ""
+    ) -> tuple:
         """
         调用 AI API 生成报告
         
+        Args:
+            prompt: 提示词
+            stream_writer: 流式写入目标，为空时等待完整结果
+            fallback_tables: 全部失败时备用报告中使用的数据表格
+        
         Returns:
             (content, model_name): 生成的内容和使用的模型名称
         """
-        system_instruction = "你是一个专业的A股市场分析师。你必须严格基于提供的真实数据进行分析，不能编造或修改任何数值。你的分析应该客观、专业，基于数据给出合理的市场解读和投资建议。你必须使用中文回复。"
-        
         try:
             content, model_name = self.ai_manager.generate(
                 prompt=prompt,
-                system_instruction=system_instruction,
-                preferred_model=self.preferred_model
+                system_instruction=SYSTEM_INSTRUCTION,
+                preferred_model=self.preferred_model,
+                stream_writer=stream_writer
             )
             return content, model_name
-            
+        
         except Exception as e:
             print(f"[ERROR] 所有 AI 模型调用失败: {e}")
             import traceback
             traceback.print_exc()
-            return self._generate_fallback_report(prompt), "Fallback"
+            return self._generate_fallback_report(prompt, fallback_tables), "Fallback"
     
-    def _generate_fallback_report(self, prompt: str) -> str:
-        """生成备用报告（当所有 AI 调用都失败时）"""
+    def _generate_fallback_report(self, prompt: str, tables: str = "") -> str:
+        """生成备用报告（当所有 AI 调用都失败时），有模板渲染的数据表格时使用表格代替提示词"""
         return f"""# A股晚间复盘报告
 
 ## ⚠️ 提示
 
 所有 AI 服务暂时不可用，以下为基础数据报告。
 
-{prompt}
+{tables or prompt}
 
 ---
 
@@ -225,25 +726,49 @@ class AStockReportGenerator:
 请检查环境变量配置。
 """
     
-    def save_report(self, content: str, output_dir: str = "reports") -> str:
-        """保存报告到文件"""
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 使用北京时间
-        beijing_tz = timezone(timedelta(hours=8))
-        date_str = datetime.now(beijing_tz).strftime("%Y-%m-%d")
+    def _report_filepath(self, output_dir: Optional[str] = None, date_str: Optional[str] = None) -> str:
+        """报告文件路径，文件名使用报告日期（默认为最近一次生成的报告日期，其次为北京时间当日）"""
+        date_str = date_str or self.report_date
+        if date_str is None:
+            # 使用北京时间
+            beijing_tz = timezone(timedelta(hours=8))
+            date_str = datetime.now(beijing_tz).strftime("%Y-%m-%d")
         filename = f"A股晚间复盘报告_{date_str}.md"
-        filepath = os.path.join(output_dir, filename)
+        return os.path.join(output_dir or self.output_dir, filename)
+    
+    def save_report(self, content: str, output_dir: Optional[str] = None, date_str: Optional[str] = None) -> str:
+        """
+        保存报告到文件
+        
+        Args:
+            content: 报告内容
+            output_dir: 输出目录，默认使用初始化时的配置
+            date_str: 报告日期，默认为最近一次生成的报告日期
+        """
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        filepath = self._report_filepath(output_dir, date_str)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        with span('report.save', chars=len(content)):
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(content)
         
         print(f"报告已保存到: {filepath}")
+        
+        # 同时归档 HTML 版本（渲染结果缓存后发送邮件时直接复用）
+        if os.getenv('REPORT_SAVE_HTML', '0').lower() in ('1', 'true', 'yes'):
+            html_path = os.path.splitext(filepath)[0] + '.html'
+            with open(html_path, 'w', encoding='utf-8') as f:
+                f.write(render_report_html(content))
+            print(f"HTML 报告已保存到: {html_path}")
+        
         return filepath
 
 
 def main():
     """主函数"""
+    setup_logger(log_file=get_log_file_path())
+    metrics.configure(get_metrics_file_path())
     try:
         print("\n" + "="*60)
         print("A股晚间复盘报告生成系统 v2.1.0 (Multi-Model)")
@@ -254,13 +779,14 @@ def main():
         generator = AStockReportGenerator()
         report_content = generator.generate_report()
         filepath = generator.save_report(report_content)
+        metrics.print_summary()
         
         print(f"\n报告生成完成！")
         print(f"文件路径: {filepath}")
         print("\n" + "="*60)
         
         return filepath
-        
+    
     except Exception as e:
         print(f"\n错误: {e}")
         import traceback
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史交易日数据模块
+
+为历史回补提供与 fetch_all_data 结构相同的 market_data。数据按以下顺序获取：
+
+1. 历史数据仓库中已归档的当日 market_data（以前运行过的交易日，直接复用）
+2. 仓库中归档的当日全市场快照、板块和资金流向
+3. AkShare 历史接口：指数日线、北向资金历史、行业板块日线、涨停/跌停/炸板股池
+
+指数日线、北向资金和行业板块日线对整个回补区间只请求一次（HistoricalSource），
+各交易日从中截取，不随天数成倍增加请求。AkShare 没有历史的全市场实时行情和
+个股资金流向，仓库中没有归档时市场统计只包含涨跌停数据，资金流向为空。
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from data_cache import DataFrameCache
+from fetch_data import AStockDataFetcher
+from frame_utils import top_n_records
+from history_sync import INDEX_SYMBOLS, NORTH_CHANNELS, DEFAULT_WINDOWS, _date_column, _to_float
+from market_snapshot import MarketSnapshot
+
+
+HISTORY_SOURCE = 'AkShare (东方财富历史行情)'
+WAREHOUSE_SOURCE = '本地历史数据仓库'
+
+
+class HistoricalSource:
+    """回补区间内各交易日共用的历史序列，每个序列只请求一次"""
+    
+    def __init__(self, fetcher: AStockDataFetcher, start_date: str, end_date: str, lookback_days: int = 120):
+        """
+        Args:
+            fetcher: 用于调用（带缓存和并发上限的）AkShare 接口的数据获取器
+            start_date: 回补开始日期 YYYY-MM-DD
+            end_date: 回补结束日期 YYYY-MM-DD
+            lookback_days: 开始日期之前额外获取的自然日天数（计算均线和昨收）
+        """
+        self.fetcher = fetcher
+        self.start_date = start_date
+        self.end_date = end_date
+        start = datetime.strptime(start_date, "%Y-%m-%d") - timedelta(days=lookback_days)
+        self._range = (start.strftime("%Y%m%d"), end_date.replace('-', ''))
+        self._frames: Dict[str, object] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def _load(self, key: str, loader: Callable):
+        """同一序列只加载一次；多个线程同时请求时其余线程等待第一个的结果"""
+        with self._lock:
+            if key in self._frames:
+                return self._frames[key]
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._frames:
+                self._frames[key] = loader()
+            return self._frames[key]
+    
+    @staticmethod
+    def _by_date(df):
+        """以 YYYY-MM-DD 交易日为索引，按日期升序"""
+        df = df.copy()
+        df.index = df[_date_column(df)].astype(str).str[:10]
+        return df.sort_index()
+    
+    def index_frame(self, name: str):
+        """指数日线（open/high/low/close/volume/amount）"""
+        def load():
+            start, end = self._range
+            df = self.fetcher._call('stock_zh_index_daily_em', symbol=INDEX_SYMBOLS[name], start_date=start, end_date=end)
+            return self._by_date(df)
+        return self._load(f"index:{name}", load)
+    
+    def north_frame(self, channel: str):
+        """北向资金历史（接口只提供完整历史）"""
+        return self._load(
+            f"north:{channel}",
+            lambda: self._by_date(self.fetcher._call('stock_em_hsgt_north_net_flow_in', indicator=channel))
+        )
+    
+    def board_names(self) -> List[str]:
+        """行业板块名称（使用当前的板块列表）"""
+        return self._load(
+            'board_names',
+            lambda: self.fetcher._call('stock_board_industry_name_em')['板块名称'].astype(str).tolist()
+        )
+    
+    def _board_frame(self, board: str):
+        start, end = self._range
+        df = self.fetcher._call('stock_board_industry_hist_em', symbol=board, start_date=start, end_date=end,
+                                period="日k", adjust="")
+        return self._by_date(df)
+    
+    def board_frames(self) -> Dict[str, object]:
+        """所有行业板块的日线，首次调用时并发获取（并发数受数据获取器的线程数和接口并发上限限制）"""
+        def load():
+            frames = {}
+            names = self.board_names()
+            with ThreadPoolExecutor(max_workers=self.fetcher.max_workers, thread_name_prefix='board-hist') as executor:
+                for board, future in [(board, executor.submit(self._board_frame, board)) for board in names]:
+                    try:
+                        frames[board] = future.result()
+                    except Exception as e:
+                        print(f"  ⚠️ 获取板块 {board} 日线失败: {e}")
+            print(f"  ✅ 行业板块日线: {len(frames)}/{len(names)} 个板块")
+            return frames
+        return self._load('boards', load)
+    
+    def board_changes(self, trade_date: str):
+        """
+        某个交易日所有行业板块的涨跌幅
+        
+        Returns:
+            DataFrame（板块名称、涨跌幅），缺少数据的板块不包含在内
+        """
+        import pandas as pd
+        
+        names, changes = [], []
+        for board, df in self.board_frames().items():
+            if trade_date in df.index:
+                names.append(board)
+                changes.append(_to_float(df.at[trade_date, '涨跌幅']))
+        return pd.DataFrame({'板块名称': names, '涨跌幅': changes}).dropna()
+    
+    def trading_days(self) -> List[str]:
+        """回补区间内的交易日（以上证指数日线为准）"""
+        df = self.index_frame('上证指数')
+        return [day for day in df.index if self.start_date <= day <= self.end_date]
+
+
+class HistoricalDataFetcher(AStockDataFetcher):
+    """获取指定历史交易日的市场数据"""
+    
+    def __init__(self, trade_date: str, source: HistoricalSource, warehouse=None, reuse_archived: bool = True, **kwargs):
+        """
+        Args:
+            trade_date: 交易日 YYYY-MM-DD
+            source: 回补区间共用的历史序列
+            warehouse: 历史数据仓库，为空时只使用 AkShare 历史接口
+            reuse_archived: 仓库中已有当日完整 market_data 时是否直接使用
+            **kwargs: 传给 AStockDataFetcher（cache、limiter 应与 source 的数据获取器共用）
+        """
+        kwargs.setdefault('cache', source.fetcher.cache)
+        kwargs.setdefault('limiter', source.fetcher.limiter)
+        super().__init__(**kwargs)
+        self.trade_date = trade_date
+        self.source = source
+        self.warehouse = warehouse
+        self.reuse_archived = reuse_archived
+        # 使用了仓库中数据的表，用于标注数据来源
+        self.warehouse_hits = set()
+        # 历史快照的 ST 状态等与当前不同，板块索引只保存在内存中
+        from market_breadth import BreadthEngine
+        from board_classifier import BoardClassifier
+        
+        self.breadth_engine = BreadthEngine()
+        self.board_classifier = BoardClassifier(trade_date=trade_date)
+    
+    def _warehouse_rows(self, table: str):
+        """仓库中当日分区的数据，没有仓库或分区为空时返回 None"""
+        if self.warehouse is None:
+            return None
+        df = self.warehouse.load_partition(table, self.trade_date)
+        if df.empty:
+            return None
+        self.warehouse_hits.add(table)
+        return df
+    
+    def get_market_snapshot(self, refresh: bool = False) -> MarketSnapshot:
+        """由仓库中归档的当日全市场快照构建（没有归档时抛出 LookupError）"""
+        with self._snapshot_lock:
+            if self.snapshot is None or refresh:
+                df = self._warehouse_rows('spot_snapshot')
+                if df is None:
+                    raise LookupError(f"数据仓库中没有 {self.trade_date} 的全市场快照")
+                self.snapshot = MarketSnapshot.from_spot(df, fetched_at=f"{self.trade_date} 15:00:00")
+                print(f"  ✅ 全市场快照（{self.trade_date}，数据仓库）: {len(self.snapshot)} 只股票")
+            return self.snapshot
+    
+    def fetch_index_data(self) -> Dict:
+        """由指数日线计算当日点位和涨跌（昨收取前一交易日收盘）"""
+        print(f"\n📊 正在获取 {self.trade_date} 指数数据...")
+        
+        indices = {}
+        for name in INDEX_SYMBOLS:
+            try:
+                df = self.source.index_frame(name)
+            except Exception as e:
+                print(f"  ⚠️ 获取 {name} 日线失败: {e}")
+                continue
+            if self.trade_date not in df.index:
+                continue
+            position = df.index.get_loc(self.trade_date)
+            row = df.iloc[position]
+            close = float(row['close'])
+            prev_close = float(df.iloc[position - 1]['close']) if position > 0 else float(row['open'])
+            indices[name] = {
+                '收盘点位': close,
+                '涨跌幅': (close / prev_close - 1) * 100 if prev_close else 0.0,
+                '涨跌点': close - prev_close,
+                '成交额': float(row['amount']) / 100000000,
+                '成交量': float(row['volume']),
+                '昨收': prev_close,
+                '今开': float(row['open']),
+                '最高': float(row['high']),
+                '最低': float(row['low']),
+            }
+            print(f"  ✅ {name}: {close:.2f} ({indices[name]['涨跌幅']:+.2f}%)")
+        
+        if indices:
+            print(f"✅ 成功获取 {len(indices)} 个指数数据")
+        else:
+            print("❌ 未获取到任何指数数据")
+        return indices
+    
+    def fetch_market_stats(self) -> Dict:
+        """
+        市场统计：优先使用仓库中的当日全市场快照（与实时运行的计算完全相同），
+        其次使用仓库中的统计值，最后只由涨停/跌停/炸板股池统计涨跌停
+        """
+        import pandas as pd
+        
+        try:
+            self.get_market_snapshot()
+            return super().fetch_market_stats()
+        except LookupError:
+            pass
+        
+        print(f"\n📈 正在获取 {self.trade_date} 市场统计数据...")
+        stats = self._empty_market_stats()
+        
+        archived = self._warehouse_rows('market_stats_daily')
+        if archived is not None:
+            row = archived.iloc[0]
+            for field in archived.columns:
+                if pd.notna(row[field]):
+                    stats[field] = int(row[field])
+            if stats['上涨家数'] is not None and stats['下跌家数'] is not None:
+                stats['涨跌比'] = f"{stats['上涨家数']}/{stats['下跌家数']}"
+                print(f"  ✅ 上涨: {stats['上涨家数']} | 下跌: {stats['下跌家数']} | 平盘: {stats['平盘家数']}（数据仓库）")
+        else:
+            date = self.trade_date.replace('-', '')
+            pools = {
+                '涨停家数': 'stock_zt_pool_em',
+                '跌停家数': 'stock_zt_pool_dtgc_em',
+                '炸板家数': 'stock_zt_pool_zbgc_em',
+            }
+            for field, endpoint in pools.items():
+                try:
+                    stats[field] = len(self._call(endpoint, date=date))
+                except Exception as e:
+                    # 股池获取失败时为 None（报告中省略），不能当作 0 家
+                    stats[field] = None
+                    print(f"  ⚠️ 获取{field}失败: {e}")
+        
+        if stats['涨跌比'] is None:
+            # 部分字段缺失时整体视为不可用，报告中省略涨跌家数
+            stats.update(dict.fromkeys(('上涨家数', '下跌家数', '平盘家数', '总家数')))
+            print("  ⚠️ 没有当日全市场快照，涨跌家数不可用")
+        
+        if '炸板家数' in stats:
+            if stats['涨停家数'] is None or stats['炸板家数'] is None:
+                stats['封板率'] = None
+            else:
+                touched = stats['涨停家数'] + stats['炸板家数']
+                stats['封板率'] = f"{stats['涨停家数'] / touched * 100:.1f}%" if touched else '0.0%'
+        print(f"  ✅ 涨停: {stats['涨停家数']} | 跌停: {stats['跌停家数']} | 炸板: {stats.get('炸板家数')}")
+        return stats
+    
+    def fetch_sector_data(self, top_n: Optional[int] = None, bottom_n: Optional[int] = None) -> Dict:
+        """板块涨跌：优先使用仓库中的当日排名，否则由各行业板块日线排序"""
+        print(f"\n📊 正在获取 {self.trade_date} 板块数据...")
+        top_n = top_n or self.sector_top_n
+        bottom_n = bottom_n or self.sector_bottom_n
+        
+        archived = self._warehouse_rows('sector_daily')
+        if archived is not None:
+            archived = archived.sort_values(['direction', 'rank'])
+            result = {
+                '领涨板块': [
+                    {'板块名称': row.板块名称, '涨跌幅': float(row.涨跌幅), '领涨股票': '-'}
+                    for row in archived[archived['direction'] == '领涨'].head(top_n).itertuples()
+                ],
+                '领跌板块': [
+                    {'板块名称': row.板块名称, '涨跌幅': float(row.涨跌幅), '领跌股票': '-'}
+                    for row in archived[archived['direction'] == '领跌'].head(bottom_n).itertuples()
+                ],
+            }
+            print(f"  ✅ 领涨 {len(result['领涨板块'])} 个 / 领跌 {len(result['领跌板块'])} 个（数据仓库）")
+            return result
+        
+        try:
+            df = self.source.board_changes(self.trade_date)
+            df['领涨股票'] = '-'
+            result = {
+                '领涨板块': top_n_records(
+                    df, '涨跌幅', top_n,
+                    columns={'板块名称': '板块名称', '涨跌幅': '涨跌幅', '领涨股票': '领涨股票'},
+                    numeric={'涨跌幅': 1}
+                ),
+                '领跌板块': top_n_records(
+                    df, '涨跌幅', bottom_n,
+                    columns={'板块名称': '板块名称', '涨跌幅': '涨跌幅', '领涨股票': '领跌股票'},
+                    largest=False,
+                    numeric={'涨跌幅': 1}
+                ),
+            }
+            if result['领涨板块']:
+                print(f"  ✅ 领涨板块: {result['领涨板块'][0]['板块名称']} ({result['领涨板块'][0]['涨跌幅']:+.2f}%)")
+            return result
+        except Exception as e:
+            print(f"❌ 获取板块数据失败: {e}")
+            return self._empty_sector_data()
+    
+    def fetch_capital_flow(self, top_n: Optional[int] = None) -> Dict:
+        """个股资金流向：只有仓库中归档过的交易日可用"""
+        print(f"\n💰 正在获取 {self.trade_date} 资金流向数据...")
+        top_n = top_n or self.capital_flow_top_n
+        
+        archived = self._warehouse_rows('capital_flow_daily')
+        if archived is None:
+            print("  ⚠️ 历史个股资金流向不可用（数据仓库中没有当日数据）")
+            return self._empty_capital_flow()
+        
+        archived = archived.sort_values(['direction', 'rank'])
+        result = {}
+        for direction, key in (('净流入', '净流入TOP10'), ('净流出', '净流出TOP10')):
+            rows = archived[archived['direction'] == direction].head(top_n)
+            result[key] = [
+                {'股票名称': row.股票名称, '股票代码': row.股票代码, direction: float(row.金额), '涨跌幅': float(row.涨跌幅)}
+                for row in rows.itertuples()
+            ]
+        print(f"  ✅ 净流入 {len(result['净流入TOP10'])} 只 / 净流出 {len(result['净流出TOP10'])} 只（数据仓库）")
+        return result
+    
+    def fetch_north_bound_flow(self) -> Dict:
+        """北向资金当日值及截至当日的多日累计"""
+        print(f"\n🌏 正在获取 {self.trade_date} 北向资金数据...")
+        
+        try:
+            north = {}
+            history = {}
+            for channel in NORTH_CHANNELS:
+                df = self.source.north_frame(channel)
+                value_col = '当日资金流入' if '当日资金流入' in df.columns else df.columns[-1]
+                values = df.loc[df.index <= self.trade_date, value_col].astype(float)
+                north[channel] = float(values.loc[self.trade_date]) if self.trade_date in values.index else 0.0
+                history[channel] = values.to_numpy()
+            north['合计'] = north['沪股通'] + north['深股通']
+            
+            for window in DEFAULT_WINDOWS:
+                if all(len(values) >= window for values in history.values()):
+                    north[f'{window}日累计'] = float(sum(values[-window:].sum() for values in history.values()))
+            
+            print(f"  ✅ 合计: {north['合计']:.2f}亿")
+            return north
+        except Exception as e:
+            print(f"❌ 获取北向资金失败: {e}")
+            return self._empty_north_bound_flow()
+    
+    def fetch_index_indicators(self) -> Dict:
+        """截至当日的指数均线"""
+        indicators = {}
+        for name in INDEX_SYMBOLS:
+            try:
+                df = self.source.index_frame(name)
+            except Exception:
+                continue
+            closes = df.loc[df.index <= self.trade_date, 'close'].astype(float).to_numpy()
+            values = {f'MA{window}': float(closes[-window:].mean()) for window in DEFAULT_WINDOWS if len(closes) >= window}
+            if values:
+                indicators[name] = values
+        return indicators
+    
+    def _fetch_tasks(self) -> Dict[str, tuple]:
+        tasks = super()._fetch_tasks()
+        tasks['技术指标'] = (self.fetch_index_indicators, dict)
+        return tasks
+    
+    def fetch_all_data(self, concurrent: Optional[bool] = None) -> Dict:
+        """
+        获取当日市场数据
+        
+        仓库中已有当日完整 market_data 时直接使用（重新生成报告不再请求网络），
+        否则按数据源分别从仓库或 AkShare 历史接口获取。
+        """
+        if self.reuse_archived and self.warehouse is not None:
+            archived = self.warehouse.load_market_data(self.trade_date)
+            # 早期归档的占位市场统计（涨跌家数为 0）不复用
+            if archived and (archived.get('市场统计') or {}).get('总家数'):
+                archived.pop('近期走势', None)
+                print(f"✅ 使用数据仓库中 {self.trade_date} 的归档数据（获取于 {archived.get('获取时间')}）")
+                return archived
+        
+        self.warehouse_hits = set()
+        market_data = super().fetch_all_data(concurrent)
+        market_data['获取时间'] = f"{self.trade_date} 收盘"
+        market_data['数据来源'] = f"{HISTORY_SOURCE} + {WAREHOUSE_SOURCE}" if self.warehouse_hits else HISTORY_SOURCE
+        return market_data
+
+
+def make_source(start_date: str, end_date: str, cache: Optional[DataFrameCache] = None, limiter=None) -> HistoricalSource:
+    """创建回补区间共用的历史序列（数据获取器使用给定的缓存和并发上限）"""
+    fetcher = AStockDataFetcher(cache=cache, limiter=limiter)
+    return HistoricalSource(fetcher, start_date, end_date)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史序列增量同步模块
+
+为每个序列（指数日线、沪股通/深股通）在本地数据仓库中记录高水位（已同步到的
+最新交易日），每次只请求或合并比高水位更新的数据，并基于本地数据计算
+5/20/60 日累计和均线，不再每次下载多年历史只为读取最后一行。
+
+高水位只推进到已收盘的交易日：盘中同步写入的当日行会在下次同步时重新获取并覆盖。
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from data_cache import current_trade_date, last_closed_trade_date
+
+
+# 指数名称 -> 东方财富日线接口代码
+INDEX_SYMBOLS = {
+    '上证指数': 'sh000001',
+    '深证成指': 'sz399001',
+    '创业板指': 'sz399006',
+    '科创50': 'sh000688',
+    '北证50': 'bj899050',
+}
+
+NORTH_CHANNELS = ('沪股通', '深股通')
+
+DEFAULT_WINDOWS = (5, 20, 60)
+
+
+def _date_column(df) -> str:
+    """识别 DataFrame 中的日期列"""
+    for name in ('date', '日期', 'trade_date'):
+        if name in df.columns:
+            return name
+    return df.columns[0]
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+
+class HistorySync:
+    """历史序列增量同步器"""
+    
+    def __init__(self, warehouse, fetcher, lookback_days: Optional[int] = None):
+        """
+        Args:
+            warehouse: MarketWarehouse 本地数据仓库
+            fetcher: AStockDataFetcher，用于调用（带缓存的）AkShare 接口
+            lookback_days: 首次同步时回溯的自然日天数，默认 200（足够计算 60 日均线）
+        """
+        self.warehouse = warehouse
+        self.fetcher = fetcher
+        self.lookback_days = lookback_days or 200
+    
+    def _is_fresh(self, series: str, trade_date: str) -> bool:
+        """高水位已到达当前交易日（即当前交易日已收盘并同步）时无需请求网络"""
+        high_water = self.warehouse.high_water_mark(series)
+        return high_water is not None and high_water >= trade_date
+    
+    def sync_index(self, name: str) -> int:
+        """
+        增量同步指数日线
+        
+        Returns:
+            新写入的行数
+        """
+        series = f"index:{name}"
+        trade_date = current_trade_date()
+        if self._is_fresh(series, trade_date):
+            return 0
+        
+        high_water = self.warehouse.high_water_mark(series)
+        if high_water:
+            start = datetime.strptime(high_water, "%Y-%m-%d") + timedelta(days=1)
+        else:
+            start = datetime.strptime(trade_date, "%Y-%m-%d") - timedelta(days=self.lookback_days)
+        
+        df = self.fetcher._call(
+            'stock_zh_index_daily_em',
+            symbol=INDEX_SYMBOLS[name],
+            start_date=start.strftime("%Y%m%d"),
+            end_date=trade_date.replace('-', '')
+        )
+        if df is None or df.empty:
+            return 0
+        
+        date_col = _date_column(df)
+        dates = [str(d)[:10] for d in df[date_col]]
+        fields = [df[c].tolist() if c in df.columns else [None] * len(df)
+                  for c in ('open', 'high', 'low', 'close', 'volume', 'amount')]
+        rows = [
+            (date, *(_to_float(column[i]) for column in fields))
+            for i, date in enumerate(dates)
+        ]
+        return self.warehouse.merge_history(series, rows, synced_at=trade_date,
+                                            closed_through=last_closed_trade_date())
+    
+    def sync_north_bound(self, channel: str) -> int:
+        """
+        增量同步北向资金（沪股通/深股通）
+        
+        接口只提供完整历史，因此高水位已是当前交易日时跳过请求，
+        否则只合并比高水位更新的行（包括盘中写入、尚未计入高水位的当日行）。
+        
+        Returns:
+            新写入的行数
+        """
+        series = f"north:{channel}"
+        trade_date = current_trade_date()
+        if self._is_fresh(series, trade_date):
+            return 0
+        
+        df = self.fetcher._call('stock_em_hsgt_north_net_flow_in', indicator=channel)
+        if df is None or df.empty:
+            return 0
+        
+        date_col = _date_column(df)
+        value_col = '当日资金流入' if '当日资金流入' in df.columns else df.columns[-1]
+        
+        high_water = self.warehouse.high_water_mark(series)
+        dates = df[date_col].astype(str).str[:10]
+        if high_water:
+            newer = (dates > high_water).to_numpy()
+            df = df[newer]
+            dates = dates[newer]
+        
+        rows = [
+            (date, None, None, None, _to_float(value), None, None)
+            for date, value in zip(dates, df[value_col])
+        ]
+        return self.warehouse.merge_history(series, rows, synced_at=trade_date,
+                                            closed_through=last_closed_trade_date())
+    
+    def sync_all(self) -> Dict[str, int]:
+        """同步所有序列，返回每个序列新写入的行数"""
+        results = {}
+        for name in INDEX_SYMBOLS:
+            try:
+                results[f"index:{name}"] = self.sync_index(name)
+            except Exception as e:
+                print(f"  ⚠️ 同步 {name} 日线失败: {e}")
+        for channel in NORTH_CHANNELS:
+            try:
+                results[f"north:{channel}"] = self.sync_north_bound(channel)
+            except Exception as e:
+                print(f"  ⚠️ 同步 {channel} 历史失败: {e}")
+        return results
+    
+    def latest(self, series: str, field: str = 'close') -> Optional[float]:
+        """序列最新一个交易日的值"""
+        df = self.warehouse.load_history(series, 1, columns=[field])
+        if df.empty:
+            return None
+        return _to_float(df[field].iloc[-1])
+    
+    def rolling(self, series: str, windows: Sequence[int] = DEFAULT_WINDOWS, how: str = 'mean') -> Dict[int, Optional[float]]:
+        """
+        基于本地数据计算滚动窗口统计
+        
+        Args:
+            series: 序列名
+            windows: 窗口长度（交易日）
+            how: mean 为均线，sum 为累计
+        
+        Returns:
+            {窗口: 数值}，本地数据不足一个窗口时为 None
+        """
+        df = self.warehouse.load_history(series, max(windows), columns=['close'])
+        values = df['close'].to_numpy(dtype=float)
+        result = {}
+        for window in windows:
+            if len(values) < window:
+                result[window] = None
+                continue
+            tail = values[-window:]
+            result[window] = float(tail.mean() if how == 'mean' else tail.sum())
+        return result
+    
+    def north_bound_summary(self, windows: Sequence[int] = DEFAULT_WINDOWS) -> Dict:
+        """
+        北向资金当日及多日累计（亿元）
+        
+        本地最新数据不是当前交易日时（当日数据尚未发布或同步失败），
+        在 数据日期 中标注数值实际所属的交易日。
+        """
+        summary = {}
+        dates = []
+        for channel in NORTH_CHANNELS:
+            df = self.warehouse.load_history(f"north:{channel}", 1, columns=['close'])
+            if df.empty:
+                summary[channel] = 0
+                continue
+            summary[channel] = _to_float(df['close'].iloc[-1]) or 0
+            dates.append(str(df['trade_date'].iloc[-1]))
+        summary['合计'] = summary['沪股通'] + summary['深股通']
+        
+        trade_date = current_trade_date()
+        if dates and min(dates) != trade_date:
+            summary['数据日期'] = min(dates)
+        
+        for window in windows:
+            totals = [self.rolling(f"north:{channel}", (window,), how='sum')[window] for channel in NORTH_CHANNELS]
+            if all(total is not None for total in totals):
+                summary[f'{window}日累计'] = sum(totals)
+        return summary
+    
+    def index_indicators(self, names: Optional[List[str]] = None, windows: Sequence[int] = DEFAULT_WINDOWS) -> Dict:
+        """各指数的均线"""
+        indicators = {}
+        for name in names or INDEX_SYMBOLS:
+            averages = self.rolling(f"index:{name}", windows, how='mean')
+            values = {f'MA{window}': value for window, value in averages.items() if value is not None}
+            if values:
+                indicators[name] = values
+        return indicators
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告 HTML 渲染模块
+
+复用同一个 markdown.Markdown 转换器和预先拼好的页面模板，
+并按报告内容哈希缓存渲染结果，邮件、归档等场景共用同一份 HTML。
+"""
+
+import hashlib
+import html
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+REPORT_CSS = """
+body {
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+    line-height: 1.6;
+    color: #333;
+    max-width: 1200px;
+    margin: 0 auto;
+    padding: 20px;
+    background-color: #f5f5f5;
+}
+h1, h2, h3 {
+    color: #2c3e50;
+    border-bottom: 2px solid #3498db;
+    padding-bottom: 10px;
+}
+table {
+    border-collapse: collapse;
+    width: 100%;
+    margin: 20px 0;
+    background-color: white;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+}
+th {
+    background-color: #3498db;
+    color: white;
+    padding: 12px;
+    text-align: left;
+}
+td {
+    padding: 10px;
+    border-bottom: 1px solid #ddd;
+}
+tr:hover {
+    background-color: #f5f5f5;
+}
+code {
+    background-color: #f4f4f4;
+    padding: 2px 6px;
+    border-radius: 3px;
+    font-family: 'Courier New', monospace;
+}
+blockquote {
+    border-left: 4px solid #3498db;
+    padding-left: 20px;
+    margin: 20px 0;
+    color: #666;
+}
+.positive {
+    color: #e74c3c;
+    font-weight: bold;
+}
+.negative {
+    color: #27ae60;
+    font-weight: bold;
+}
+"""
+
+# 页面模板在导入时拼好，渲染时只需拼接正文
+HTML_HEAD = (
+    "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"UTF-8\">\n"
+    f"<style>{REPORT_CSS}</style>\n</head>\n<body>\n"
+)
+HTML_TAIL = "\n</body>\n</html>\n"
+
+MARKDOWN_EXTENSIONS = ['tables', 'fenced_code', 'nl2br']
+
+# 页面模板和转换扩展参与缓存键：修改样式或扩展后，磁盘上旧的渲染结果不再命中
+TEMPLATE_DIGEST = hashlib.sha256(
+    "\0".join([HTML_HEAD, HTML_TAIL, *MARKDOWN_EXTENSIONS]).encode('utf-8')
+).hexdigest()[:16]
+
+
+class HtmlRenderer:
+    """Markdown 报告 HTML 渲染器"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, memory_entries: int = 16, disk_entries: int = 64):
+        """
+        Args:
+            cache_dir: 磁盘缓存目录，默认读取 HTML_CACHE_DIR（默认 .cache/html），设为空字符串则只用内存缓存
+            memory_entries: 内存中保留的渲染结果数量
+            disk_entries: 磁盘上保留的渲染结果数量（按修改时间淘汰最旧的）
+        """
+        if cache_dir is None:
+            cache_dir = os.getenv('HTML_CACHE_DIR', os.path.join('.cache', 'html'))
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._converter = None
+        self._converter_loaded = False
+    
+    def _get_converter(self):
+        """创建（一次）可复用的 markdown 转换器，没有安装 markdown 库时返回 None"""
+        if not self._converter_loaded:
+            try:
+                import markdown
+                self._converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+            except ImportError:
+                self._converter = None
+            self._converter_loaded = True
+        return self._converter
+    
+    @staticmethod
+    def content_key(markdown_content: str) -> str:
+        """报告内容与页面模板的哈希"""
+        return hashlib.sha256(f"{TEMPLATE_DIGEST}\0{markdown_content}".encode('utf-8')).hexdigest()
+    
+    def _cache_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.html")
+    
+    def convert(self, markdown_content: str) -> str:
+        """只转换正文（不含页面模板，不使用缓存）"""
+        with self._lock:
+            converter = self._get_converter()
+            if converter is None:
+                # 没有 markdown 库时原样显示（需转义）
+                return f"<pre>{html.escape(markdown_content)}</pre>"
+            converter.reset()
+            return converter.convert(markdown_content)
+    
+    def render(self, markdown_content: str) -> str:
+        """
+        渲染完整的 HTML 页面
+        
+        依次查找内存缓存和磁盘缓存，未命中时转换并写入缓存。
+        """
+        key = self.content_key(markdown_content)
+        
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                return cached
+        
+        path = self._cache_path(key)
+        page = None
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    page = f.read()
+            except OSError:
+                page = None
+        
+        if page is None:
+            page = HTML_HEAD + self.convert(markdown_content) + HTML_TAIL
+            # 没有 markdown 库时的纯文本页面不写入磁盘，安装后不会继续命中
+            if path and self._get_converter() is not None:
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        f.write(page)
+                    os.replace(tmp_path, path)
+                    self._evict_disk()
+                except OSError as e:
+                    print(f"[WARN] ⚠️ 写入 HTML 缓存失败: {e}")
+        
+        with self._lock:
+            self._memory[key] = page
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+        return page
+    
+    def _evict_disk(self):
+        """磁盘缓存超过 disk_entries 个文件时删除最旧的"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.html'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.disk_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_default_renderer: Optional[HtmlRenderer] = None
+_default_lock = threading.Lock()
+
+
+def get_renderer() -> HtmlRenderer:
+    """进程内共享的渲染器"""
+    global _default_renderer
+    with _default_lock:
+        if _default_renderer is None:
+            _default_renderer = HtmlRenderer()
+        return _default_renderer
+
+
+def render_report_html(markdown_content: str) -> str:
+    """使用共享渲染器渲染报告"""
+    return get_renderer().render(markdown_content)
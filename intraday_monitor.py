@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘中轮询模块
+
+交易时段内每隔 N 分钟获取一次全市场行情，只与上一次快照做向量化对比：
+新增涨停/开板、涨跌家数变化、领涨板块轮动。只有发生变化的股票写入历史数据仓库，
+变化超过阈值时才调用 AI 模型生成一段简短的盘中快讯。
+
+内存中只保留上一次的快照和判定结果，整个交易日内存占用保持平稳。
+
+用法: python intraday_monitor.py [--interval 5] [--once] [--no-notes]
+"""
+
+import os
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from data_cache import DataFrameCache, current_trade_date
+from metrics import span
+
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+# 连续竞价时段（北京时间）
+TRADING_SESSIONS = (((9, 30), (11, 30)), ((13, 0), (15, 0)))
+
+# 记录变化时比较的列
+DIFF_COLUMNS = ('最新价', '成交量')
+
+FLASH_SYSTEM_INSTRUCTION = "你是一个专业的A股市场分析师。你必须严格基于提供的盘中数据进行分析，不能编造或修改任何数值。你必须使用中文回复。"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def in_trading_session(now: datetime) -> bool:
+    """是否处于连续竞价时段（不处理节假日）"""
+    if now.weekday() >= 5:
+        return False
+    minute = (now.hour, now.minute)
+    return any(start <= minute < end for start, end in TRADING_SESSIONS)
+
+
+def next_session_start(now: datetime) -> Optional[datetime]:
+    """当日下一个交易时段的开始时间，当日已收盘时返回 None"""
+    if now.weekday() >= 5:
+        return None
+    for (start_h, start_m), _ in TRADING_SESSIONS:
+        start = now.replace(hour=start_h, minute=start_m, second=0, microsecond=0)
+        if now < start:
+            return start
+    return None
+
+
+def _rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return usage / 1024 / 1024 if os.uname().sysname == 'Darwin' else usage / 1024
+
+
+class SnapshotState:
+    """一次轮询后需要保留到下一次对比的数据"""
+    
+    __slots__ = ('snapshot', 'codes', 'limit_up', 'stats', 'top_sectors')
+    
+    def __init__(self, snapshot, codes, limit_up, stats: Dict, top_sectors: List[str]):
+        self.snapshot = snapshot
+        self.codes = codes
+        self.limit_up = limit_up
+        self.stats = stats
+        self.top_sectors = top_sectors
+
+
+class IntradayMonitor:
+    """盘中轮询与增量对比"""
+    
+    def __init__(
+        self,
+        fetcher=None,
+        warehouse=None,
+        ai_manager=None,
+        interval: Optional[float] = None,
+        sector_top_n: Optional[int] = None,
+        limit_up_threshold: Optional[int] = None,
+        breadth_threshold: Optional[float] = None,
+        rotation_threshold: Optional[int] = None,
+        note_cooldown: Optional[float] = None,
+        output_dir: str = os.path.join("reports", "intraday")
+    ):
+        """
+        Args:
+            fetcher: AStockDataFetcher，默认创建一个不使用缓存的实例（盘中数据需要实时获取）
+            warehouse: MarketWarehouse，为空时不保存变化
+            ai_manager: MultiModelManager，为空时不生成快讯
+            interval: 轮询间隔（分钟），默认读取 INTRADAY_INTERVAL（默认 5）
+            sector_top_n: 板块轮动比较的领涨板块数量，默认读取 INTRADAY_SECTOR_TOP_N（默认 10）
+            limit_up_threshold: 新增涨停或开板家数达到该值时生成快讯，默认读取 INTRADAY_LIMIT_UP_THRESHOLD（默认 10）
+            breadth_threshold: 上涨家数占比变化达到该百分点时生成快讯，默认读取 INTRADAY_BREADTH_THRESHOLD（默认 10）
+            rotation_threshold: 新进入领涨板块的数量达到该值时生成快讯，默认读取 INTRADAY_ROTATION_THRESHOLD（默认 3）
+            note_cooldown: 两次快讯之间的最短间隔（分钟），默认读取 INTRADAY_NOTE_COOLDOWN（默认 30）
+            output_dir: 快讯输出目录
+        """
+        if fetcher is None:
+            from fetch_data import AStockDataFetcher
+            
+            fetcher = AStockDataFetcher(cache=DataFrameCache(enabled=False))
+        self.fetcher = fetcher
+        self.warehouse = warehouse
+        self.ai_manager = ai_manager
+        self.interval = interval or _env_float('INTRADAY_INTERVAL', 5)
+        self.sector_top_n = sector_top_n or int(_env_float('INTRADAY_SECTOR_TOP_N', 10))
+        self.limit_up_threshold = limit_up_threshold or int(_env_float('INTRADAY_LIMIT_UP_THRESHOLD', 10))
+        self.breadth_threshold = breadth_threshold or _env_float('INTRADAY_BREADTH_THRESHOLD', 10)
+        self.rotation_threshold = rotation_threshold or int(_env_float('INTRADAY_ROTATION_THRESHOLD', 3))
+        self.note_cooldown = note_cooldown if note_cooldown is not None else _env_float('INTRADAY_NOTE_COOLDOWN', 30)
+        self.output_dir = output_dir
+        
+        self.state: Optional[SnapshotState] = None
+        # 上一次快讯后的基准状态：阈值按累计变化判断，避免缓慢变化被每次的小增量掩盖
+        self.note_base: Optional[Dict] = None
+        self.last_note_at: Optional[float] = None
+        self.polls = 0
+    
+    def _top_sectors(self) -> List[str]:
+        from frame_utils import top_n_records
+        
+        df = self.fetcher._call('stock_board_industry_name_em')
+        records = top_n_records(df, '涨跌幅', self.sector_top_n, columns={'板块名称': '板块名称'})
+        return [record['板块名称'] for record in records]
+    
+    def _capture(self) -> SnapshotState:
+        """获取当前快照并计算对比所需的数组"""
+        from market_breadth import BreadthEngine
+        from board_classifier import BoardClassifier
+        
+        fetcher = self.fetcher
+        snapshot = fetcher.get_market_snapshot(refresh=True)
+        if fetcher.breadth_engine is None:
+            fetcher.breadth_engine = BreadthEngine()
+            fetcher.board_classifier = BoardClassifier()
+        
+        stats = fetcher.breadth_engine.compute(snapshot.column('涨跌幅'))
+        _, limit_up, limit_down, broken, _ = fetcher.board_classifier.limit_flags(snapshot)
+        stats['涨停家数'] = int(limit_up.sum())
+        stats['跌停家数'] = int(limit_down.sum())
+        stats['炸板家数'] = int(broken.sum())
+        
+        try:
+            top_sectors = self._top_sectors()
+        except Exception as e:
+            print(f"  ⚠️ 获取板块数据失败: {e}")
+            top_sectors = self.state.top_sectors if self.state is not None else []
+        
+        return SnapshotState(snapshot, snapshot.code_numbers(), limit_up, stats, top_sectors)
+    
+    @staticmethod
+    def _align(previous: SnapshotState, current: SnapshotState):
+        """current 中每只股票在 previous 中的位置，不存在时为 -1"""
+        import numpy as np
+        import pandas as pd
+        
+        index = pd.Index(previous.codes)
+        if index.is_unique:
+            return index.get_indexer(current.codes)
+        # 代码重复（无法解析的代码均为 -1）时取第一次出现的位置
+        first = ~index.duplicated()
+        positions = index[first].get_indexer(current.codes)
+        return np.where(positions >= 0, np.flatnonzero(first)[positions], -1)
+    
+    def diff(self, previous: Optional[SnapshotState], current: SnapshotState) -> Tuple:
+        """
+        对比两次快照
+        
+        Returns:
+            (changed_mask, events)：changed_mask 为当前快照中需要保存的行，events 为事件摘要
+        """
+        import numpy as np
+        
+        stats = current.stats
+        total = stats.get('总家数') or 1
+        events = {
+            '上涨家数': stats['上涨家数'],
+            '下跌家数': stats['下跌家数'],
+            '涨停家数': stats['涨停家数'],
+            '跌停家数': stats['跌停家数'],
+            '领涨板块': current.top_sectors[:5],
+        }
+        if previous is None:
+            return np.ones(len(current.snapshot), dtype=bool), events
+        
+        positions = self._align(previous, current)
+        matched = positions >= 0
+        safe = np.where(matched, positions, 0)
+        
+        changed = ~matched
+        for column in DIFF_COLUMNS:
+            before = previous.snapshot.column(column)[safe]
+            after = current.snapshot.column(column)
+            with np.errstate(invalid='ignore'):
+                changed |= matched & (before != after) & ~(np.isnan(before) & np.isnan(after))
+        
+        was_limit_up = matched & previous.limit_up[safe]
+        new_limit_up = current.limit_up & ~was_limit_up
+        # 上一次涨停、本次未封住的股票
+        opened = np.zeros(len(previous.codes), dtype=bool)
+        opened[positions[matched & ~current.limit_up]] = True
+        opened &= previous.limit_up
+        
+        names = current.snapshot.column('名称')
+        previous_total = previous.stats.get('总家数') or 1
+        events.update({
+            '新增涨停': int(new_limit_up.sum()),
+            '新增涨停股票': [str(name) for name in names[new_limit_up][:10]],
+            '开板': int(opened.sum()),
+            '上涨家数变化': stats['上涨家数'] - previous.stats['上涨家数'],
+            '下跌家数变化': stats['下跌家数'] - previous.stats['下跌家数'],
+            '上涨占比变化': round((stats['上涨家数'] / total - previous.stats['上涨家数'] / previous_total) * 100, 2),
+            '新进领涨板块': [name for name in current.top_sectors if name not in previous.top_sectors],
+            '退出领涨板块': [name for name in previous.top_sectors if name not in current.top_sectors],
+        })
+        return changed, events
+    
+    def triggered(self, events: Dict) -> List[str]:
+        """按上一次快讯以来的累计变化判断是否触发快讯，返回触发原因"""
+        base = self.note_base
+        if base is None:
+            return []
+        
+        reasons = []
+        total_up = events['涨停家数'] - base['涨停家数']
+        if abs(total_up) >= self.limit_up_threshold:
+            reasons.append(f"涨停家数较上次快讯{total_up:+d}")
+        if events.get('开板', 0) >= self.limit_up_threshold:
+            reasons.append(f"开板 {events['开板']} 家")
+        total = max(1, events['上涨家数'] + events['下跌家数'])
+        base_total = max(1, base['上涨家数'] + base['下跌家数'])
+        swing = (events['上涨家数'] / total - base['上涨家数'] / base_total) * 100
+        if abs(swing) >= self.breadth_threshold:
+            reasons.append(f"上涨家数占比变化 {swing:+.1f} 个百分点")
+        entered = [name for name in events['领涨板块'] if name not in base['领涨板块']]
+        if len(entered) >= min(self.rotation_threshold, len(events['领涨板块']) or 1):
+            reasons.append(f"领涨板块轮动: {'、'.join(entered)}")
+        return reasons
+    
+    def _flash_note(self, ts: str, events: Dict, reasons: List[str]) -> Optional[str]:
+        """生成并保存盘中快讯，返回文件路径"""
+        lines = [
+            f"时间：{current_trade_date()} {ts}（北京时间）",
+            f"触发原因：{'；'.join(reasons)}",
+            f"上涨 {events['上涨家数']} 家 / 下跌 {events['下跌家数']} 家（较上次轮询 {events.get('上涨家数变化', 0):+d} / {events.get('下跌家数变化', 0):+d}）",
+            f"涨停 {events['涨停家数']} 家 / 跌停 {events['跌停家数']} 家，本轮新增涨停 {events.get('新增涨停', 0)} 家，开板 {events.get('开板', 0)} 家",
+        ]
+        if events.get('新增涨停股票'):
+            lines.append(f"新增涨停股票：{'、'.join(events['新增涨停股票'])}")
+        lines.append(f"当前领涨板块：{'、'.join(events['领涨板块'])}")
+        if events.get('新进领涨板块'):
+            lines.append(f"新进领涨板块：{'、'.join(events['新进领涨板块'])}")
+        prompt = (
+            "请基于以下A股盘中数据，用 3-5 句话写一段简短的盘中快讯（Markdown，不要标题），"
+            "说明市场发生了什么变化及可能的原因，数值必须与数据一致。\n\n" + "\n".join(f"- {line}" for line in lines)
+        )
+        
+        with span('intraday.note', reasons=len(reasons)):
+            content, model_name = self.ai_manager.generate(prompt=prompt, system_instruction=FLASH_SYSTEM_INSTRUCTION)
+        
+        day_dir = os.path.join(self.output_dir, current_trade_date())
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, f"{ts.replace(':', '')[:4]}.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"# 盘中快讯 {ts}\n\n{content.strip()}\n\n---\n\n" + "\n".join(f"- {line}" for line in lines)
+                    + f"\n\n*模型: {model_name}*\n")
+        return path
+    
+    def poll_once(self) -> Dict:
+        """
+        执行一次轮询
+        
+        Returns:
+            本次的事件摘要（附带 changed 变化股票数和 note 快讯路径）
+        """
+        ts = datetime.now(BEIJING_TZ).strftime("%H:%M:%S")
+        with span('intraday.poll') as s:
+            current = self._capture()
+            changed, events = self.diff(self.state, current)
+            events['changed'] = int(changed.sum())
+            
+            if self.warehouse is not None:
+                from data_warehouse import INTRADAY_FIELDS
+                
+                columns = ['代码', *(field for field in INTRADAY_FIELDS if field in current.snapshot.frame.columns)]
+                rows = current.snapshot.frame.loc[changed, columns]
+                with span('intraday.persist', rows=len(rows)):
+                    self.warehouse.append_intraday(ts, rows, current.stats, events['changed'], events)
+            
+            # 只保留本次快照，上一次的快照随之释放
+            self.state = current
+            self.polls += 1
+            
+            reasons = self.triggered(events)
+            if self.note_base is None:
+                self.note_base = events
+            cooling = self.last_note_at is not None and time.time() - self.last_note_at < self.note_cooldown * 60
+            if reasons and self.ai_manager is not None and not cooling:
+                try:
+                    events['note'] = self._flash_note(ts, events, reasons)
+                    self.last_note_at = time.time()
+                    self.note_base = events
+                except Exception as e:
+                    print(f"[WARN] ⚠️ 盘中快讯生成失败: {e}")
+            events['reasons'] = reasons
+            s.set(changed=events['changed'], rss_mb=_rss_mb(), triggered=bool(reasons))
+        
+        self._print_poll(ts, events)
+        return events
+    
+    def _print_poll(self, ts: str, events: Dict):
+        rss = _rss_mb()
+        print(f"[{ts}] 变化 {events['changed']} 只 | 上涨 {events['上涨家数']}({events.get('上涨家数变化', 0):+d}) "
+              f"下跌 {events['下跌家数']}({events.get('下跌家数变化', 0):+d}) | 涨停 {events['涨停家数']} "
+              f"新增 {events.get('新增涨停', 0)} 开板 {events.get('开板', 0)}"
+              + (f" | 内存峰值 {rss:.0f}MB" if rss is not None else ""))
+        if events.get('新进领涨板块'):
+            print(f"  🔄 新进领涨板块: {'、'.join(events['新进领涨板块'])}")
+        for reason in events.get('reasons', []):
+            print(f"  ⚡ {reason}")
+        if events.get('note'):
+            print(f"  📝 盘中快讯: {events['note']}")
+    
+    def run(self, max_polls: Optional[int] = None):
+        """
+        在交易时段内按固定间隔轮询，收盘后返回
+        
+        Args:
+            max_polls: 最多轮询次数（用于测试），默认不限
+        """
+        print(f"⏱️ 盘中轮询已启动，间隔 {self.interval:g} 分钟")
+        next_at = time.time()
+        while max_polls is None or self.polls < max_polls:
+            now = datetime.now(BEIJING_TZ)
+            if not in_trading_session(now):
+                start = next_session_start(now)
+                if start is None:
+                    print("🔚 今日已收盘，结束轮询")
+                    return
+                wait = (start - now).total_seconds()
+                print(f"💤 非交易时段，{start:%H:%M} 开始轮询（等待 {wait / 60:.0f} 分钟）")
+                time.sleep(wait)
+                next_at = time.time()
+                continue
+            
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"[WARN] ⚠️ 本次轮询失败: {e}")
+            
+            # 按固定节拍轮询，单次耗时不会累积成漂移
+            next_at += self.interval * 60
+            time.sleep(max(0.0, next_at - time.time()))
+
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="A股盘中轮询")
+    parser.add_argument('--interval', type=float, help="轮询间隔（分钟），默认读取 INTRADAY_INTERVAL（默认 5）")
+    parser.add_argument('--once', action='store_true', help="只轮询一次（不检查交易时段）")
+    parser.add_argument('--no-notes', action='store_true', help="不调用 AI 模型生成快讯")
+    parser.add_argument('--no-warehouse', action='store_true', help="不保存变化到历史数据仓库")
+    args = parser.parse_args()
+    
+    from dotenv import load_dotenv
+    import metrics
+    from logger_config import setup_logger, get_log_file_path, get_metrics_file_path
+    
+    load_dotenv()
+    setup_logger(log_file=get_log_file_path())
+    metrics.configure(get_metrics_file_path())
+    
+    warehouse = None
+    if not args.no_warehouse:
+        from data_warehouse import MarketWarehouse
+        
+        warehouse = MarketWarehouse()
+    
+    ai_manager = None
+    if not args.no_notes:
+        from multi_model_client import MultiModelManager
+        
+        try:
+            ai_manager = MultiModelManager()
+        except ValueError as e:
+            print(f"[WARN] ⚠️ {e}，不生成盘中快讯")
+    
+    monitor = IntradayMonitor(warehouse=warehouse, ai_manager=ai_manager, interval=args.interval)
+    try:
+        if args.once:
+            monitor.poll_once()
+        else:
+            monitor.run()
+    except KeyboardInterrupt:
+        print("\n⏹️ 已停止轮询")
+    finally:
+        metrics.print_summary()
+        if warehouse is not None:
+            warehouse.close()
+
+
+if __name__ == "__main__":
+    main()
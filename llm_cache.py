@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI 模型响应缓存模块
+
+以 (模型, 系统指令, 提示词, 生成参数) 的 SHA-256 作为键，将生成结果保存为 JSON 文件，
+同一晚重跑（如邮件发送失败后重试）时直接返回已生成的报告，不再消耗 token。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from data_cache import _env_flag
+
+
+logger = logging.getLogger('a-stock-report.llm_cache')
+
+
+class LLMResponseCache:
+    """AI 模型响应缓存"""
+    
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        enabled: Optional[bool] = None,
+        bypass: Optional[bool] = None
+    ):
+        """
+        初始化缓存
+        
+        Args:
+            cache_dir: 缓存目录，默认读取 LLM_CACHE_DIR（默认 .cache/llm）
+            max_bytes: 缓存总大小上限，默认读取 LLM_CACHE_MAX_MB（默认 50MB）
+            enabled: 是否启用缓存，默认读取 LLM_CACHE（默认开启）
+            bypass: 跳过读取缓存、强制重新生成（结果仍会写入缓存），默认读取 LLM_CACHE_BYPASS
+        """
+        self.cache_dir = cache_dir or os.getenv('LLM_CACHE_DIR', os.path.join('.cache', 'llm'))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('LLM_CACHE_MAX_MB', '50')) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        if enabled is None:
+            enabled = _env_flag('LLM_CACHE', True)
+        self.enabled = enabled
+        if bypass is None:
+            bypass = _env_flag('LLM_CACHE_BYPASS', False)
+        self.bypass = bypass
+        
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(model: str, system_instruction: str, prompt: str, params: Optional[Dict] = None) -> str:
+        """计算缓存键"""
+        material = json.dumps(
+            {
+                'model': model,
+                'system_instruction': system_instruction or '',
+                'prompt': prompt,
+                'params': params or {},
+            },
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+    
+    def _key_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        读取缓存
+        
+        Returns:
+            {'content', 'model', 'created_at'}；未命中、已禁用或 bypass 时返回 None
+        """
+        if not self.enabled or self.bypass:
+            return None
+        
+        path = self._key_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"AI 响应缓存文件损坏，已忽略: {path} ({e})")
+            self.misses += 1
+            return None
+        
+        # 更新访问时间，供按大小淘汰时使用（LRU）
+        try:
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+        except OSError:
+            pass
+        
+        self.hits += 1
+        age = time.time() - entry.get('created_at', time.time())
+        logger.info(f"命中 AI 响应缓存: {entry.get('model')} key={key[:12]} (生成于 {age / 60:.0f} 分钟前)")
+        return entry
+    
+    def put(self, key: str, content: str, model: str):
+        """写入缓存（先写临时文件再原子替换）"""
+        if not self.enabled or not content:
+            return
+        
+        path = self._key_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {'content': content, 'model': model, 'created_at': time.time()}
+        
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logger.info(f"写入 AI 响应缓存: {model} key={key[:12]} ({len(content)} 字符)")
+        
+        self._evict(keep=path)
+    
+    def _evict(self, keep: Optional[str] = None):
+        """缓存总大小超过上限时，按最近访问时间从旧到新删除（保留刚写入的 keep）"""
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith('.json'):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, path))
+                    total += stat.st_size
+            
+            if total <= self.max_bytes:
+                return
+            
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
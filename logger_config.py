@@ -71,3 +71,13 @@ def get_log_file_path():
     os.makedirs(log_dir, exist_ok=True)
     
     return os.path.join(log_dir, f"report_{date_str}.log")
+
+
+def get_metrics_file_path():
+    """
+    获取步骤耗时明细（JSON Lines）文件路径，与日志文件同目录同日期
+    
+    Returns:
+        str: 明细文件路径
+    """
+    return os.path.splitext(get_log_file_path())[0] + ".spans.jsonl"
@@ -4,18 +4,67 @@
 主程序：生成报告并发送邮件 - 多模型版本
 """
 
+import argparse
 import os
 import sys
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 from generate_report import AStockReportGenerator
-from send_email import EmailSender
+from send_email import default_subject, parse_recipients
+from delivery_queue import DeliveryQueue, DeliveryWorker
+from logger_config import setup_logger, get_log_file_path, get_metrics_file_path
+import metrics
+from metrics import span
 
 # 加载 .env 文件（本地运行时使用，GitHub Actions 会直接使用 Secrets）
 load_dotenv()
 
 
-def main():
+def load_recipients() -> list:
+    """
+    读取收件人列表
+    
+    RECIPIENT_EMAIL 可填写多个邮箱（逗号或分号分隔）；
+    RECIPIENT_LIST_FILE 指向的文件每行一个邮箱（# 开头为注释），两者合并去重。
+    """
+    recipients = parse_recipients(os.getenv('RECIPIENT_EMAIL'))
+    list_file = os.getenv('RECIPIENT_LIST_FILE')
+    if list_file:
+        try:
+            with open(list_file, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f if not line.strip().startswith('#')]
+            recipients += parse_recipients("\n".join(lines))
+        except OSError as e:
+            print(f"⚠️  读取收件人列表失败: {e}")
+    return list(dict.fromkeys(recipients))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数（只依赖标准库，--help 不会加载数据和模型相关模块）"""
+    parser = argparse.ArgumentParser(
+        description="A股晚间复盘报告：获取市场数据、生成报告并投递邮件",
+        epilog="配置项见 .env.example；重新投递未发送的邮件请运行 python delivery_queue.py"
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', metavar='DIR', help="真实运行并把行情数据和 AI 接口响应录制到夹具目录")
+    mode.add_argument('--replay', metavar='DIR', help="使用夹具目录离线回放整条流程（不访问网络、不发送真实邮件）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    # 录制/回放：替换行情数据源、AI 接口连接和 SMTP 服务器
+    fixture = None
+    if args.record or args.replay:
+        from replay import FixtureSession
+        
+        fixture = FixtureSession(args.record or args.replay, 'record' if args.record else 'replay')
+    
+    # 运行日志（AI 响应缓存命中等记录）及各步骤耗时明细
+    setup_logger(log_file=get_log_file_path())
+    metrics.configure(get_metrics_file_path())
+    
     # 使用北京时间
     beijing_tz = timezone(timedelta(hours=8))
     beijing_time = datetime.now(beijing_tz).strftime('%Y-%m-%d %H:%M:%S')
@@ -69,45 +118,66 @@ def main():
         print("步骤 1/2: 生成报告")
         print("=" * 80)
         
-        generator = AStockReportGenerator()
-        report_content = generator.generate_report()
-        report_filepath = generator.save_report(report_content)
+        with span('main.generate'):
+            with span('main.init'):
+                generator = AStockReportGenerator(**(fixture.generator_kwargs() if fixture else {}))
+            report_content = generator.generate_report(fixture.trade_date if fixture else None)
+            report_filepath = generator.save_report(report_content)
         
         print(f"\n✅ 报告生成完成: {report_filepath}")
         print()
         
         print("=" * 80)
-        print("步骤 2/2: 发送邮件")
+        print("步骤 2/2: 投递邮件")
         print("=" * 80)
         
-        recipient_email = os.getenv('RECIPIENT_EMAIL')
-        if not recipient_email:
+        # 投递任务先写入发件箱，由后台线程发送；SMTP 卡住或失败不影响已生成的报告
+        recipients = load_recipients()
+        if fixture is not None:
+            recipients = fixture.recipients(recipients)
+        queue = DeliveryQueue(db_path=fixture.queue_path if fixture else None)
+        if not recipients:
             print("⚠️  未设置 RECIPIENT_EMAIL，跳过邮件发送")
             print("💡 提示: 设置 RECIPIENT_EMAIL 以启用邮件发送")
         else:
-            try:
-                print(f"收件人: {recipient_email}")
-                sender = EmailSender()
-                success = sender.send_report(recipient_email, report_filepath)
-                
-                if success:
-                    print("✅ 邮件发送成功")
-                else:
-                    print("⚠️ 邮件发送失败")
-                    print("💡 报告已生成，请手动查看")
-            except Exception as e:
-                print(f"⚠️  邮件错误: {e}")
-                print("💡 报告已生成，请手动查看")
+            print(f"收件人: {', '.join(recipients[:5])}" + (f" 等 {len(recipients)} 人" if len(recipients) > 5 else ""))
+            queued = queue.enqueue(recipients, report_filepath, default_subject())
+            print(f"📮 已加入发件箱: {queued} 封（{queue.db_path}）")
+        
+        worker = None
+        if queue.next_due() is not None:
+            worker = DeliveryWorker(queue, sender=fixture.email_sender() if fixture else None)
+            worker.start(wait=float(os.getenv('DELIVERY_RETRY_WAIT', '120')))
         
         print()
         print("=" * 80)
-        print("✅ 任务完成！")
+        print("✅ 报告已生成")
         print(f"📄 报告文件: {report_filepath}")
         print("=" * 80)
+        
+        if worker is not None:
+            with span('main.deliver_wait'):
+                finished = worker.join(timeout=float(os.getenv('DELIVERY_TIMEOUT', '300')))
+            stats = queue.stats()
+            if not finished:
+                print("⚠️ 邮件投递超时，未完成的邮件将在下次运行时继续发送")
+            elif stats['pending'] or stats['sending']:
+                print(f"⚠️ {stats['pending'] + stats['sending']} 封邮件待重试，可运行 python delivery_queue.py 继续发送")
+            elif stats['dead']:
+                print(f"⚠️ {stats['dead']} 封邮件投递失败，可运行 python delivery_queue.py --retry-dead 重新发送")
+            else:
+                print("✅ 邮件发送成功")
+        
+        print()
+        metrics.print_summary()
+        print()
+        print("=" * 80)
+        print("✅ 任务完成！")
+        print("=" * 80)
         print()
         
         return 0
-        
+    
     except Exception as e:
         print()
         print("=" * 80)
@@ -117,7 +187,12 @@ def main():
         import traceback
         traceback.print_exc()
         
+        metrics.print_summary()
         return 1
+    
+    finally:
+        if fixture is not None:
+            fixture.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+市场宽度计算模块
+
+对涨跌幅列做一次 searchsorted + bincount，得到所有分档计数，
+不再为每个统计口径生成一份布尔过滤后的 DataFrame 副本。
+同一个 BreadthEngine 可重复用于盘中的多次快照。
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+# 分档边界（%）：±1/±3/±5 常规分档，±9.9/±19.9/±29.9 对应主板/创业板科创板/北交所涨跌停
+DEFAULT_EDGES = (-29.9, -19.9, -9.9, -5.0, -3.0, -1.0, 0.0, 1.0, 3.0, 5.0, 9.9, 19.9, 29.9)
+
+# 涨跌分布（名称, 下界, 上界）；区间为 [下界, 上界)，下跌一侧为 (下界, 上界]，均不含 0
+DISTRIBUTION_BINS = (
+    ('涨幅≥9.9%', 9.9, None),
+    ('5%~9.9%', 5.0, 9.9),
+    ('3%~5%', 3.0, 5.0),
+    ('1%~3%', 1.0, 3.0),
+    ('0~1%', 0.0, 1.0),
+    ('-1%~0', -1.0, 0.0),
+    ('-3%~-1%', -3.0, -1.0),
+    ('-5%~-3%', -5.0, -3.0),
+    ('-9.9%~-5%', -9.9, -5.0),
+    ('跌幅≥9.9%', None, -9.9),
+)
+
+
+class BreadthEngine:
+    """市场宽度计算器"""
+    
+    def __init__(self, edges: Sequence[float] = DEFAULT_EDGES):
+        """
+        Args:
+            edges: 分档边界，必须包含 0
+        """
+        edges = sorted(set(float(e) for e in edges))
+        if 0.0 not in edges:
+            raise ValueError("分档边界必须包含 0")
+        # 末尾追加 +inf：NaN 会落在 +inf 之后，获得单独的编码，无需额外的 isnan 扫描
+        self.edges = np.asarray(edges + [np.inf], dtype=np.float64)
+        self._position = {e: i for i, e in enumerate(edges)}
+        self._edges_by_dtype: Dict[np.dtype, np.ndarray] = {}
+    
+    def _edges_for(self, dtype: np.dtype) -> np.ndarray:
+        """按数据精度转换边界（float32 下 9.9 与 9.9 的 float64 表示不相等）"""
+        edges = self._edges_by_dtype.get(dtype)
+        if edges is None:
+            edges = self.edges.astype(dtype)
+            self._edges_by_dtype[dtype] = edges
+        return edges
+    
+    def counts(self, pct: np.ndarray) -> np.ndarray:
+        """
+        计算每个编码的个数
+        
+        对第 k 个边界 e[k]：编码 2k 表示 e[k-1] < x < e[k]，编码 2k+1 表示 x == e[k]。
+        最后一个编码为 NaN。
+        
+        Args:
+            pct: 涨跌幅数组（%）
+        """
+        pct = np.asarray(pct)
+        if pct.dtype.kind != 'f':
+            pct = pct.astype(np.float64)
+        edges = self._edges_for(pct.dtype)
+        codes = np.searchsorted(edges, pct, side='left')
+        codes += np.searchsorted(edges, pct, side='right')
+        return np.bincount(codes, minlength=2 * len(edges) + 1)
+    
+    def _below(self, cumulative: np.ndarray, edge: float, inclusive: bool) -> int:
+        """小于（或小于等于）edge 的个数"""
+        k = self._position[edge]
+        return int(cumulative[2 * k + (2 if inclusive else 1)])
+    
+    def compute(
+        self,
+        pct: np.ndarray,
+        limit_up_pct: Optional[np.ndarray] = None,
+        limit_down_pct: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        计算市场宽度统计
+        
+        Args:
+            pct: 涨跌幅数组（%）
+            limit_up_pct: 每只股票的涨停阈值（%），默认统一使用 9.9
+            limit_down_pct: 每只股票的跌停阈值（%，负数），默认统一使用 -9.9
+        
+        Returns:
+            与 fetch_market_stats 相同口径的统计字典，附带涨跌分布
+        """
+        pct = np.asarray(pct)
+        bins = self.counts(pct)
+        # cumulative[c] 为编码小于 c 的个数
+        cumulative = np.concatenate(([0], np.cumsum(bins)))
+        valid = int(cumulative[-2])
+        
+        def below(edge, inclusive=False):
+            return self._below(cumulative, edge, inclusive)
+        
+        def at_least(edge):
+            return valid - below(edge)
+        
+        up_count = valid - below(0.0, inclusive=True)
+        down_count = below(0.0)
+        flat_count = valid - up_count - down_count
+        
+        if limit_up_pct is None:
+            limit_up = at_least(9.9)
+        else:
+            limit_up = int(np.count_nonzero(pct >= np.asarray(limit_up_pct, dtype=pct.dtype)))
+        if limit_down_pct is None:
+            limit_down = below(-9.9, inclusive=True)
+        else:
+            limit_down = int(np.count_nonzero(pct <= np.asarray(limit_down_pct, dtype=pct.dtype)))
+        
+        distribution = {}
+        for name, low, high in DISTRIBUTION_BINS:
+            if high is None:
+                count = at_least(low)
+            elif low is None:
+                count = below(high, inclusive=True)
+            elif low >= 0:
+                # 上涨一侧 [low, high)，0 本身计入平盘
+                count = below(high) - below(low, inclusive=(low == 0.0))
+            else:
+                # 下跌一侧 (low, high]，0 本身计入平盘
+                count = below(high, inclusive=(high != 0.0)) - below(low, inclusive=True)
+            distribution[name] = count
+        
+        return {
+            '上涨家数': up_count,
+            '下跌家数': down_count,
+            '平盘家数': flat_count,
+            '总家数': int(len(pct)),
+            '涨跌比': f"{up_count}/{down_count}",
+            '涨停家数': limit_up,
+            '跌停家数': limit_down,
+            '涨跌分布': distribution,
+        }
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场行情快照模块
+
+每次运行只下载一次 A股实时行情（stock_zh_a_spot_em），以紧凑的列式结构保存，
+供市场统计、资金流向及报告各部分直接查询，无需重复请求。
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, List, Optional
+
+
+# 快照保留的列及其存储类型
+# 价格、涨跌幅使用 float32；成交额、市值数值较大，保留 float64 以免损失精度
+SNAPSHOT_COLUMNS: Dict[str, str] = {
+    '代码': 'category',
+    '名称': 'category',
+    '最新价': 'float32',
+    '涨跌幅': 'float32',
+    '涨跌额': 'float32',
+    '成交量': 'float64',
+    '成交额': 'float64',
+    '振幅': 'float32',
+    '最高': 'float32',
+    '最低': 'float32',
+    '今开': 'float32',
+    '昨收': 'float32',
+    '量比': 'float32',
+    '换手率': 'float32',
+    '总市值': 'float64',
+    '流通市值': 'float64',
+}
+
+
+class MarketSnapshot:
+    """全市场行情快照"""
+    
+    def __init__(self, frame, fetched_at: Optional[str] = None):
+        """
+        Args:
+            frame: 已压缩的行情 DataFrame（使用 from_spot 构建）
+            fetched_at: 获取时间（北京时间）
+        """
+        self.frame = frame
+        if fetched_at is None:
+            beijing_tz = timezone(timedelta(hours=8))
+            fetched_at = datetime.now(beijing_tz).strftime("%Y-%m-%d %H:%M:%S")
+        self.fetched_at = fetched_at
+        self._code_numbers = None
+    
+    @classmethod
+    def from_spot(cls, df, fetched_at: Optional[str] = None) -> 'MarketSnapshot':
+        """
+        由 AkShare 原始行情表构建快照
+        
+        只保留 SNAPSHOT_COLUMNS 中存在的列，并转换为紧凑类型。
+        """
+        import pandas as pd
+        
+        columns = {}
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            if name not in df.columns:
+                continue
+            series = df[name]
+            if dtype == 'category':
+                columns[name] = series.astype(str).astype('category')
+            else:
+                columns[name] = pd.to_numeric(series, errors='coerce').astype(dtype)
+        
+        frame = pd.DataFrame(columns)
+        frame.reset_index(drop=True, inplace=True)
+        return cls(frame, fetched_at)
+    
+    def __len__(self) -> int:
+        return len(self.frame)
+    
+    def column(self, name: str):
+        """返回指定列的 NumPy 数组（不复制）"""
+        return self.frame[name].to_numpy()
+    
+    def codes(self):
+        """返回股票代码数组"""
+        return self.frame['代码'].to_numpy(dtype=object)
+    
+    def code_numbers(self):
+        """
+        返回数字形式的股票代码数组（int64）
+        
+        只对去重后的代码做一次转换，无法转换的代码记为 -1。
+        """
+        if self._code_numbers is None:
+            import numpy as np
+            import pandas as pd
+            
+            codes = self.frame['代码']
+            categories = pd.to_numeric(codes.cat.categories, errors='coerce')
+            categories = np.nan_to_num(np.asarray(categories, dtype=np.float64), nan=-1).astype(np.int64)
+            self._code_numbers = categories[codes.cat.codes.to_numpy()]
+        return self._code_numbers
+    
+    def lookup(self, codes: Iterable[str], columns: Optional[List[str]] = None):
+        """
+        按股票代码查询快照
+        
+        Args:
+            codes: 股票代码列表
+            columns: 需要的列，默认全部
+        
+        Returns:
+            以代码为索引的 DataFrame，不存在的代码会被忽略
+        """
+        frame = self.frame
+        mask = frame['代码'].isin(list(codes)).to_numpy()
+        selected = frame.loc[mask, columns] if columns else frame.loc[mask]
+        selected.index = frame['代码'][mask].astype(str).to_numpy()
+        return selected
+    
+    def memory_usage(self) -> int:
+        """快照占用的内存（字节）"""
+        return int(self.frame.memory_usage(deep=True).sum())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行耗时与指标记录模块
+
+用 span 上下文管理器（或 timed 装饰器）包住数据获取、提示词构建、模型调用、
+SMTP 发送等步骤，每个步骤结束时以一行 JSON 追加到日志目录下的 .spans.jsonl 文件，
+运行结束时按步骤汇总输出耗时表，便于定位每晚运行的时间花在哪里。
+
+未调用 configure 时只在内存中汇总，不写文件。
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class Span:
+    """一个被计时的步骤"""
+    
+    __slots__ = ('name', 'attrs', 'parent', 'started_at', 'start', 'duration', 'status', 'error')
+    
+    def __init__(self, name: str, attrs: Dict, parent: Optional[str]):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.status = 'ok'
+        self.error = None
+    
+    def set(self, **attrs):
+        """补充属性（如返回行数、token 数）"""
+        self.attrs.update(attrs)
+    
+    def elapsed(self) -> float:
+        """从开始到现在的秒数"""
+        return time.perf_counter() - self.start
+    
+    def to_dict(self, run_id: str) -> Dict:
+        record = {
+            'run': run_id,
+            'span': self.name,
+            'parent': self.parent,
+            'ts': round(self.started_at, 3),
+            'ms': round(self.duration * 1000, 2),
+            'status': self.status,
+            'thread': threading.current_thread().name,
+        }
+        if self.error:
+            record['error'] = self.error
+        record.update(self.attrs)
+        return record
+
+
+class MetricsRecorder:
+    """收集本次运行的所有 span，并写入 JSON Lines 文件"""
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.run_id = uuid.uuid4().hex[:12]
+        # 只保留按名称汇总的结果，长时间运行（盘中轮询）内存不随 span 数量增长
+        self._rows: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def configure(self, path: Optional[str]):
+        """设置输出文件（为空时只在内存中汇总）"""
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+    
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        stack = self._stack()
+        current = Span(name, attrs, stack[-1].name if stack else None)
+        stack.append(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.status = 'error'
+            current.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            current.duration = current.elapsed()
+            stack.pop()
+            self._record(current)
+    
+    def _record(self, span: Span):
+        record = span.to_dict(self.run_id)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            row = self._rows.setdefault(span.name, {'span': span.name, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'errors': 0})
+            row['count'] += 1
+            row['total_ms'] += record['ms']
+            row['max_ms'] = max(row['max_ms'], record['ms'])
+            if span.status != 'ok':
+                row['errors'] += 1
+            if self.path:
+                try:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(line + "\n")
+                except OSError:
+                    # 指标写入失败不影响报告生成
+                    self.path = None
+    
+    def summary(self) -> List[Dict]:
+        """按 span 名称汇总：次数、总耗时、最大耗时、失败次数，按总耗时从大到小排列"""
+        with self._lock:
+            rows = [dict(row) for row in self._rows.values()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+    
+    def print_summary(self, title: str = "各步骤耗时"):
+        rows = self.summary()
+        if not rows:
+            return
+        width = max(len(row['span']) for row in rows) + 2
+        print("-" * 80)
+        print(title)
+        print("-" * 80)
+        print(f"{'步骤':<{width}}{'次数':>6}{'总耗时(s)':>12}{'最大(s)':>10}{'失败':>6}")
+        for row in rows:
+            print(f"{row['span']:<{width}}{row['count']:>6}{row['total_ms'] / 1000:>12.2f}"
+                  f"{row['max_ms'] / 1000:>10.2f}{row['errors']:>6}")
+        if self.path:
+            print(f"明细: {self.path}")
+
+
+# 进程内共享的记录器
+recorder = MetricsRecorder()
+
+
+def configure(path: Optional[str]):
+    """设置 span 输出文件"""
+    recorder.configure(path)
+
+
+def span(name: str, **attrs):
+    """
+    记录一个步骤的耗时
+    
+    用法:
+        with span('fetch.index', source='stock_zh_index_spot_em') as s:
+            df = ...
+            s.set(rows=len(df))
+    """
+    return recorder.span(name, **attrs)
+
+
+def timed(name: Optional[str] = None, **attrs) -> Callable:
+    """span 的装饰器形式，默认以函数名为步骤名"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with recorder.span(span_name, **attrs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def print_summary(title: str = "各步骤耗时"):
+    """输出本次运行的耗时汇总表"""
+    recorder.print_summary(title)
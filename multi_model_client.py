@@ -5,20 +5,205 @@
 """
 
 import os
+import json
+import time
+import queue
+import random
+import threading
+import socket
 import requests
-from typing import Optional, Dict
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import Callable, Optional, Dict, Iterator, List
+
+from concurrency_limits import ConcurrencyLimiter
+from llm_cache import LLMResponseCache
+from metrics import span
+from prompt_compactor import estimate_tokens
+
+
+# 可重试的 HTTP 状态码：限流与服务端临时错误
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+# 自定义会话工厂（录制/回放时替换真实连接），参数为 base_url 和默认创建的会话
+_session_factory: Optional[Callable[[str, requests.Session], object]] = None
+
+
+def get_session(base_url: str) -> requests.Session:
+    """
+    按 base_url 复用连接池，同一服务的多次调用不再重复 TCP/TLS 握手
+    """
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['Accept-Encoding'] = 'gzip, deflate'
+            if _session_factory is not None:
+                session = _session_factory(base_url, session)
+            _sessions[base_url] = session
+        return session
+
+
+def set_session_factory(factory: Optional[Callable[[str, requests.Session], object]]):
+    """
+    替换 AI 接口使用的会话（需提供与 requests.Session.post 相同的 post 方法），为空时恢复默认
+
+    已创建的会话会被丢弃，之后的调用按新工厂重新创建。
+    """
+    global _session_factory
+    with _sessions_lock:
+        _session_factory = factory
+        _sessions.clear()
+
+
+# 当前线程收到响应时的回调（竞速调用借此在其他线程取消时关闭连接）
+_response_hooks = threading.local()
+
+
+def _abort_response(response):
+    """关闭响应；阻塞在读取上的线程随底层连接关闭立即返回"""
+    try:
+        sock = response.raw._fp.fp.raw._sock
+    except AttributeError:
+        sock = None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    try:
+        response.close()
+    except Exception:
+        pass
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或 HTTP 日期）"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PartialGenerationError(Exception):
+    """流式生成中途失败，partial 为已收到的内容"""
+    
+    def __init__(self, partial: str, cause: Exception):
+        super().__init__(f"流式生成中断（已接收 {len(partial)} 字符）: {cause}")
+        self.partial = partial
+        self.cause = cause
 
 
 class AIModelClient:
     """AI 模型客户端基类"""
     
+    base_url = ""
+    
     def __init__(self, api_key: str, model_name: str):
         self.api_key = api_key
         self.model_name = model_name
+        # 采样参数（参与响应缓存键计算）
+        self.generation_params: Dict = {}
+        # 429/5xx 及连接错误的重试次数和退避参数
+        self.max_retries = int(os.getenv('AI_MAX_RETRIES', '3'))
+        self.retry_base_delay = float(os.getenv('AI_RETRY_BASE_DELAY', '2'))
+        self.retry_max_delay = float(os.getenv('AI_RETRY_MAX_DELAY', '60'))
     
     def generate(self, prompt: str, system_instruction: str = "") -> str:
         """生成内容"""
         raise NotImplementedError
+    
+    def cache_key(self, prompt: str, system_instruction: str = "") -> str:
+        """响应缓存键：模型、系统指令、提示词和采样参数的哈希"""
+        provider = type(self).__name__.replace('Client', '')
+        return LLMResponseCache.make_key(
+            f"{provider}/{self.model_name}", system_instruction, prompt, self.generation_params
+        )
+    
+    def _post(self, url: str, payload: Dict, headers: Dict, stream: bool = False, timeout: float = 300) -> requests.Response:
+        """
+        通过复用的连接池发送 POST 请求
+        
+        遇到 429/5xx 或连接错误（含连接超时）时按指数退避加随机抖动重试，优先遵循 Retry-After；
+        服务端要求的等待时间超过 retry_max_delay 时不再等待，直接抛出交由故障转移处理。
+        读取超时说明服务端已接受请求但迟迟不响应，重试只会再等一个超时，直接抛出。
+        流式请求只在开始接收内容之前重试。
+        
+        Returns:
+            状态码正常的响应
+        """
+        session = get_session(self.base_url)
+        name = type(self).__name__.replace('Client', '')
+        
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                # 流式请求在收到响应头时返回，耗时即为等待服务端开始响应的时间
+                with span('llm.http', provider=name, attempt=attempt + 1, stream=stream) as s:
+                    response = session.post(url, json=payload, headers=headers, timeout=timeout, stream=stream)
+                    s.set(status_code=response.status_code)
+            except requests.exceptions.ReadTimeout:
+                raise
+            except requests.exceptions.ConnectionError as e:
+                if last_attempt:
+                    raise
+                reason, wait = f"{type(e).__name__}", None
+            else:
+                if response.status_code not in RETRYABLE_STATUS or last_attempt:
+                    response.raise_for_status()
+                    on_response = getattr(_response_hooks, 'on_response', None)
+                    if on_response is not None:
+                        on_response(response)
+                    return response
+                reason, wait = f"HTTP {response.status_code}", _retry_after(response)
+                if wait is not None and wait > self.retry_max_delay:
+                    response.raise_for_status()
+                response.close()
+            
+            if wait is None:
+                wait = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+            print(f"[WARN] ⚠️ {name} {reason}，{wait:.1f}s 后重试 ({attempt + 1}/{self.max_retries})")
+            time.sleep(wait)
+    
+    def generate_stream(self, prompt: str, system_instruction: str = "") -> Iterator[str]:
+        """流式生成内容，逐段返回文本；默认退化为一次性返回"""
+        yield self.generate(prompt, system_instruction)
+    
+    @staticmethod
+    def _iter_sse(response: requests.Response) -> Iterator[Dict]:
+        """解析 Server-Sent Events 响应，逐个返回 data 字段中的 JSON"""
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+            yield json.loads(data)
+    
+    def _stream_chat_completions(self, url: str, payload: Dict, headers: Dict) -> Iterator[str]:
+        """OpenAI 兼容接口（StepFun、火山引擎）的流式调用"""
+        payload = dict(payload, stream=True)
+        with self._post(url, payload, headers, stream=True) as response:
+            response.encoding = 'utf-8'
+            for event in self._iter_sse(response):
+                choices = event.get('choices') or []
+                if not choices:
+                    continue
+                text = (choices[0].get('delta') or {}).get('content')
+                if text:
+                    yield text
 
 
 class GeminiClient(AIModelClient):
@@ -27,16 +212,18 @@ class GeminiClient(AIModelClient):
     def __init__(self, api_key: str, model_name: str = "gemini-2.5-pro"):
         super().__init__(api_key, model_name)
         self.base_url = "https://generativelanguage.googleapis.com/v1"
+        self.generation_params = {
+            "temperature": 0.3,
+            "maxOutputTokens": 8192,
+            "topP": 0.95,
+            "topK": 40
+        }
     
-    def generate(self, prompt: str, system_instruction: str = "") -> str:
-        """调用 Gemini API"""
-        print(f"[INFO] 使用 Gemini 模型: {self.model_name}")
-        
-        url = f"{self.base_url}/models/{self.model_name}:generateContent?key={self.api_key}"
-        
+    def _build_payload(self, prompt: str, system_instruction: str) -> Dict:
+        """构建 Gemini 请求体"""
         full_prompt = f"{system_instruction}\n\n{prompt}" if system_instruction else prompt
         
-        payload = {
+        return {
             "contents": [
                 {
                     "parts": [
@@ -46,18 +233,18 @@ class GeminiClient(AIModelClient):
                     ]
                 }
             ],
-            "generationConfig": {
-                "temperature": 0.3,
-                "maxOutputTokens": 8192,
-                "topP": 0.95,
-                "topK": 40
-            }
+            "generationConfig": dict(self.generation_params)
         }
+    
+    def generate(self, prompt: str, system_instruction: str = "") -> str:
+        """调用 Gemini API"""
+        print(f"[INFO] 使用 Gemini 模型: {self.model_name}")
         
+        url = f"{self.base_url}/models/{self.model_name}:generateContent?key={self.api_key}"
+        payload = self._build_payload(prompt, system_instruction)
         headers = {"Content-Type": "application/json"}
         
-        response = requests.post(url, json=payload, headers=headers, timeout=300)
-        response.raise_for_status()
+        response = self._post(url, payload, headers)
         
         result = response.json()
         
@@ -67,6 +254,22 @@ class GeminiClient(AIModelClient):
             return content
         else:
             raise Exception("Gemini API 返回格式异常")
+    
+    def generate_stream(self, prompt: str, system_instruction: str = "") -> Iterator[str]:
+        """流式调用 Gemini API (streamGenerateContent)"""
+        print(f"[INFO] 使用 Gemini 模型 (流式): {self.model_name}")
+        
+        url = f"{self.base_url}/models/{self.model_name}:streamGenerateContent?alt=sse&key={self.api_key}"
+        payload = self._build_payload(prompt, system_instruction)
+        headers = {"Content-Type": "application/json"}
+        
+        with self._post(url, payload, headers, stream=True) as response:
+            response.encoding = 'utf-8'
+            for event in self._iter_sse(response):
+                for candidate in event.get('candidates', [])[:1]:
+                    for part in candidate.get('content', {}).get('parts', []):
+                        if part.get('text'):
+                            yield part['text']
 
 
 class StepFunClient(AIModelClient):
@@ -75,11 +278,13 @@ class StepFunClient(AIModelClient):
     def __init__(self, api_key: str, model_name: str = "step-2-16k"):
         super().__init__(api_key, model_name)
         self.base_url = "https://api.stepfun.com/v1"
+        self.generation_params = {
+            "temperature": 0.3,
+            "max_tokens": 16000
+        }
     
-    def generate(self, prompt: str, system_instruction: str = "") -> str:
-        """调用 StepFun API"""
-        print(f"[INFO] 使用 StepFun 模型: {self.model_name}")
-        
+    def _build_request(self, prompt: str, system_instruction: str) -> tuple:
+        """构建请求地址、请求体和请求头"""
         url = f"{self.base_url}/chat/completions"
         
         messages = []
@@ -96,8 +301,7 @@ class StepFunClient(AIModelClient):
         payload = {
             "model": self.model_name,
             "messages": messages,
-            "temperature": 0.3,
-            "max_tokens": 16000
+            **self.generation_params
         }
         
         headers = {
@@ -105,14 +309,27 @@ class StepFunClient(AIModelClient):
             "Content-Type": "application/json"
         }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=300)
-        response.raise_for_status()
+        return url, payload, headers
+    
+    def generate(self, prompt: str, system_instruction: str = "") -> str:
+        """调用 StepFun API"""
+        print(f"[INFO] 使用 StepFun 模型: {self.model_name}")
+        
+        url, payload, headers = self._build_request(prompt, system_instruction)
+        response = self._post(url, payload, headers)
         
         result = response.json()
         content = result['choices'][0]['message']['content']
         
         print(f"[INFO] ✅ StepFun 生成成功 (长度: {len(content)} 字符)")
         return content
+    
+    def generate_stream(self, prompt: str, system_instruction: str = "") -> Iterator[str]:
+        """流式调用 StepFun API"""
+        print(f"[INFO] 使用 StepFun 模型 (流式): {self.model_name}")
+        
+        url, payload, headers = self._build_request(prompt, system_instruction)
+        yield from self._stream_chat_completions(url, payload, headers)
 
 
 class DeepSeekClient(AIModelClient):
@@ -122,11 +339,13 @@ class DeepSeekClient(AIModelClient):
         super().__init__(api_key, model_name)
         # 火山引擎的 API 端点
         self.base_url = "https://ark.cn-beijing.volces.com/api/v3"
+        self.generation_params = {
+            "temperature": 0.3,
+            "max_tokens": 8000
+        }
     
-    def generate(self, prompt: str, system_instruction: str = "") -> str:
-        """调用 DeepSeek API (火山引擎)"""
-        print(f"[INFO] 使用 DeepSeek 模型 (火山引擎): {self.model_name}")
-        
+    def _build_request(self, prompt: str, system_instruction: str) -> tuple:
+        """构建请求地址、请求体和请求头"""
         url = f"{self.base_url}/chat/completions"
         
         messages = []
@@ -143,8 +362,7 @@ class DeepSeekClient(AIModelClient):
         payload = {
             "model": self.model_name,
             "messages": messages,
-            "temperature": 0.3,
-            "max_tokens": 8000
+            **self.generation_params
         }
         
         headers = {
@@ -152,20 +370,161 @@ class DeepSeekClient(AIModelClient):
             "Content-Type": "application/json"
         }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=300)
-        response.raise_for_status()
+        return url, payload, headers
+    
+    def generate(self, prompt: str, system_instruction: str = "") -> str:
+        """调用 DeepSeek API (火山引擎)"""
+        print(f"[INFO] 使用 DeepSeek 模型 (火山引擎): {self.model_name}")
+        
+        url, payload, headers = self._build_request(prompt, system_instruction)
+        response = self._post(url, payload, headers)
         
         result = response.json()
         content = result['choices'][0]['message']['content']
         
         print(f"[INFO] ✅ DeepSeek (火山引擎) 生成成功 (长度: {len(content)} 字符)")
         return content
+    
+    def generate_stream(self, prompt: str, system_instruction: str = "") -> Iterator[str]:
+        """流式调用 DeepSeek API (火山引擎)"""
+        print(f"[INFO] 使用 DeepSeek 模型 (火山引擎, 流式): {self.model_name}")
+        
+        url, payload, headers = self._build_request(prompt, system_instruction)
+        yield from self._stream_chat_completions(url, payload, headers)
+
+
+def _output_attrs(name: str, content: str) -> Dict:
+    """模型输出的字符数、字节数和估算 token 数（记入耗时明细）"""
+    return {
+        'chars_out': len(content),
+        'bytes_out': len(content.encode('utf-8')),
+        'tokens_out': estimate_tokens(content, name),
+    }
+
+
+def _call_span(name: str, client: AIModelClient, prompt: str, system_instruction: str, kind: str, **attrs):
+    """单次模型调用的 span，附带输入 token 估算"""
+    return span(
+        kind,
+        provider=name,
+        model=client.model_name,
+        tokens_in=estimate_tokens(f"{system_instruction}\n\n{prompt}", name),
+        **attrs
+    )
+
+
+def _parse_costs(spec: str) -> Dict[str, float]:
+    """解析 "Gemini=2,StepFun=1" 形式的模型成本配置"""
+    costs = {}
+    for item in spec.split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip():
+            costs[name.strip().lower()] = float(value)
+    return costs
+
+
+class _RaceTask:
+    """竞速模式下单个模型的后台调用"""
+    
+    def __init__(self, name: str, client: AIModelClient, cost: float, limiter: ConcurrencyLimiter):
+        self.name = name
+        self.client = client
+        self.cost = cost
+        self.limiter = limiter
+        self.chunks: List[str] = []
+        self.cancelled = threading.Event()
+        self.started_at = time.time()
+        self._response = None
+        self._response_lock = threading.Lock()
+    
+    def cancel(self):
+        """取消调用并关闭进行中的响应，还未返回内容的调用也不再占用连接"""
+        self.cancelled.set()
+        with self._response_lock:
+            response = self._response
+        if response is not None:
+            _abort_response(response)
+    
+    def _attach(self, response):
+        with self._response_lock:
+            self._response = response
+        if self.cancelled.is_set():
+            _abort_response(response)
+    
+    def start(self, prompt: str, system_instruction: str, events: queue.Queue):
+        thread = threading.Thread(
+            target=self._run,
+            args=(prompt, system_instruction, events),
+            name=f"race-{self.name}",
+            daemon=True
+        )
+        thread.start()
+    
+    def _run(self, prompt: str, system_instruction: str, events: queue.Queue):
+        _response_hooks.on_response = self._attach
+        stream = self.client.generate_stream(prompt, system_instruction)
+        with _call_span(self.name, self.client, prompt, system_instruction, 'llm.race') as s, \
+                self.limiter.slot(self.name) as waited:
+            s.set(queue_ms=round(waited * 1000, 1))
+            try:
+                if self.cancelled.is_set():
+                    s.set(cancelled=True)
+                    return
+                for chunk in stream:
+                    if 'ttft_ms' not in s.attrs:
+                        s.set(ttft_ms=round(s.elapsed() * 1000, 1))
+                    if self.cancelled.is_set():
+                        s.set(cancelled=True)
+                        return
+                    events.put((self.name, 'chunk', chunk))
+                events.put((self.name, 'done', None))
+            except Exception as e:
+                if self.cancelled.is_set():
+                    # 取消时连接被关闭引起的异常
+                    s.set(cancelled=True)
+                    return
+                s.status, s.error = 'error', f"{type(e).__name__}: {e}"[:300]
+                events.put((self.name, 'error', e))
+            finally:
+                # 关闭生成器即关闭底层 HTTP 连接
+                stream.close()
+                s.set(**_output_attrs(self.name, ''.join(self.chunks)))
 
 
 class MultiModelManager:
     """多模型管理器 - 支持模型轮换和故障转移"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        race: Optional[bool] = None,
+        hedge_delay: Optional[float] = None,
+        race_budget: Optional[float] = None,
+        costs: Optional[Dict[str, float]] = None,
+        cache: Optional[LLMResponseCache] = None,
+        limiter: Optional[ConcurrencyLimiter] = None
+    ):
+        """
+        Args:
+            race: 是否启用竞速模式，默认读取 AI_RACE（默认关闭）
+            hedge_delay: 竞速模式下当前模型多少秒内没有返回首个 token 就并发启动下一个模型，
+                默认读取 AI_HEDGE_DELAY（默认 20）
+            race_budget: 同时进行中的调用的成本上限，默认读取 AI_RACE_BUDGET（默认 2）
+            costs: 各模型单次调用的成本权重，默认读取 AI_PROVIDER_COSTS（如 "Gemini=2,StepFun=1"，未配置的为 1）
+            cache: 响应缓存，默认按 LLM_CACHE* 环境变量创建
+            limiter: 各模型同时进行的调用数上限，默认读取 AI_PROVIDER_CONCURRENCY（如 "Gemini=2,DeepSeek=4"）
+                和 AI_MAX_CONCURRENCY（未单独配置的模型，默认不限制）；多个报告并发生成时应共用同一个
+        """
+        if race is None:
+            race = os.getenv('AI_RACE', '0').lower() in ('1', 'true', 'yes')
+        self.race = race
+        self.hedge_delay = hedge_delay if hedge_delay is not None else float(os.getenv('AI_HEDGE_DELAY', '20'))
+        self.race_budget = race_budget if race_budget is not None else float(os.getenv('AI_RACE_BUDGET', '2'))
+        if costs is None:
+            costs = _parse_costs(os.getenv('AI_PROVIDER_COSTS', ''))
+        self.costs = {name.lower(): cost for name, cost in costs.items()}
+        self.cache = cache or LLMResponseCache()
+        self.limiter = limiter or ConcurrencyLimiter.from_env('AI_PROVIDER_CONCURRENCY', 'AI_MAX_CONCURRENCY')
+        
         self.clients = []
         self._init_clients()
     
@@ -207,8 +566,191 @@ class MultiModelManager:
             raise ValueError("没有可用的 AI 模型客户端，请至少配置一个 API Key")
         
         print(f"[INFO] 共加载 {len(self.clients)} 个模型客户端")
+        if self.race:
+            print(f"[INFO] 竞速模式已开启 (对冲延迟 {self.hedge_delay:g}s, 并发成本上限 {self.race_budget:g})")
+    
+    def ordered_clients(self, preferred_model: Optional[str]) -> list:
+        """首选模型排在最前，其余保持加载顺序"""
+        if not preferred_model:
+            return list(self.clients)
+        preferred = [item for item in self.clients if item[0].lower() == preferred_model.lower()]
+        others = [item for item in self.clients if item[0].lower() != preferred_model.lower()]
+        return preferred + others
+    
+    def _race(self, prompt: str, system_instruction: str, preferred_model: Optional[str], stream_writer=None) -> tuple:
+        """
+        竞速模式：先调用首选模型，对冲延迟内没有收到首个 token 时并发启动下一个模型，
+        采用最先完整返回的结果并取消其余调用。
+        
+        同时进行中的调用成本之和不超过 race_budget（至少保留一个调用）；
+        某个模型失败时立即启动下一个模型，不再等待对冲延迟。
+        最先返回首个 token 的调用会实时写入 stream_writer，它失败时切换到其他已有输出的调用。
+        
+        Returns:
+            (result, errors, partial): result 为 (content, model_name)，全部失败时为 None；
+            partial 为最长的 (部分内容, 模型名称)
+        """
+        events = queue.Queue()
+        pending = self.ordered_clients(preferred_model)
+        running: Dict[str, _RaceTask] = {}
+        errors = []
+        partial = ('', None)
+        leader = None
+        
+        def launch_next() -> bool:
+            in_flight = sum(task.cost for task in running.values())
+            for i, (name, client) in enumerate(pending):
+                cost = self.costs.get(name.lower(), 1.0)
+                if running and in_flight + cost > self.race_budget:
+                    continue
+                pending.pop(i)
+                label = "对冲模型" if running or errors else "模型"
+                print(f"[INFO] 竞速启动{label}: {name}")
+                task = _RaceTask(name, client, cost, self.limiter)
+                running[name] = task
+                task.start(prompt, system_instruction, events)
+                return True
+            return False
+        
+        def promote(task: _RaceTask):
+            nonlocal leader
+            leader = task.name
+            if stream_writer is not None:
+                stream_writer.begin(task.name)
+                for chunk in task.chunks:
+                    stream_writer.write(chunk)
+        
+        launch_next()
+        deadline = time.time() + self.hedge_delay
+        try:
+            while running:
+                timeout = None
+                if leader is None and pending and deadline is not None:
+                    timeout = max(0.0, deadline - time.time())
+                try:
+                    name, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    if launch_next():
+                        deadline = time.time() + self.hedge_delay
+                    else:
+                        # 成本上限不允许再启动，等待已有调用的结果（或失败后再启动下一个）
+                        deadline = None
+                    continue
+                
+                task = running.get(name)
+                if task is None:
+                    continue
+                
+                if kind == 'chunk':
+                    task.chunks.append(payload)
+                    if leader is None:
+                        elapsed = time.time() - task.started_at
+                        print(f"[INFO] {name} 首个 token 用时 {elapsed:.1f}s")
+                        promote(task)
+                    elif leader == name and stream_writer is not None:
+                        stream_writer.write(payload)
+                    continue
+                
+                del running[name]
+                content = ''.join(task.chunks)
+                if kind == 'done' and content:
+                    print(f"\n[INFO] ✅ {name} 竞速胜出 (长度: {len(content)} 字符, 用时 {time.time() - task.started_at:.1f}s)")
+                    return (content, name), errors, partial
+                
+                error = payload if kind == 'error' else Exception(f"{name} 响应为空")
+                if content and len(content) > len(partial[0]):
+                    partial = (content, name)
+                error_msg = f"{name} 调用失败: {error}"
+                errors.append(error_msg)
+                print(f"[ERROR] {error_msg}")
+                if hasattr(error, 'response') and hasattr(error.response, 'text'):
+                    print(f"[ERROR] 响应详情: {error.response.text[:500]}")
+                
+                if leader == name:
+                    leader = None
+                    successors = [other for other in running.values() if other.chunks]
+                    if successors:
+                        print(f"[INFO] 切换到 {successors[0].name} 的输出")
+                        promote(successors[0])
+                if launch_next():
+                    deadline = time.time() + self.hedge_delay
+            return None, errors, partial
+        finally:
+            for task in running.values():
+                task.cancel()
+                print(f"[INFO] 取消 {task.name} 调用")
+    
+    def _invoke(self, name: str, client: AIModelClient, prompt: str, system_instruction: str, stream_writer=None) -> str:
+        """
+        调用单个模型
+        
+        stream_writer 不为空时使用流式接口，每收到一段内容就调用 stream_writer.write，
+        每次尝试开始前调用 stream_writer.begin(name)。
+        """
+        with _call_span(name, client, prompt, system_instruction, 'llm.call', stream=stream_writer is not None) as s, \
+                self.limiter.slot(name) as waited:
+            s.set(queue_ms=round(waited * 1000, 1))
+            if stream_writer is None:
+                content = client.generate(prompt, system_instruction)
+                s.set(**_output_attrs(name, content))
+                return content
+            
+            stream_writer.begin(name)
+            chunks = []
+            try:
+                for chunk in client.generate_stream(prompt, system_instruction):
+                    if not chunks:
+                        s.set(ttft_ms=round(s.elapsed() * 1000, 1))
+                    chunks.append(chunk)
+                    stream_writer.write(chunk)
+            except Exception as e:
+                s.set(**_output_attrs(name, ''.join(chunks)))
+                if chunks:
+                    raise PartialGenerationError(''.join(chunks), e) from e
+                raise
+            
+            content = ''.join(chunks)
+            s.set(**_output_attrs(name, content))
+            if not content:
+                raise Exception(f"{name} 流式响应为空")
+            print(f"\n[INFO] ✅ {name} 流式生成成功 (长度: {len(content)} 字符)")
+            return content
+    
+    def _cached(self, prompt: str, system_instruction: str, preferred_model: Optional[str], stream_writer=None) -> Optional[tuple]:
+        """按模型优先级查找响应缓存，命中时返回 (content, model_name)"""
+        if not self.cache.enabled or self.cache.bypass:
+            return None
+        
+        with span('llm.cache_lookup', hit=False) as s:
+            for name, client in self.ordered_clients(preferred_model):
+                entry = self.cache.get(client.cache_key(prompt, system_instruction))
+                if entry is None:
+                    continue
+                content = entry['content']
+                s.set(hit=True, provider=name, **_output_attrs(name, content))
+                if stream_writer is not None:
+                    stream_writer.begin(name)
+                    stream_writer.write(content)
+                return content, name
+        return None
+    
+    def _store(self, prompt: str, system_instruction: str, name: str, content: str):
+        """成功生成的完整内容写入响应缓存（部分内容不缓存）"""
+        for client_name, client in self.clients:
+            if client_name == name:
+                try:
+                    self.cache.put(client.cache_key(prompt, system_instruction), content, name)
+                except Exception as e:
+                    print(f"[WARN] ⚠️ 写入 AI 响应缓存失败: {e}")
+                return
     
-    def generate(self, prompt: str, system_instruction: str = "", preferred_model: Optional[str] = None) -> tuple:
+    def generate(
+        self,
+        prompt: str,
+        system_instruction: str = "",
+        preferred_model: Optional[str] = None,
+        stream_writer=None
+    ) -> tuple:
         """
         生成内容，支持模型选择和故障转移
         
@@ -216,6 +758,7 @@ class MultiModelManager:
             prompt: 用户提示词
             system_instruction: 系统指令
             preferred_model: 首选模型名称 (Gemini/StepFun/DeepSeek)
+            stream_writer: 流式输出目标（需提供 begin(model_name) 和 write(chunk)），为空时不使用流式接口
         
         Returns:
             (content, model_name): 生成的内容和使用的模型名称
@@ -224,17 +767,33 @@ class MultiModelManager:
         print("开始调用 AI 模型生成报告")
         print("=" * 80)
         
+        cached = self._cached(prompt, system_instruction, preferred_model, stream_writer)
+        if cached is not None:
+            return cached
+        
         errors = []  # 记录所有错误
+        partial = ('', None)  # 流式生成中断时保留最长的部分内容
+        
+        if self.race:
+            result, errors, partial = self._race(prompt, system_instruction, preferred_model, stream_writer)
+            if result is not None:
+                self._store(prompt, system_instruction, *result)
+                return result
         
         # 如果指定了首选模型，先尝试使用
-        if preferred_model:
+        tried = set()
+        if preferred_model and not self.race:
             for name, client in self.clients:
                 if name.lower() == preferred_model.lower():
+                    tried.add(name)
                     try:
                         print(f"[INFO] 尝试使用首选模型: {name}")
-                        content = client.generate(prompt, system_instruction)
+                        content = self._invoke(name, client, prompt, system_instruction, stream_writer)
+                        self._store(prompt, system_instruction, name, content)
                         return content, name
                     except Exception as e:
+                        if isinstance(e, PartialGenerationError) and len(e.partial) > len(partial[0]):
+                            partial = (e.partial, name)
                         error_msg = f"{name} 失败: {str(e)}"
                         errors.append(error_msg)
                         print(f"[ERROR] {error_msg}")
@@ -242,11 +801,14 @@ class MultiModelManager:
                             print(f"[ERROR] 响应详情: {e.response.text}")
                         print(f"[INFO] 尝试切换到备用模型...")
         
-        # 依次尝试所有可用的客户端
-        for name, client in self.clients:
+        # 依次尝试其余可用的客户端（竞速模式已尝试过全部模型，失败的首选模型不再重复调用）
+        for name, client in ([] if self.race else self.clients):
+            if name in tried:
+                continue
             try:
                 print(f"[INFO] 尝试使用模型: {name}")
-                content = client.generate(prompt, system_instruction)
+                content = self._invoke(name, client, prompt, system_instruction, stream_writer)
+                self._store(prompt, system_instruction, name, content)
                 return content, name
             except requests.exceptions.HTTPError as e:
                 error_msg = f"{name} HTTP 错误: {e}"
@@ -257,6 +819,8 @@ class MultiModelManager:
                     print(f"[ERROR] 响应内容: {e.response.text[:500]}")
                 print(f"[INFO] 切换到下一个模型...")
             except Exception as e:
+                if isinstance(e, PartialGenerationError) and len(e.partial) > len(partial[0]):
+                    partial = (e.partial, name)
                 error_msg = f"{name} 调用失败: {str(e)}"
                 errors.append(error_msg)
                 print(f"[ERROR] {error_msg}")
@@ -278,6 +842,12 @@ class MultiModelManager:
         print("4. 网络连接是否正常")
         print("=" * 80)
         
+        # 流式生成中途超时等情况，保留已生成的部分内容而不是全部丢弃
+        if partial[0]:
+            print(f"[WARN] ⚠️ 使用 {partial[1]} 已生成的部分内容 ({len(partial[0])} 字符)")
+            content = partial[0] + "\n\n---\n\n> ⚠️ 报告生成过程中断，以上为已生成的部分内容。\n"
+            return content, f"{partial[1]} (部分)"
+        
         raise Exception(f"所有 AI 模型都调用失败。错误: {'; '.join(errors)}")
 
 
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑提示词模块
+
+将市场数据渲染为紧凑的 Markdown 表格，按模型估算 token 数，
+并在超出 token 预算时按优先级裁剪次要段落。
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# 各模型分词器的近似比例：每个中文字符对应的 token 数，以及每个 token 对应的其他字符数
+TOKEN_RATIOS = {
+    'gemini': (1.0, 4.0),
+    'stepfun': (0.7, 3.5),
+    'deepseek': (0.6, 3.5),
+}
+DEFAULT_RATIO = (1.0, 3.5)
+
+_CJK = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+# 段落优先级：数值越小越重要，0 级段落不会被裁剪
+PRIORITY_CORE = 0
+PRIORITY_SECTOR = 1
+PRIORITY_DETAIL = 2
+PRIORITY_INDICATOR = 3
+PRIORITY_HISTORY = 4
+
+
+def estimate_tokens(text: str, provider: Optional[str] = None) -> int:
+    """
+    估算文本在指定模型下的 token 数
+    
+    按中文字符与其他字符分别折算，误差在一成左右，用于预算控制和统计，不用于计费。
+    
+    Args:
+        text: 文本
+        provider: 模型名称 (Gemini/StepFun/DeepSeek)，未知时使用保守比例
+    """
+    per_cjk, chars_per_token = TOKEN_RATIOS.get((provider or '').lower(), DEFAULT_RATIO)
+    cjk = len(_CJK.findall(text))
+    return int(cjk * per_cjk + (len(text) - cjk) / chars_per_token + 0.5)
+
+
+def _num(value, spec: str, suffix: str = '') -> str:
+    """格式化可能缺失的数值"""
+    if value is None:
+        return '-'
+    return f"{value:{spec}}{suffix}"
+
+
+def _table(header: List[str], rows: List[List[str]]) -> List[str]:
+    lines = ["|" + "|".join(header) + "|", "|" + "|".join("-" * len(header)) + "|"]
+    lines.extend("|" + "|".join(row) + "|" for row in rows)
+    return lines
+
+
+def compact_sections(market_data: Dict) -> List[Tuple[int, str, str]]:
+    """
+    将市场数据渲染为紧凑段落
+    
+    段落名称：core（指数与涨跌统计）、sector（板块）、capital（个股资金流向）、north（北向资金）、
+    breadth（分板块涨跌停与涨跌分布）、indicator（指数均线）、history（近期走势）
+    
+    Returns:
+        [(优先级, 段落名称, 段落文本)]，按输出顺序排列
+    """
+    sections = []
+    
+    lines = [
+        "## 真实市场数据（来自 AkShare）",
+        f"获取时间：{market_data['获取时间']}；来源：{market_data['数据来源']}；成交额单位亿元，涨跌幅单位%",
+        "",
+        "### 指数",
+    ]
+    lines += _table(
+        ["指数", "收盘", "涨跌幅", "涨跌点", "成交额", "最高", "最低"],
+        [
+            [name, f"{d['收盘点位']:.2f}", f"{d['涨跌幅']:+.2f}", f"{d['涨跌点']:+.2f}",
+             f"{d['成交额']:.2f}", f"{d['最高']:.2f}", f"{d['最低']:.2f}"]
+            for name, d in market_data['指数数据'].items()
+        ]
+    )
+    stats = market_data['市场统计']
+    lines.append("")
+    lines.append(
+        "### 市场统计\n"
+        + (f"上涨{stats['上涨家数']} 下跌{stats['下跌家数']} 平盘{stats['平盘家数']} 涨跌比{stats['涨跌比']} "
+           if stats.get('上涨家数') is not None else "")
+        + " ".join(f"{field[:2]}{stats[field]}" for field in ('涨停家数', '跌停家数') if stats.get(field) is not None)
+        + (f" 炸板{stats['炸板家数']} 封板率{stats['封板率']}"
+           if stats.get('炸板家数') is not None and stats.get('封板率') is not None else "")
+    )
+    sections.append((PRIORITY_CORE, 'core', "\n".join(lines)))
+    
+    sectors = market_data['板块数据']
+    lines = []
+    for title, key in (("领涨板块", '领涨板块'), ("领跌板块", '领跌板块')):
+        if sectors[key]:
+            lines.append(f"### {title}")
+            lines += _table(
+                ["#", "板块", "涨跌幅", "领涨股"],
+                [[str(i), s['板块名称'], f"{s['涨跌幅']:+.2f}", str(s.get('领涨股票', '-'))]
+                 for i, s in enumerate(sectors[key], 1)]
+            )
+    if lines:
+        sections.append((PRIORITY_SECTOR, 'sector', "\n".join(lines)))
+    
+    capital = market_data['资金流向']
+    lines = []
+    for title, key, field in (("主力净流入", '净流入TOP10', '净流入'), ("主力净流出", '净流出TOP10', '净流出')):
+        if capital[key]:
+            lines.append(f"### {title}（亿元）")
+            lines += _table(
+                ["#", "股票", field, "涨跌幅"],
+                [[str(i), s['股票名称'], f"{s[field]:.2f}", f"{s['涨跌幅']:+.2f}"]
+                 for i, s in enumerate(capital[key], 1)]
+            )
+    if lines:
+        sections.append((PRIORITY_SECTOR, 'capital', "\n".join(lines)))
+    
+    north = market_data['北向资金']
+    parts = [f"沪股通{north['沪股通']:.2f}", f"深股通{north['深股通']:.2f}", f"合计{north['合计']:.2f}"]
+    parts += [f"{key}{north[key]:.2f}" for key in ('5日累计', '20日累计', '60日累计') if key in north]
+    if '数据日期' in north:
+        parts.append(f"（数据日期{north['数据日期']}）")
+    sections.append((PRIORITY_SECTOR, 'north', "### 北向资金（亿元）\n" + " ".join(parts)))
+    
+    lines = []
+    boards = [(board, c) for board, c in stats.get('分板块涨跌停', {}).items() if c['总家数']]
+    if boards:
+        lines.append("### 分板块涨跌停")
+        lines += _table(
+            ["板块", "涨停", "跌停", "炸板"],
+            [[board, str(c['涨停']), str(c['跌停']), str(c['炸板'])] for board, c in boards]
+        )
+    distribution = stats.get('涨跌分布')
+    if distribution:
+        lines.append("### 涨跌分布\n" + " ".join(f"{name}:{count}" for name, count in distribution.items()))
+    if lines:
+        sections.append((PRIORITY_DETAIL, 'breadth', "\n".join(lines)))
+    
+    indicators = market_data.get('技术指标')
+    if indicators:
+        windows = list(dict.fromkeys(key for values in indicators.values() for key in values))
+        lines = ["### 指数均线"]
+        lines += _table(
+            ["指数", *windows],
+            [[name, *(_num(values.get(key), '.2f') for key in windows)] for name, values in indicators.items()]
+        )
+        sections.append((PRIORITY_INDICATOR, 'indicator', "\n".join(lines)))
+    
+    recent = market_data.get('近期走势')
+    if recent and len(recent) > 1:
+        lines = [f"### 近{len(recent)}个交易日"]
+        lines += _table(
+            ["交易日", "上证", "涨跌幅", "创业板", "涨跌幅", "成交额", "涨/跌", "涨停/跌停", "北向"],
+            [
+                [row['交易日'], _num(row['上证指数'], '.2f'), _num(row['上证涨跌幅'], '+.2f'),
+                 _num(row['创业板指'], '.2f'), _num(row['创业板涨跌幅'], '+.2f'), _num(row['两市成交额'], '.0f'),
+                 f"{_num(row['上涨家数'], 'd')}/{_num(row['下跌家数'], 'd')}",
+                 f"{_num(row['涨停家数'], 'd')}/{_num(row['跌停家数'], 'd')}", _num(row['北向合计'], '.2f')]
+                for row in recent
+            ]
+        )
+        sections.append((PRIORITY_HISTORY, 'history', "\n".join(lines)))
+    
+    return sections
+
+
+def fit_to_budget(
+    sections: List[Tuple[int, str, str]],
+    budget: int,
+    providers: List[str],
+    reserved: int = 0
+) -> Tuple[str, List[str]]:
+    """
+    按优先级裁剪段落，使文本在所有模型下的估算 token 数不超过预算
+    
+    从优先级最低（数值最大）的段落开始删除，同一优先级先删靠后的段落，0 级段落始终保留。
+    
+    Args:
+        sections: compact_sections 的返回值
+        budget: token 预算（针对整个提示词）
+        providers: 需要满足预算的模型名称
+        reserved: 提示词中固定部分（指令模板等）占用的 token 数
+    
+    Returns:
+        (文本, 被裁剪的段落标题列表)
+    """
+    kept = list(sections)
+    dropped = []
+    
+    def cost(items) -> int:
+        text = "\n\n".join(body for _, _, body in items)
+        return max(estimate_tokens(text, provider) for provider in providers or [None]) + reserved
+    
+    while cost(kept) > budget:
+        candidates = [i for i, (priority, _, _) in enumerate(kept) if priority > PRIORITY_CORE]
+        if not candidates:
+            break
+        victim = max(candidates, key=lambda i: (kept[i][0], i))
+        dropped.append(kept[victim][2].split("\n", 1)[0].lstrip('# '))
+        del kept[victim]
+    
+    return "\n\n".join(body for _, _, body in kept), dropped
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+录制与回放模块
+
+录制：真实运行一次完整流程，把 AkShare 返回的原始 DataFrame 和 AI 接口的请求/响应
+保存为一个夹具目录（fixture bundle）。
+回放：用本地替身代替东方财富、AI 接口和 SMTP 服务器重跑整条流程
+（fetch_all_data → 构建提示词 → MultiModelManager.generate → EmailSender），
+不访问网络，耗时只包含本项目代码本身，便于复现和对比性能。
+
+夹具目录结构:
+    manifest.json   录制信息（交易日、数据条数、AI 接口等）
+    akshare/        原始 DataFrame（与 DataFrameCache 相同的目录结构）
+    http.jsonl      AI 接口请求/响应，每行一条（不保存 API Key）
+
+用法:
+    python main.py --record fixtures/2026-10-16
+    python main.py --replay fixtures/2026-10-16
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from data_cache import DataFrameCache, current_trade_date
+
+
+# AI 接口域名 -> API Key 环境变量（回放时为录制过的模型填入占位 Key）
+PROVIDER_KEYS = {
+    'generativelanguage.googleapis.com': 'GEMINI_API_KEY',
+    'api.stepfun.com': 'STEPFUN_API_KEY',
+    'ark.cn-beijing.volces.com': 'DEEPSEEK_API_KEY',
+}
+
+# 录制时保留的响应头
+KEPT_HEADERS = ('Content-Type', 'Retry-After')
+
+REPLAY_RECIPIENT = 'replay@example.com'
+
+
+class ReplayMissError(Exception):
+    """回放时夹具中没有对应的请求"""
+
+
+def redact_url(url: str) -> str:
+    """去掉 URL 中的 API Key 查询参数"""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != 'key']
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def request_key(url: str, payload: Optional[Dict]) -> str:
+    """请求指纹：去掉 Key 后的 URL 与请求体的哈希"""
+    material = json.dumps({'url': redact_url(url), 'body': payload}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class FixtureBundle:
+    """夹具目录"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.frames_dir = os.path.join(path, 'akshare')
+        self.http_path = os.path.join(path, 'http.jsonl')
+        self.manifest_path = os.path.join(path, 'manifest.json')
+        self._lock = threading.Lock()
+    
+    def load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"夹具目录不存在或未完成录制: {self.path}") from None
+    
+    def write_manifest(self, manifest: Dict):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def add_http(self, url: str, payload: Optional[Dict], status: int, headers: Dict, body: bytes):
+        """追加一条 AI 接口请求/响应"""
+        entry = {
+            'key': request_key(url, payload),
+            'url': redact_url(url),
+            'request': payload,
+            'status': status,
+            'headers': {name: headers[name] for name in KEPT_HEADERS if name in headers},
+            'body': body.decode('utf-8', errors='replace'),
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self.http_path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+    
+    def load_http(self) -> List[Dict]:
+        if not os.path.exists(self.http_path):
+            return []
+        with open(self.http_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    def frame_count(self) -> int:
+        return sum(
+            1 for _, _, files in os.walk(self.frames_dir) for name in files if name.endswith('.pkl')
+        )
+
+
+class RecordingSession:
+    """包装真实会话，把每次 POST 的请求和响应写入夹具"""
+    
+    def __init__(self, session, bundle: FixtureBundle):
+        self._session = session
+        self._bundle = bundle
+    
+    def post(self, url: str, json: Optional[Dict] = None, headers: Optional[Dict] = None, **kwargs):
+        response = self._session.post(url, json=json, headers=headers, **kwargs)
+        if kwargs.get('stream') and response.ok:
+            self._record_stream(url, json, response)
+        else:
+            self._bundle.add_http(url, json, response.status_code, response.headers, response.content)
+        return response
+    
+    def _record_stream(self, url: str, payload: Optional[Dict], response):
+        """
+        流式响应边读边记录：客户端逐段读取的内容同时保存下来，读完或关闭响应时写入夹具，
+        不提前缓冲整个响应体，录制时首个 token 的到达时间与正常运行一致。
+        客户端提前关闭响应（如竞速模式中落后的模型）时只记录已读取的部分。
+        """
+        chunks: List[bytes] = []
+        iter_content, close = response.iter_content, response.close
+        recorded = threading.Lock()
+        
+        def flush():
+            if recorded.acquire(blocking=False):
+                self._bundle.add_http(url, payload, response.status_code, response.headers, b''.join(chunks))
+        
+        def recording_iter_content(*args, **kwargs):
+            for chunk in iter_content(*args, **kwargs):
+                chunks.append(chunk.encode(response.encoding or 'utf-8') if isinstance(chunk, str) else chunk)
+                yield chunk
+            flush()
+        
+        def recording_close():
+            flush()
+            close()
+        
+        # iter_lines 和 with 语句都通过实例属性调用这两个方法
+        response.iter_content = recording_iter_content
+        response.close = recording_close
+
+
+class ReplaySession:
+    """按请求指纹返回录制的响应；提示词有变化时按同一接口的录制顺序返回"""
+    
+    def __init__(self, entries: List[Dict]):
+        self._by_key: Dict[str, List[Dict]] = {}
+        self._by_url: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            self._by_key.setdefault(entry['key'], []).append(entry)
+            self._by_url.setdefault(entry['url'], []).append(entry)
+        self._used = set()
+        self._lock = threading.Lock()
+        self.exact = 0
+        self.fallback = 0
+    
+    def _next(self, url: str, payload: Optional[Dict]) -> Dict:
+        with self._lock:
+            for entry in self._by_key.get(request_key(url, payload), []):
+                if id(entry) not in self._used:
+                    self._used.add(id(entry))
+                    self.exact += 1
+                    return entry
+            for entry in self._by_url.get(redact_url(url), []):
+                if id(entry) not in self._used:
+                    self._used.add(id(entry))
+                    self.fallback += 1
+                    return entry
+        raise ReplayMissError(f"夹具中没有可用的响应: {redact_url(url)}")
+    
+    def post(self, url: str, json: Optional[Dict] = None, headers: Optional[Dict] = None, **kwargs):
+        import requests
+        from requests.structures import CaseInsensitiveDict
+        
+        entry = self._next(url, json)
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = 'utf-8'
+        # 内容已在内存中，iter_lines 直接从中切分
+        response._content = entry['body'].encode('utf-8')
+        response._content_consumed = True
+        return response
+
+
+class NullSMTP:
+    """本地 SMTP 替身：接受邮件但不发送，只统计封数和字节数"""
+    
+    def __init__(self, stats: Dict):
+        self.stats = stats
+    
+    def sendmail(self, from_addr, to_addrs, msg):
+        self.stats['messages'] += 1
+        self.stats['bytes'] += len(msg)
+        return {}
+    
+    def send_message(self, message):
+        return self.sendmail(None, None, message.as_bytes())
+    
+    def quit(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+class FixtureSession:
+    """
+    一次录制或回放
+    
+    提供生成器参数、邮件发送器和发件箱路径，结束时调用 finish。
+    录制和回放都不使用历史数据仓库和 AI 响应缓存，保证夹具自包含、每次回放都走完整调用路径。
+    """
+    
+    def __init__(self, path: str, mode: str):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"未知模式: {mode}")
+        from llm_cache import LLMResponseCache
+        import multi_model_client
+        
+        self.mode = mode
+        self.bundle = FixtureBundle(path)
+        self.smtp_stats = {'messages': 0, 'bytes': 0}
+        self._replay_session = None
+        self._started = time.perf_counter()
+        self._workdir = tempfile.TemporaryDirectory(prefix=f'astock-{mode}-')
+        
+        if mode == 'record':
+            self.trade_date = current_trade_date()
+            # 有效期为 0：总是实际请求，并把结果写入夹具目录
+            self.data_cache = DataFrameCache(
+                cache_dir=self.bundle.frames_dir, ttl=0, max_bytes=1 << 40,
+                enabled=True, offline=False, trade_date=self.trade_date
+            )
+            multi_model_client.set_session_factory(lambda base_url, session: RecordingSession(session, self.bundle))
+            print(f"⏺️ 录制模式：数据和 AI 响应写入 {self.bundle.path}")
+        else:
+            manifest = self.bundle.load_manifest()
+            self.trade_date = manifest['trade_date']
+            self.data_cache = DataFrameCache(
+                cache_dir=self.bundle.frames_dir, offline=True, trade_date=self.trade_date
+            )
+            entries = self.bundle.load_http()
+            self._replay_session = ReplaySession(entries)
+            multi_model_client.set_session_factory(lambda base_url, session: self._replay_session)
+            for entry in entries:
+                env_name = PROVIDER_KEYS.get(urlsplit(entry['url']).hostname)
+                if env_name and not os.getenv(env_name):
+                    os.environ[env_name] = 'replay'
+            print(f"⏯️ 回放模式：使用 {self.bundle.path}（{self.trade_date}，"
+                  f"{manifest.get('frames', 0)} 个数据表，{len(entries)} 次 AI 调用）")
+        
+        self.llm_cache = LLMResponseCache(enabled=False)
+    
+    @property
+    def output_dir(self) -> str:
+        """报告输出目录：录制时正常写入 reports/，回放时写入临时目录"""
+        if self.mode == 'record':
+            return 'reports'
+        return os.path.join(self._workdir.name, 'reports')
+    
+    @property
+    def queue_path(self) -> Optional[str]:
+        """回放使用临时发件箱，不影响真实的投递队列"""
+        if self.mode == 'record':
+            return None
+        return os.path.join(self._workdir.name, 'outbox.sqlite')
+    
+    def generator_kwargs(self) -> Dict:
+        return {
+            'data_cache': self.data_cache,
+            'llm_cache': self.llm_cache,
+            'use_warehouse': False,
+            'output_dir': self.output_dir,
+        }
+    
+    def email_sender(self):
+        """回放时返回连接本地替身的 EmailSender，录制时返回 None（使用真实发送）"""
+        if self.mode == 'record':
+            return None
+        from send_email import EmailSender
+        
+        stats = self.smtp_stats
+        
+        class ReplayEmailSender(EmailSender):
+            def _open_connection(self):
+                return NullSMTP(stats)
+        
+        return ReplayEmailSender(sender_email='replay@localhost', sender_password='replay', use_tls=False)
+    
+    def recipients(self, recipients: List[str]) -> List[str]:
+        """回放时使用固定的收件人，避免真实地址出现在本地统计里"""
+        if self.mode == 'record':
+            return recipients
+        return [REPLAY_RECIPIENT]
+    
+    def finish(self):
+        """恢复真实连接；录制时写入 manifest，回放时输出统计"""
+        import multi_model_client
+        
+        multi_model_client.set_session_factory(None)
+        elapsed = time.perf_counter() - self._started
+        
+        if self.mode == 'record':
+            entries = self.bundle.load_http()
+            self.bundle.write_manifest({
+                'trade_date': self.trade_date,
+                'recorded_at': datetime.now(timezone(timedelta(hours=8))).strftime("%Y-%m-%d %H:%M:%S"),
+                'frames': self.bundle.frame_count(),
+                'http': len(entries),
+                'providers': sorted({urlsplit(entry['url']).hostname for entry in entries}),
+            })
+            print(f"⏺️ 录制完成: {self.bundle.path}（{self.bundle.frame_count()} 个数据表，"
+                  f"{len(entries)} 次 AI 调用，耗时 {elapsed:.1f}秒）")
+        else:
+            session = self._replay_session
+            print(f"⏯️ 回放完成: 耗时 {elapsed:.2f}秒，AI 响应精确匹配 {session.exact} 次、"
+                  f"按顺序匹配 {session.fallback} 次，模拟发送 {self.smtp_stats['messages']} 封邮件 "
+                  f"({self.smtp_stats['bytes'] / 1024:.1f}KB)")
+        self._workdir.cleanup()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告数据表格模板
+
+指数、涨跌统计、板块排行、资金流向等纯数据内容直接由 market_data 按固定模板渲染，
+数值与数据源完全一致，也不再占用模型的输出 token。
+"""
+
+import string
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+INDEX_HEADER = "| 指数 | 收盘点位 | 涨跌幅 | 涨跌点 | 成交额(亿元) | 最高 | 最低 |\n|---|---|---|---|---|---|---|"
+INDEX_ROW = "| {name} | {收盘点位:.2f} | {涨跌幅:+.2f}% | {涨跌点:+.2f} | {成交额:.2f} | {最高:.2f} | {最低:.2f} |"
+
+STATS_TEMPLATE = (
+    "| 上涨家数 | 下跌家数 | 平盘家数 | 涨跌比 | 涨停家数 | 跌停家数 |\n"
+    "|---|---|---|---|---|---|\n"
+    "| {上涨家数} | {下跌家数} | {平盘家数} | {涨跌比} | {涨停家数} | {跌停家数} |"
+)
+# 涨跌家数不可用时（如历史回补中没有当日全市场快照）只列涨跌停
+LIMIT_TEMPLATE = (
+    "| 涨停家数 | 跌停家数 |\n"
+    "|---|---|\n"
+    "| {涨停家数} | {跌停家数} |"
+)
+SEAL_TEMPLATE = "炸板 {炸板家数} 家，封板率 {封板率}。"
+
+BOARD_HEADER = "| 板块 | 涨停 | 跌停 | 炸板 |\n|---|---|---|---|"
+BOARD_ROW = "| {board} | {涨停} | {跌停} | {炸板} |"
+
+RISING_SECTOR_HEADER = "**领涨板块TOP{count}**\n\n| 排名 | 板块 | 涨跌幅 | 领涨股 |\n|---|---|---|---|"
+RISING_SECTOR_ROW = "| {rank} | {板块名称} | {涨跌幅:+.2f}% | {领涨股票} |"
+FALLING_SECTOR_HEADER = "**领跌板块TOP{count}**\n\n| 排名 | 板块 | 涨跌幅 |\n|---|---|---|"
+FALLING_SECTOR_ROW = "| {rank} | {板块名称} | {涨跌幅:+.2f}% |"
+
+INFLOW_HEADER = "**主力净流入TOP{count}**\n\n| 排名 | 股票 | 净流入(亿元) | 涨跌幅 |\n|---|---|---|---|"
+INFLOW_ROW = "| {rank} | {股票名称} | {净流入:.2f} | {涨跌幅:+.2f}% |"
+OUTFLOW_HEADER = "**主力净流出TOP{count}**\n\n| 排名 | 股票 | 净流出(亿元) | 涨跌幅 |\n|---|---|---|---|"
+OUTFLOW_ROW = "| {rank} | {股票名称} | {净流出:.2f} | {涨跌幅:+.2f}% |"
+
+NORTH_TEMPLATE = (
+    "**北向资金**\n\n"
+    "| 沪股通(亿元) | 深股通(亿元) | 合计(亿元) |\n"
+    "|---|---|---|\n"
+    "| {沪股通:+.2f} | {深股通:+.2f} | {合计:+.2f} |"
+)
+
+
+class _TableFormatter(string.Formatter):
+    """缺失的数值（None 或 NaN）显示为 -，不因格式说明符报错而丢弃整张表格"""
+    
+    def format_field(self, value, format_spec: str) -> str:
+        if value is None or (isinstance(value, float) and value != value):
+            return '-'
+        return super().format_field(value, format_spec)
+
+
+_formatter = _TableFormatter()
+
+
+def _fill(template: str, values: Dict) -> str:
+    return _formatter.vformat(template, (), values)
+
+
+def _cell(value: Optional[float], spec: str = '.2f') -> str:
+    return _formatter.format_field(value, spec)
+
+
+def render_indices(market_data: Dict) -> str:
+    """主要指数表现"""
+    indices = market_data.get('指数数据') or {}
+    if not indices:
+        return ""
+    rows = [_fill(INDEX_ROW, dict(data, name=name)) for name, data in indices.items()]
+    return "\n".join([INDEX_HEADER, *rows])
+
+
+def render_market_stats(market_data: Dict) -> str:
+    """涨跌家数、涨跌停及分板块涨跌停"""
+    stats = market_data.get('市场统计') or {}
+    if not stats:
+        return ""
+    # 不可用的字段（None）显示为 -；涨跌家数与涨跌停家数均不可用时省略表格
+    parts = []
+    if stats.get('上涨家数') is not None:
+        parts.append(_fill(STATS_TEMPLATE, stats))
+    elif stats.get('涨停家数') is not None or stats.get('跌停家数') is not None:
+        parts.append(_fill(LIMIT_TEMPLATE, stats))
+    if stats.get('炸板家数') is not None and stats.get('封板率') is not None:
+        parts.append(_fill(SEAL_TEMPLATE, stats))
+    boards = [(board, counts) for board, counts in stats.get('分板块涨跌停', {}).items() if counts['总家数']]
+    if boards:
+        parts.append("\n".join([BOARD_HEADER, *(_fill(BOARD_ROW, dict(counts, board=board)) for board, counts in boards)]))
+    return "\n\n".join(parts)
+
+
+def _ranked(header: str, row: str, records: List[Dict]) -> str:
+    lines = [header.format(count=len(records))]
+    lines += [_fill(row, dict(record, rank=rank)) for rank, record in enumerate(records, 1)]
+    return "\n".join(lines)
+
+
+def render_sectors(market_data: Dict) -> str:
+    """领涨/领跌板块"""
+    sectors = market_data.get('板块数据') or {}
+    parts = []
+    if sectors.get('领涨板块'):
+        parts.append(_ranked(RISING_SECTOR_HEADER, RISING_SECTOR_ROW, sectors['领涨板块']))
+    if sectors.get('领跌板块'):
+        parts.append(_ranked(FALLING_SECTOR_HEADER, FALLING_SECTOR_ROW, sectors['领跌板块']))
+    return "\n\n".join(parts)
+
+
+def render_capital_flow(market_data: Dict) -> str:
+    """主力资金净流入/净流出个股"""
+    capital = market_data.get('资金流向') or {}
+    parts = []
+    if capital.get('净流入TOP10'):
+        parts.append(_ranked(INFLOW_HEADER, INFLOW_ROW, capital['净流入TOP10']))
+    if capital.get('净流出TOP10'):
+        parts.append(_ranked(OUTFLOW_HEADER, OUTFLOW_ROW, capital['净流出TOP10']))
+    return "\n\n".join(parts)
+
+
+def render_north_bound(market_data: Dict) -> str:
+    """北向资金当日及多日累计"""
+    north = market_data.get('北向资金')
+    if not north:
+        return ""
+    text = _fill(NORTH_TEMPLATE, north)
+    if '数据日期' in north:
+        text += f"\n\n数据日期：{north['数据日期']}（当日数据尚未发布）"
+    rolling = [f"{key} {_cell(north[key], '+.2f')}亿元" for key in ('5日累计', '20日累计', '60日累计') if key in north]
+    if rolling:
+        text += "\n\n多日累计：" + "，".join(rolling)
+    return text
+
+
+def render_indicators(market_data: Dict) -> str:
+    """指数均线"""
+    indicators = market_data.get('技术指标')
+    if not indicators:
+        return ""
+    windows = list(dict.fromkeys(key for values in indicators.values() for key in values))
+    lines = [
+        "| 指数 | " + " | ".join(windows) + " |",
+        "|---|" + "---|" * len(windows),
+    ]
+    for name, values in indicators.items():
+        cells = [_cell(values.get(key)) for key in windows]
+        lines.append(f"| {name} | " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+TABLE_RENDERERS: Dict[str, Callable[[Dict], str]] = {
+    'indices': render_indices,
+    'stats': render_market_stats,
+    'sectors': render_sectors,
+    'capital': render_capital_flow,
+    'north': render_north_bound,
+    'indicators': render_indicators,
+}
+
+
+def render_tables(market_data: Dict, names: Sequence[str]) -> str:
+    """
+    按名称依次渲染数据表格
+    
+    Args:
+        market_data: fetch_all_data 返回的市场数据
+        names: TABLE_RENDERERS 中的表格名称
+    
+    Returns:
+        Markdown 文本，没有可用数据时为空字符串
+    """
+    parts = []
+    for name in names:
+        try:
+            text = TABLE_RENDERERS[name](market_data)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"[WARN] ⚠️ 渲染数据表格 {name} 失败: {e}")
+            continue
+        if text:
+            parts.append(text)
+    return "\n\n".join(parts)
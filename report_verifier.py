@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告数值校验模块
+
+把 market_data 中的数值按名称（指数、板块、个股、涨跌统计等）建立索引，
+再用一个预编译正则单次扫描生成的 Markdown，找出与真实数据不符的数值。
+"""
+
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# 涨跌统计关键词 -> market_data['市场统计'] 中的字段（只校验其后以“家”为单位的整数）
+STATS_KEYWORDS = {
+    '上涨': ('上涨家数',),
+    '下跌': ('下跌家数',),
+    '平盘': ('平盘家数',),
+    '涨停': ('涨停家数', '涨停'),
+    '跌停': ('跌停家数', '跌停'),
+    '炸板': ('炸板家数', '炸板'),
+}
+
+# 表示涨跌方向的词，决定其后第一个不带符号的数值的正负（“涨至”“跌破”等表示点位，不计方向）
+DIRECTION_WORDS = {
+    '上涨': 1,
+    '下跌': -1,
+    '涨跌': 0,
+    '涨': 1,
+    '跌': -1,
+    '流入': 1,
+    '流出': -1,
+}
+
+# 指数简称
+INDEX_ALIASES = {
+    '上证指数': ('上证', '沪指'),
+    '深证成指': ('深证', '深成指'),
+    '创业板指': ('创业板',),
+}
+
+_NUMBER = re.compile(r'[+-]?\d+(?:\.\d+)?')
+
+# 只校验保留小数的数值，以及统计关键词后以“家”为单位的整数
+MAX_DECIMALS = 3
+
+
+def _numbers_in(value) -> List[float]:
+    """提取数值或字符串（如 '62.8%'、'2510/2456'）中的数字"""
+    if isinstance(value, bool):
+        return []
+    if isinstance(value, (int, float)):
+        return [] if value != value else [float(value)]
+    if isinstance(value, str):
+        return [float(m) for m in _NUMBER.findall(value)]
+    return []
+
+
+class ReportVerifier:
+    """生成报告的数值校验器"""
+    
+    def __init__(self, market_data: Dict):
+        """
+        Args:
+            market_data: fetch_all_data 返回的市场数据（可包含近期走势、技术指标）
+        """
+        # 名称 -> 数值列表；'*' 为全部数值
+        self._values: Dict[str, List[float]] = {'*': []}
+        self._build(market_data)
+        
+        # 名称 -> {小数位数: 取整后的桶}，查询为 O(1)
+        self._buckets = {
+            name: {
+                decimals: {key for value in values for key in self._bucket_keys(value, decimals)}
+                for decimals in range(MAX_DECIMALS + 1)
+            }
+            for name, values in self._values.items()
+        }
+        
+        names = sorted((name for name in self._values if name != '*'), key=len, reverse=True)
+        self._pattern = re.compile(
+            r'^(?P<heading>#{1,3}[ \t]+[^\n]*)$'
+            r'|(?P<newline>\n)'
+            + (r'|(?P<name>' + '|'.join(map(re.escape, names)) + r')' if names else '')
+            + r'|(?P<direction>涨跌|涨|跌|流入|流出)(?![至到破])'
+            r'|(?<![A-Za-z0-9.])(?P<number>[+-]?\d+(?:,\d{3})*(?:\.(?P<fraction>\d+))?)'
+            r'(?P<unit>%|万亿|亿|家)?',
+            re.MULTILINE
+        )
+    
+    def _add(self, name: str, value):
+        numbers = _numbers_in(value)
+        self._values.setdefault(name, []).extend(numbers)
+        self._values['*'].extend(numbers)
+    
+    def _build(self, market_data: Dict):
+        """从市场数据建立名称 -> 数值索引"""
+        turnover = []
+        for name, data in (market_data.get('指数数据') or {}).items():
+            for key, value in data.items():
+                self._add(name, value)
+                for alias in INDEX_ALIASES.get(name, ()):
+                    self._add(alias, value)
+            turnover.append(data.get('成交额') or 0)
+        # 两市成交额（亿元 / 万亿元）
+        if len(turnover) >= 2:
+            total = sum(turnover[:2])
+            for name in ('成交额', '两市'):
+                for value in turnover:
+                    self._add(name, value)
+                self._add(name, total)
+                self._add(name, total / 10000)
+        
+        for name, values in (market_data.get('技术指标') or {}).items():
+            for value in values.values():
+                self._add(name, value)
+                for alias in INDEX_ALIASES.get(name, ()):
+                    self._add(alias, value)
+        
+        stats = market_data.get('市场统计') or {}
+        for keyword, fields in STATS_KEYWORDS.items():
+            for field in fields:
+                if field in stats:
+                    self._add(keyword, stats[field])
+            for counts in (stats.get('分板块涨跌停') or {}).values():
+                for field in fields:
+                    if field in counts:
+                        self._add(keyword, counts[field])
+        for board, counts in (stats.get('分板块涨跌停') or {}).items():
+            for value in counts.values():
+                self._add(board, value)
+        self._add('封板率', stats.get('封板率'))
+        self._add('涨跌比', stats.get('涨跌比'))
+        if stats.get('上涨家数') is not None and stats.get('下跌家数'):
+            self._add('涨跌比', stats.get('上涨家数', 0) / stats['下跌家数'])
+        for count in (stats.get('涨跌分布') or {}).values():
+            self._values['*'].extend(_numbers_in(count))
+        
+        sectors = market_data.get('板块数据') or {}
+        for record in (sectors.get('领涨板块') or []) + (sectors.get('领跌板块') or []):
+            self._add(record['板块名称'], record.get('涨跌幅'))
+        
+        capital = market_data.get('资金流向') or {}
+        for record in (capital.get('净流入TOP10') or []) + (capital.get('净流出TOP10') or []):
+            name = record['股票名称']
+            for key in ('净流入', '净流出', '涨跌幅'):
+                if key in record:
+                    self._add(name, record[key])
+        
+        north = market_data.get('北向资金') or {}
+        for key, value in north.items():
+            targets = [key] if key in ('沪股通', '深股通') else ['北向资金', '北向']
+            for name in targets:
+                self._add(name, value)
+        
+        for row in market_data.get('近期走势') or []:
+            for name, key in (('上证指数', '上证指数'), ('上证指数', '上证涨跌幅'),
+                              ('创业板指', '创业板指'), ('创业板指', '创业板涨跌幅')):
+                for target in (name, *INDEX_ALIASES.get(name, ())):
+                    self._add(target, row.get(key))
+            for name in ('成交额', '两市'):
+                self._add(name, row.get('两市成交额'))
+                self._add(name, (row.get('两市成交额') or 0) / 10000)
+            for name in ('北向资金', '北向'):
+                self._add(name, row.get('北向合计'))
+    
+    @staticmethod
+    def _round(scaled: float) -> int:
+        """四舍五入（远离零）"""
+        rounded = int(abs(scaled) + 0.5 + 1e-9)
+        return -rounded if scaled < 0 else rounded
+    
+    @classmethod
+    def _bucket_keys(cls, value: float, decimals: int) -> Tuple[int, ...]:
+        """数值按指定小数位取整的桶（同时兼容四舍五入和银行家舍入，保留正负号）"""
+        scaled = value * 10 ** decimals
+        return cls._round(scaled), round(scaled)
+    
+    def _matches(self, name: str, number: float, decimals: int, signed: bool = True) -> bool:
+        """
+        Args:
+            signed: 数值的正负是否确定（带符号或前面有涨跌方向词），否则正负均可
+        """
+        buckets = self._buckets.get(name)
+        if not buckets:
+            return True
+        bucket = buckets[min(decimals, MAX_DECIMALS)]
+        key = self._round(number * 10 ** decimals)
+        return key in bucket or (not signed and -key in bucket)
+    
+    def verify(self, report: str) -> Dict:
+        """
+        校验报告中的数值
+        
+        同一行内，小数归属于它前面最近出现的名称（指数、板块、个股等）；涨跌统计关键词
+        只约束其后以“家”为单位的整数，不会取代行内已出现的名称。没有名称时只校验带 % 或 亿
+        的小数，与全部真实数据比对。不带符号的数值按前面紧邻的涨跌方向词（下跌、流出等）
+        确定正负，没有方向词时正负均可。模型自行推算的整数点位（如支撑位 3000 点）不做校验。
+        
+        Returns:
+            {'checked': 校验的数值个数, 'issues': [问题], 'elapsed_ms': 耗时}，
+            问题包含 offset、section（所在章节标题）、line、name、value、context
+        """
+        start = time.perf_counter()
+        issues = []
+        checked = 0
+        section = ''
+        line = 1
+        line_start = 0
+        current = None
+        stat = None
+        direction = 0
+        
+        for match in self._pattern.finditer(report):
+            groups = match.groupdict()
+            if groups['heading'] is not None:
+                section = match.group('heading').lstrip('#').strip()
+                current = stat = None
+                direction = 0
+                continue
+            if groups['newline'] is not None:
+                line += 1
+                line_start = match.end()
+                current = stat = None
+                direction = 0
+                continue
+            if groups.get('name') is not None:
+                found = groups['name']
+                if found in STATS_KEYWORDS:
+                    stat = found
+                    direction = DIRECTION_WORDS.get(found, direction)
+                else:
+                    current = found
+                continue
+            if groups['direction'] is not None:
+                direction = DIRECTION_WORDS[groups['direction']]
+                continue
+            
+            text = groups['number']
+            fraction = groups['fraction']
+            unit = groups['unit']
+            decimals = len(fraction) if fraction else 0
+            # 方向词只作用于紧随其后的一个数值
+            sign, direction = direction, 0
+            
+            if unit == '家' and not fraction:
+                if stat is None:
+                    continue
+                name = stat
+                signed = False
+            elif not fraction:
+                continue
+            elif current is not None:
+                name = current
+                signed = text[0] in '+-' or sign != 0
+            elif unit in ('%', '亿', '万亿'):
+                name = '*'
+                signed = text[0] in '+-' or sign != 0
+            else:
+                continue
+            
+            checked += 1
+            number = float(text.replace(',', ''))
+            if signed and text[0] not in '+-':
+                number *= sign
+            if not self._matches(name, number, decimals, signed):
+                line_end = report.find('\n', match.end())
+                context = report[line_start:line_end if line_end >= 0 else len(report)].strip()
+                issues.append({
+                    'offset': match.start(),
+                    'section': section,
+                    'line': line,
+                    'name': None if name == '*' else name,
+                    'value': text + (unit or ''),
+                    'context': context[:120],
+                })
+        
+        return {
+            'checked': checked,
+            'issues': issues,
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+        }
+
+
+def split_sections(report: str) -> List[Tuple[str, int, int]]:
+    """
+    按二级标题切分报告
+    
+    Returns:
+        [(标题, 起始位置, 结束位置)]，区间包含标题行
+    """
+    headings = [(m.group(1).strip(), m.start()) for m in re.finditer(r'^##[ \t]+([^\n]+)$', report, re.MULTILINE)]
+    sections = []
+    for i, (title, start) in enumerate(headings):
+        end = headings[i + 1][1] if i + 1 < len(headings) else len(report)
+        sections.append((title, start, end))
+    return sections
+
+
+def format_issues(issues: List[Dict], limit: Optional[int] = 10) -> List[str]:
+    """问题列表的可读描述"""
+    lines = []
+    for issue in issues[:limit]:
+        name = f"{issue['name']} " if issue['name'] else ''
+        lines.append(f"第{issue['line']}行 [{issue['section'] or '-'}] {name}{issue['value']}：{issue['context']}")
+    if limit is not None and len(issues) > limit:
+        lines.append(f"... 另有 {len(issues) - limit} 处")
+    return lines
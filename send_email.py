@@ -5,14 +5,36 @@
 用于发送A股复盘报告到指定邮箱
 """
 
+import io
 import os
+import re
+import time
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
+from email.generator import BytesGenerator
+from email.utils import formatdate, make_msgid
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
+
+from html_renderer import render_report_html
+from metrics import span
+
+
+def parse_recipients(value: Optional[str]) -> List[str]:
+    """解析以逗号、分号或换行分隔的收件人列表（去重并保持顺序）"""
+    if not value:
+        return []
+    recipients = [item.strip() for item in re.split(r'[,;\s]+', value)]
+    return list(dict.fromkeys(item for item in recipients if item and not item.startswith('#')))
+
+
+def default_subject() -> str:
+    """默认邮件主题（按当天日期）"""
+    date_str = datetime.now().strftime("%Y年%m月%d日")
+    return f"A股晚间复盘报告 - {date_str}"
 
 
 class EmailSender:
@@ -23,7 +45,8 @@ class EmailSender:
         smtp_server: Optional[str] = None,
         smtp_port: Optional[int] = None,
         sender_email: Optional[str] = None,
-        sender_password: Optional[str] = None
+        sender_password: Optional[str] = None,
+        use_tls: Optional[bool] = None
     ):
         """
         初始化邮件发送器
@@ -33,11 +56,15 @@ class EmailSender:
             smtp_port: SMTP端口
             sender_email: 发件人邮箱
             sender_password: 发件人密码或授权码
+            use_tls: 是否加密连接，默认读取 SMTP_USE_TLS（默认 1；本地测试用的 SMTP 服务可设为 0）
         """
         self.smtp_server = smtp_server or os.getenv('SMTP_SERVER', 'smtp.gmail.com')
         self.smtp_port = smtp_port or int(os.getenv('SMTP_PORT', '587'))
         self.sender_email = sender_email or os.getenv('SENDER_EMAIL')
         self.sender_password = sender_password or os.getenv('SENDER_PASSWORD')
+        if use_tls is None:
+            use_tls = os.getenv('SMTP_USE_TLS', '1').lower() not in ('0', 'false', 'no')
+        self.use_tls = use_tls
         
         if not self.sender_email or not self.sender_password:
             raise ValueError("请设置 SENDER_EMAIL 和 SENDER_PASSWORD 环境变量")
@@ -55,7 +82,7 @@ class EmailSender:
             recipient_email: 收件人邮箱
             report_filepath: 报告文件路径
             subject: 邮件主题
-            
+        
         Returns:
             是否发送成功
         """
@@ -66,39 +93,134 @@ class EmailSender:
             
             # 生成邮件主题
             if subject is None:
-                date_str = datetime.now().strftime("%Y年%m月%d日")
-                subject = f"A股晚间复盘报告 - {date_str}"
+                subject = default_subject()
             
             # 创建邮件
-            message = self._create_message(
-                recipient_email,
-                subject,
-                report_content,
-                report_filepath
-            )
+            with span('smtp.build', report_chars=len(report_content)):
+                message = self._create_message(
+                    recipient_email,
+                    subject,
+                    report_content,
+                    report_filepath
+                )
             
             # 发送邮件
             self._send_email(recipient_email, message)
             
             print(f"✅ 邮件已成功发送到: {recipient_email}")
             return True
-            
+        
         except Exception as e:
             print(f"❌ 邮件发送失败: {e}")
             return False
     
+    def send_report_batch(
+        self,
+        recipients: List[str],
+        report_filepath: str,
+        subject: Optional[str] = None
+    ) -> Dict:
+        """
+        批量发送报告邮件
+        
+        邮件正文、HTML 和附件只生成并序列化一次，所有收件人复用同一个已登录的 SMTP 连接
+        （连接断开时自动重连），每封邮件单独设置 To、Date、Message-ID。
+        
+        Args:
+            recipients: 收件人邮箱列表
+            report_filepath: 报告文件路径
+            subject: 邮件主题
+        
+        Returns:
+            {'sent': [成功的收件人], 'failed': {收件人: 错误信息}, 'elapsed': 耗时秒数, 'rate': 每秒发送封数}
+        """
+        recipients = list(dict.fromkeys(recipients))
+        result = {'sent': [], 'failed': {}, 'elapsed': 0.0, 'rate': 0.0}
+        if not recipients:
+            return result
+        
+        start = time.perf_counter()
+        try:
+            with open(report_filepath, 'r', encoding='utf-8') as f:
+                report_content = f.read()
+            
+            if subject is None:
+                subject = default_subject()
+            
+            with span('smtp.build', report_chars=len(report_content)) as s:
+                message = self._create_message(None, subject, report_content, report_filepath)
+                body = self._flatten(message)
+                s.set(bytes=len(body))
+        except Exception as e:
+            print(f"❌ 邮件创建失败: {e}")
+            result['failed'] = {recipient: str(e) for recipient in recipients}
+            return result
+        
+        print(f"📧 正在发送邮件到 {len(recipients)} 个收件人...")
+        server = None
+        try:
+            for recipient in recipients:
+                headers = (
+                    f"To: {recipient}\r\n"
+                    f"Date: {formatdate(localtime=True)}\r\n"
+                    f"Message-ID: {make_msgid()}\r\n"
+                ).encode('utf-8')
+                
+                for attempt in range(2):
+                    try:
+                        if server is None:
+                            server = self._connect()
+                        with span('smtp.send', bytes=len(headers) + len(body)):
+                            server.sendmail(self.sender_email, [recipient], headers + body)
+                        result['sent'].append(recipient)
+                        print(f"  ✅ {recipient}")
+                        break
+                    except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError) as e:
+                        # 连接断开：重连后重试一次
+                        server = None
+                        if attempt == 1:
+                            result['failed'][recipient] = str(e)
+                            print(f"  ❌ {recipient}: {e}")
+                        else:
+                            print(f"  ⚠️ SMTP 连接断开，正在重连: {e}")
+                    except smtplib.SMTPAuthenticationError as e:
+                        # 认证失败时其余收件人也无法发送
+                        for rest in recipients[len(result['sent']) + len(result['failed']):]:
+                            result['failed'][rest] = f"SMTP 认证失败: {e}"
+                        print(f"❌ SMTP 认证失败: {e}")
+                        raise
+                    except (smtplib.SMTPException, OSError) as e:
+                        result['failed'][recipient] = str(e)
+                        print(f"  ❌ {recipient}: {e}")
+                        break
+        except smtplib.SMTPAuthenticationError:
+            pass
+        finally:
+            if server is not None:
+                try:
+                    server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+        
+        result['elapsed'] = time.perf_counter() - start
+        result['rate'] = len(result['sent']) / result['elapsed'] if result['elapsed'] > 0 else 0.0
+        print(f"📧 发送完成: 成功 {len(result['sent'])} / 失败 {len(result['failed'])}，"
+              f"耗时 {result['elapsed']:.2f}秒 ({result['rate']:.1f} 封/秒)")
+        return result
+    
     def _create_message(
         self,
-        recipient_email: str,
+        recipient_email: Optional[str],
         subject: str,
         report_content: str,
         report_filepath: str
     ) -> MIMEMultipart:
-        """创建邮件消息"""
+        """创建邮件消息（recipient_email 为空时不设置 To，由批量发送逐个添加）"""
         # 创建邮件对象
         message = MIMEMultipart('alternative')
         message['From'] = self.sender_email
-        message['To'] = recipient_email
+        if recipient_email:
+            message['To'] = recipient_email
         message['Subject'] = subject
         
         # 生成HTML内容（将Markdown转换为HTML）
@@ -122,93 +244,11 @@ class EmailSender:
         
         Args:
             markdown_content: Markdown内容
-            
+        
         Returns:
-            HTML内容
+            HTML内容（与归档等场景共用渲染缓存）
         """
-        try:
-            import markdown
-            
-            # 使用markdown库转换
-            html = markdown.markdown(
-                markdown_content,
-                extensions=['tables', 'fenced_code', 'nl2br']
-            )
-            
-            # 添加样式
-            styled_html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <style>
-                    body {{
-                        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                        line-height: 1.6;
-                        color: #333;
-                        max-width: 1200px;
-                        margin: 0 auto;
-                        padding: 20px;
-                        background-color: #f5f5f5;
-                    }}
-                    h1, h2, h3 {{
-                        color: #2c3e50;
-                        border-bottom: 2px solid #3498db;
-                        padding-bottom: 10px;
-                    }}
-                    table {{
-                        border-collapse: collapse;
-                        width: 100%;
-                        margin: 20px 0;
-                        background-color: white;
-                        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                    }}
-                    th {{
-                        background-color: #3498db;
-                        color: white;
-                        padding: 12px;
-                        text-align: left;
-                    }}
-                    td {{
-                        padding: 10px;
-                        border-bottom: 1px solid #ddd;
-                    }}
-                    tr:hover {{
-                        background-color: #f5f5f5;
-                    }}
-                    code {{
-                        background-color: #f4f4f4;
-                        padding: 2px 6px;
-                        border-radius: 3px;
-                        font-family: 'Courier New', monospace;
-                    }}
-                    blockquote {{
-                        border-left: 4px solid #3498db;
-                        padding-left: 20px;
-                        margin: 20px 0;
-                        color: #666;
-                    }}
-                    .positive {{
-                        color: #e74c3c;
-                        font-weight: bold;
-                    }}
-                    .negative {{
-                        color: #27ae60;
-                        font-weight: bold;
-                    }}
-                </style>
-            </head>
-            <body>
-                {html}
-            </body>
-            </html>
-            """
-            
-            return styled_html
-            
-        except ImportError:
-            # 如果没有markdown库，返回简单的HTML
-            return f"<html><body><pre>{markdown_content}</pre></body></html>"
+        return render_report_html(markdown_content)
     
     def _attach_file(self, message: MIMEMultipart, filepath: str):
         """添加附件"""
@@ -226,15 +266,46 @@ class EmailSender:
         
         message.attach(part)
     
+    @staticmethod
+    def _flatten(message: MIMEMultipart) -> bytes:
+        """将邮件序列化为 SMTP 传输格式（与 smtplib.send_message 相同）"""
+        with io.BytesIO() as buffer:
+            BytesGenerator(buffer).flatten(message, linesep='\r\n')
+            return buffer.getvalue()
+    
+    def _connect(self) -> smtplib.SMTP:
+        """
+        建立已登录的 SMTP 连接（465 端口使用 SSL，其余端口使用 STARTTLS）
+        
+        关闭 TLS 时使用明文连接，服务器不支持 AUTH 时跳过登录（用于本地测试 SMTP 服务）。
+        """
+        with span('smtp.connect', server=self.smtp_server, port=self.smtp_port, tls=self.use_tls):
+            return self._open_connection()
+    
+    def _open_connection(self) -> smtplib.SMTP:
+        if not self.use_tls:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=60)
+            server.ehlo_or_helo_if_needed()
+            if server.has_extn('auth'):
+                server.login(self.sender_email, self.sender_password)
+            return server
+        
+        if self.smtp_port == 465:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=60)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=60)
+            server.starttls()  # 启用TLS加密
+        server.login(self.sender_email, self.sender_password)
+        return server
+    
     def _send_email(self, recipient_email: str, message: MIMEMultipart):
         """发送邮件"""
         print(f"📧 正在发送邮件到 {recipient_email}...")
         
         # 连接SMTP服务器
-        with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-            server.starttls()  # 启用TLS加密
-            server.login(self.sender_email, self.sender_password)
-            server.send_message(message)
+        with self._connect() as server:
+            with span('smtp.send'):
+                server.send_message(message)
 
 
 def main():
@@ -242,14 +313,17 @@ def main():
     import sys
     
     if len(sys.argv) < 3:
-        print("用法: python send_email.py <收件人邮箱> <报告文件路径>")
+        print("用法: python send_email.py <收件人邮箱[,收件人邮箱...]> <报告文件路径>")
         sys.exit(1)
     
-    recipient = sys.argv[1]
+    recipients = parse_recipients(sys.argv[1])
     report_file = sys.argv[2]
     
     sender = EmailSender()
-    sender.send_report(recipient, report_file)
+    if len(recipients) == 1:
+        sender.send_report(recipients[0], report_file)
+    else:
+        sender.send_report_batch(recipients, report_file)
 
 
 if __name__ == "__main__":
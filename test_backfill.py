@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史报告回补检查点测试
+运行: python -m pytest test_backfill.py
+"""
+
+from types import SimpleNamespace
+
+from backfill import BackfillCheckpoint, prompt_fingerprint
+
+
+def _generator(**overrides):
+    settings = dict(prompt_mode='compact', prompt_token_budget=6000, report_mode='single', data_tables=['indices'])
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+def test_done_day_is_skipped_only_with_same_fingerprint(tmp_path):
+    """提示词指纹变化或报告文件被删除后需要重新生成"""
+    report = tmp_path / "report_20240603.md"
+    report.write_text("# 复盘", encoding='utf-8')
+    path = str(tmp_path / "checkpoint.json")
+    BackfillCheckpoint(path).record('2024-06-03', status='done', fingerprint='aaa', file=str(report))
+    
+    checkpoint = BackfillCheckpoint(path)
+    assert checkpoint.is_done('2024-06-03', 'aaa')
+    assert not checkpoint.is_done('2024-06-03', 'bbb')
+    assert not checkpoint.is_done('2024-06-04', 'aaa')
+    
+    report.unlink()
+    assert not checkpoint.is_done('2024-06-03', 'aaa')
+
+
+def test_failed_day_and_corrupt_file(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    checkpoint = BackfillCheckpoint(str(path))
+    checkpoint.record('2024-06-03', status='failed', fingerprint='aaa', error='TimeoutError')
+    assert not checkpoint.is_done('2024-06-03', 'aaa')
+    
+    path.write_text('{"days": ', encoding='utf-8')
+    assert BackfillCheckpoint(str(path)).data == {'days': {}}
+
+
+def test_fingerprint_follows_generation_settings():
+    """生成方式任一项变化时指纹不同"""
+    fingerprint = prompt_fingerprint(_generator())
+    assert fingerprint == prompt_fingerprint(_generator())
+    assert len({
+        fingerprint,
+        prompt_fingerprint(_generator(prompt_mode='full')),
+        prompt_fingerprint(_generator(prompt_token_budget=4000)),
+        prompt_fingerprint(_generator(report_mode='sections')),
+        prompt_fingerprint(_generator(data_tables=['indices', 'stats'])),
+    }) == 5
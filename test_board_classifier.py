@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分板块涨跌停识别测试（与逐行计算涨跌停价的朴素实现对比）
+运行: python -m pytest test_board_classifier.py
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+import pandas as pd
+
+from board_classifier import BOARD_NAMES, BoardClassifier
+from market_snapshot import MarketSnapshot
+
+
+# (代码, 名称, 昨收, 最新价, 最高)
+ROWS = [
+    ('600000', '浦发银行', 10.00, 11.00, 11.00),    # 主板涨停
+    ('600001', '主板炸板', 10.00, 10.98, 11.00),    # 主板炸板
+    ('000001', '平安银行', 10.00, 9.00, 10.10),     # 主板跌停
+    ('002001', '中小板', 7.77, 8.55, 8.55),         # 涨停价 8.547 -> 8.55（float32 为 8.5499997）
+    ('001001', '主板未涨停', 10.00, 10.99, 10.99),
+    ('600002', '*ST某某', 3.33, 3.50, 3.50),        # ST 5%：3.4965 -> 3.50
+    ('000002', 'ST某某', 3.33, 3.16, 3.40),         # ST 跌停：3.1635 -> 3.16
+    ('600003', 'N新股', 10.00, 14.40, 14.40),       # 上市首日不设涨跌幅限制
+    ('600004', 'C主板', 10.00, 11.00, 11.00),       # C 开头的主板股票仍有 10% 限制
+    ('600005', '缺昨收', 0.00, 5.00, 5.00),         # 昨收为 0：不计涨停、炸板
+    ('600006', '停牌', 10.00, float('nan'), float('nan')),
+    ('600007', '无成交', 10.00, 0.00, 0.00),
+    ('300001', '创业板涨停', 10.00, 12.00, 12.00),
+    ('301001', 'C创业板', 10.00, 13.00, 13.00),     # 创业板上市前五日不设涨跌幅限制
+    ('300002', 'ST创业板', 10.00, 11.00, 12.00),    # 创业板 ST 仍为 20%：炸板
+    ('302001', '创业板跌停', 15.37, 12.30, 15.00),  # 12.296 -> 12.30
+    ('688001', '科创板涨停', 15.37, 18.44, 18.44),  # 18.444 -> 18.44
+    ('689009', '科创板炸板', 15.37, 18.00, 18.44),
+    ('430001', '北交所', 10.00, 13.00, 13.00),
+    ('830001', '北交所', 10.00, 7.00, 10.00),
+    ('870001', '北交所', 10.00, 12.99, 13.00),
+    ('920001', '北交所', 10.00, 13.00, 13.00),
+]
+
+
+def _snapshot(rows):
+    frame = pd.DataFrame(rows, columns=['代码', '名称', '昨收', '最新价', '最高'])
+    return MarketSnapshot.from_spot(frame, fetched_at='2024-06-03 15:00:00')
+
+
+def _board(code: str) -> str:
+    if code[:3] in ('300', '301', '302'):
+        return '创业板'
+    if code[:3] in ('688', '689'):
+        return '科创板'
+    if code[:2] in ('43', '83', '87') or code[:3] == '920':
+        return '北交所'
+    return '主板'
+
+
+def _tick(value: Decimal) -> Decimal:
+    return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _naive(rows):
+    """逐行按交易所规则计算涨跌停价并计数（价格先还原为 float32 存储后的两位小数）"""
+    limits = {'主板': '0.10', '创业板': '0.20', '科创板': '0.20', '北交所': '0.30'}
+    snapshot = _snapshot(rows)
+    stored = zip(snapshot.codes(), snapshot.column('名称'), snapshot.column('昨收'),
+                 snapshot.column('最新价'), snapshot.column('最高'))
+    by_board = {name: {'总家数': 0, '涨停': 0, '跌停': 0, '炸板': 0} for name in BOARD_NAMES}
+    touched = 0
+    for code, name, prev_close, price, high in stored:
+        board = _board(code)
+        counts = by_board[board]
+        counts['总家数'] += 1
+        if name.startswith('N') or (name.startswith('C') and board != '主板'):
+            continue
+        if not prev_close > 0:
+            continue
+        limit = Decimal('0.05') if 'ST' in name and board == '主板' else Decimal(limits[board])
+        prev_close = Decimal(f"{prev_close:.2f}")
+        up_price = _tick(prev_close * (1 + limit))
+        down_price = _tick(prev_close * (1 - limit))
+        is_up = price > 0 and Decimal(f"{price:.2f}") >= up_price
+        if high > 0 and Decimal(f"{high:.2f}") >= up_price:
+            touched += 1
+            counts['炸板'] += bool(price > 0 and not is_up)
+        counts['涨停'] += bool(is_up)
+        counts['跌停'] += bool(price > 0 and Decimal(f"{price:.2f}") <= down_price)
+    limit_up = sum(c['涨停'] for c in by_board.values())
+    return {
+        '涨停家数': limit_up,
+        '跌停家数': sum(c['跌停'] for c in by_board.values()),
+        '炸板家数': sum(c['炸板'] for c in by_board.values()),
+        '封板率': f"{limit_up / touched * 100:.1f}%" if touched else '0.0%',
+        '分板块': by_board,
+    }
+
+
+def test_matches_naive_count():
+    """各板块、ST、新股、停牌及缺少昨收的股票与逐行计算一致"""
+    expected = _naive(ROWS)
+    result = BoardClassifier(trade_date='2024-06-03').classify(_snapshot(ROWS))
+    assert result == expected
+    assert (expected['涨停家数'], expected['跌停家数'], expected['炸板家数']) == (8, 4, 4)
+    assert {name: c['总家数'] for name, c in expected['分板块'].items()} == {'主板': 12, '创业板': 4, '科创板': 2, '北交所': 4}
+
+
+def test_missing_prev_close_does_not_count_as_touched():
+    """昨收为 0 的股票不计入触板，不拉低封板率"""
+    rows = [row for row in ROWS if row[0] in ('600000', '600001')]
+    base = BoardClassifier(trade_date='2024-06-03').classify(_snapshot(rows))
+    with_missing = BoardClassifier(trade_date='2024-06-03').classify(
+        _snapshot(rows + [('600005', '缺昨收', 0.00, 5.00, 5.00)])
+    )
+    assert base['封板率'] == with_missing['封板率'] == '50.0%'
+    assert with_missing['炸板家数'] == 1
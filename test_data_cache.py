@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AkShare 原始数据缓存测试（TTL、收盘过期、LRU 淘汰、离线模式）
+运行: python -m pytest test_data_cache.py
+"""
+
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from data_cache import CacheMissError, DataFrameCache, _session_close
+
+TRADE_DATE = '2024-06-03'
+
+
+def _frame(n=50):
+    return pd.DataFrame({'代码': [f"{i:06d}" for i in range(n)], '涨跌幅': [0.1 * i for i in range(n)]})
+
+
+def _age(cache, endpoint, mtime, kwargs=None):
+    """把缓存文件的修改时间改为 mtime"""
+    path = cache._key_path(endpoint, kwargs or {}, TRADE_DATE)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DataFrameCache(cache_dir=str(tmp_path), ttl=3600, max_bytes=10 * 1024 * 1024, offline=False, enabled=True)
+
+
+def test_ttl(cache):
+    """超过 TTL 的缓存不再返回"""
+    cache.put('stock_zh_a_spot_em', _frame(), trade_date=TRADE_DATE)
+    
+    _age(cache, 'stock_zh_a_spot_em', time.time() - 600)
+    assert cache.get('stock_zh_a_spot_em', trade_date=TRADE_DATE) is not None
+    
+    _age(cache, 'stock_zh_a_spot_em', time.time() - 7200)
+    assert cache.get('stock_zh_a_spot_em', trade_date=TRADE_DATE) is None
+
+
+def test_intraday_entry_expires_at_close(tmp_path):
+    """收盘前写入的缓存即使在 TTL 内，收盘后也过期"""
+    cache = DataFrameCache(cache_dir=str(tmp_path), ttl=float('inf'), offline=False, enabled=True)
+    cache.put('stock_zh_a_spot_em', _frame(), trade_date=TRADE_DATE)
+    close = _session_close(TRADE_DATE)
+    
+    _age(cache, 'stock_zh_a_spot_em', close - 600)
+    assert cache.get('stock_zh_a_spot_em', trade_date=TRADE_DATE) is None
+    
+    _age(cache, 'stock_zh_a_spot_em', close)
+    assert cache.get('stock_zh_a_spot_em', trade_date=TRADE_DATE) is not None
+
+
+def test_lru_eviction_keeps_recently_read(cache):
+    """超过大小上限时先淘汰最久未访问的缓存"""
+    for name in ('a', 'b'):
+        cache.put('stock_zt_pool_em', _frame(), kwargs={'date': name}, trade_date=TRADE_DATE)
+    path_a = cache._key_path('stock_zt_pool_em', {'date': 'a'}, TRADE_DATE)
+    path_b = cache._key_path('stock_zt_pool_em', {'date': 'b'}, TRADE_DATE)
+    now = time.time()
+    os.utime(path_a, (now - 300, now))
+    os.utime(path_b, (now - 200, now))
+    
+    assert cache.get('stock_zt_pool_em', {'date': 'a'}, trade_date=TRADE_DATE) is not None
+    cache.max_bytes = int(os.path.getsize(path_a) * 2.5)
+    cache.put('stock_zt_pool_em', _frame(), kwargs={'date': 'c'}, trade_date=TRADE_DATE)
+    
+    assert os.path.exists(path_a)
+    assert not os.path.exists(path_b)
+    assert os.path.exists(cache._key_path('stock_zt_pool_em', {'date': 'c'}, TRADE_DATE))
+
+
+def test_offline_ignores_expiry_and_raises_on_miss(tmp_path):
+    """离线模式返回过期缓存，未命中时报错而不请求网络"""
+    cache = DataFrameCache(cache_dir=str(tmp_path), ttl=1, offline=True, trade_date=TRADE_DATE)
+    cache.put('stock_zh_a_spot_em', _frame(), trade_date=TRADE_DATE)
+    _age(cache, 'stock_zh_a_spot_em', _session_close(TRADE_DATE) - 86400)
+    
+    def fetch():
+        raise AssertionError("离线模式不应请求网络")
+    
+    assert len(cache.get_or_fetch('stock_zh_a_spot_em', fetch)) == 50
+    with pytest.raises(CacheMissError):
+        cache.get_or_fetch('stock_zt_pool_em', fetch, {'date': '20240603'})
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地数据仓库测试（按交易日分区替换、重新打开后读取）
+运行: python -m pytest test_data_warehouse.py
+"""
+
+import pytest
+
+from data_warehouse import MarketWarehouse
+
+
+def _market_data(close, up, sectors=('半导体', '软件开发'), north=None):
+    return {
+        '获取时间': '2024-06-03 15:05:00',
+        '指数数据': {
+            '上证指数': {'收盘点位': close, '涨跌幅': 0.5, '成交额': 4200.0},
+            '深证成指': {'收盘点位': 9500.0, '涨跌幅': -0.2, '成交额': 5300.0},
+        },
+        '市场统计': {'上涨家数': up, '下跌家数': 5000 - up, '平盘家数': 100, '总家数': 5100,
+                 '涨停家数': 60, '跌停家数': 5, '炸板家数': 12},
+        '北向资金': north or {'沪股通': 10.0, '深股通': -4.0, '合计': 6.0},
+        '板块数据': {
+            '领涨板块': [{'板块名称': name, '涨跌幅': 3.0 - i} for i, name in enumerate(sectors)],
+            '领跌板块': [{'板块名称': '煤炭', '涨跌幅': -2.1}],
+        },
+        '资金流向': {},
+    }
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'warehouse.sqlite')
+
+
+def test_partition_is_replaced(db_path):
+    """同一交易日重复写入时替换整个分区，不残留旧行"""
+    warehouse = MarketWarehouse(db_path=db_path)
+    warehouse.append_market_data(_market_data(3050.0, 2500, sectors=('半导体', '软件开发', '通信设备')), '2024-06-03')
+    warehouse.append_market_data(_market_data(3060.0, 2600, sectors=('医药',)), '2024-06-03')
+    
+    sectors = warehouse.load_partition('sector_daily', '2024-06-03')
+    assert sorted(zip(sectors['direction'], sectors['板块名称'])) == [('领涨', '医药'), ('领跌', '煤炭')]
+    stats = warehouse.load_partition('market_stats_daily', '2024-06-03', columns=['上涨家数'])
+    assert stats['上涨家数'].tolist() == [2600]
+    assert warehouse.trade_dates() == ['2024-06-03']
+    warehouse.close()
+
+
+def test_reload_after_reopen(db_path):
+    """重新打开仓库后按交易日读取序列、分区和完整 market_data"""
+    warehouse = MarketWarehouse(db_path=db_path)
+    for date, close, up in (('2024-05-31', 3040.0, 2000), ('2024-06-03', 3050.0, 2500), ('2024-06-04', 3070.0, 3000)):
+        warehouse.append_market_data(_market_data(close, up), date)
+    warehouse.close()
+    
+    warehouse = MarketWarehouse(db_path=db_path)
+    assert warehouse.load_market_data('2024-06-03')['指数数据']['上证指数']['收盘点位'] == 3050.0
+    assert warehouse.load_market_data('2024-06-05') is None
+    
+    series = warehouse.load_series('index_daily', days=2, columns=['收盘点位'], key='上证指数')
+    assert series['trade_date'].tolist() == ['2024-06-03', '2024-06-04']
+    assert series['收盘点位'].tolist() == [3050.0, 3070.0]
+    
+    summary = warehouse.recent_summary(days=3, end_date='2024-06-03')
+    assert [row['交易日'] for row in summary] == ['2024-05-31', '2024-06-03']
+    assert summary[-1]['两市成交额'] == 9500.0
+    assert summary[-1]['北向合计'] == 6.0
+    warehouse.close()
+
+
+def test_placeholders_are_not_archived(db_path):
+    """涨跌家数不可用或北向资金不是当日数据时，不写入对应分区"""
+    warehouse = MarketWarehouse(db_path=db_path)
+    data = _market_data(3050.0, 2500, north={'沪股通': 10.0, '深股通': -4.0, '合计': 6.0, '数据日期': '2024-05-31'})
+    data['市场统计'] = dict.fromkeys(('上涨家数', '下跌家数', '平盘家数', '总家数', '涨停家数', '跌停家数'))
+    warehouse.append_market_data(data, '2024-06-03')
+    
+    assert warehouse.load_market_data('2024-06-03') is None
+    assert warehouse.load_partition('market_stats_daily', '2024-06-03').empty
+    assert warehouse.load_partition('north_bound_daily', '2024-06-03').empty
+    assert len(warehouse.load_partition('index_daily', '2024-06-03')) == 2
+    warehouse.close()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件投递队列测试（模拟发件器，不连接 SMTP 服务）
+运行: python -m pytest test_delivery_queue.py
+"""
+
+import smtplib
+import sqlite3
+
+import pytest
+
+from delivery_queue import DeliveryQueue, DeliveryWorker
+
+
+class _RefusingSender:
+    """拒收指定收件人，其余发送成功"""
+    
+    def __init__(self, refused):
+        self.refused = refused
+    
+    def send_report_batch(self, recipients, report_filepath, subject=None):
+        failed = {
+            recipient: str(smtplib.SMTPRecipientsRefused({recipient: (550, b'no such user')}))
+            for recipient in recipients if recipient in self.refused
+        }
+        return {'sent': [r for r in recipients if r not in failed], 'failed': failed}
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    report = tmp_path / 'report.md'
+    report.write_text("# 报告", encoding='utf-8')
+    queue = DeliveryQueue(db_path=str(tmp_path / 'outbox.sqlite'), max_attempts=5)
+    yield queue, str(report)
+    queue.close()
+
+
+def test_refused_recipient_is_dead_lettered(outbox):
+    """收件人被拒（550）不重试，直接转入死信"""
+    queue, report = outbox
+    queue.enqueue(['ok@example.com', 'nobody@example.com'], report)
+    
+    counts = DeliveryWorker(queue, sender=_RefusingSender({'nobody@example.com'})).process_once()
+    assert counts == {'sent': 1, 'retry': 0, 'dead': 1}
+    assert queue.dead_letters()[0][0] == 'nobody@example.com'
+
+
+def test_missing_credentials_are_dead_lettered(outbox, monkeypatch):
+    """未配置发件邮箱时不进入退避重试"""
+    monkeypatch.delenv('SENDER_EMAIL', raising=False)
+    monkeypatch.delenv('SENDER_PASSWORD', raising=False)
+    queue, report = outbox
+    queue.enqueue(['ok@example.com'], report)
+    
+    totals = DeliveryWorker(queue).drain(wait=90)
+    assert totals == {'sent': 0, 'retry': 0, 'dead': 1}
+    assert queue.next_due() is None
+    assert '邮件配置错误' in queue.dead_letters()[0][2]
+
+
+def test_regenerated_report_is_resent(outbox):
+    """报告内容不变时不重复投递，重新生成后重新排队"""
+    queue, report = outbox
+    sender = _RefusingSender(set())
+    assert queue.enqueue(['ok@example.com'], report) == 1
+    assert DeliveryWorker(queue, sender=sender).process_once()['sent'] == 1
+    
+    assert queue.enqueue(['ok@example.com'], report) == 0
+    assert queue.stats()['sent'] == 1
+    
+    with open(report, 'w', encoding='utf-8') as f:
+        f.write("# 报告（修订）")
+    assert queue.enqueue(['ok@example.com'], report) == 1
+    assert queue.stats()['pending'] == 1
+    assert DeliveryWorker(queue, sender=sender).process_once()['sent'] == 1
+
+
+def test_legacy_outbox_is_migrated(tmp_path):
+    """旧版发件箱补充内容哈希后，已发送的任务不会被重复投递"""
+    report = tmp_path / 'report.md'
+    report.write_text("# 报告", encoding='utf-8')
+    db_path = str(tmp_path / 'outbox.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE deliveries (id INTEGER PRIMARY KEY AUTOINCREMENT, recipient TEXT NOT NULL, "
+        "report_path TEXT NOT NULL, subject TEXT, status TEXT NOT NULL DEFAULT 'pending', "
+        "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, last_error TEXT, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL, UNIQUE (recipient, report_path))"
+    )
+    conn.execute(
+        "INSERT INTO deliveries (recipient, report_path, status, next_attempt_at, created_at, updated_at) "
+        "VALUES ('ok@example.com', ?, 'sent', 0, 0, 0)",
+        (str(report),)
+    )
+    conn.commit()
+    conn.close()
+    
+    queue = DeliveryQueue(db_path=db_path)
+    assert queue.enqueue(['ok@example.com'], str(report)) == 0
+    assert queue.stats()['sent'] == 1
+    queue.close()
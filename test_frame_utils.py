@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+top_n_records 测试（与逐行排序取前 N 的朴素实现对比）
+运行: python -m pytest test_frame_utils.py
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from frame_utils import top_n_records
+
+
+def _naive(df, column, n, columns, largest=True, numeric=None):
+    """逐行解析排序列，跳过无法解析的值（停牌为 '-' 或 NaN），稳定排序后取前 N 行"""
+    rows = []
+    for _, row in df.iterrows():
+        try:
+            value = float(row[column])
+        except (TypeError, ValueError):
+            continue
+        if math.isnan(value):
+            continue
+        rows.append((value, row))
+    rows.sort(key=lambda item: -item[0] if largest else item[0])
+    
+    records = []
+    for value, row in rows[:n]:
+        record = {}
+        for source, target in columns.items():
+            record[target] = value if source == column else row[source]
+        for name, factor in (numeric or {}).items():
+            record[name] = float(record[name]) * factor
+        records.append(record)
+    return records
+
+
+@pytest.fixture
+def flow():
+    """个股资金流向（含停牌 '-'、NaN 及字符串数值）"""
+    rng = np.random.default_rng(7)
+    inflow = rng.permutation(np.arange(-50, 50)) * 1.37e7
+    frame = pd.DataFrame({
+        '代码': [f"{i:06d}" for i in range(len(inflow))],
+        '名称': [f"股票{i}" for i in range(len(inflow))],
+        '主力净流入-净额': inflow.astype(object),
+        '涨跌幅': np.round(rng.normal(0, 3, len(inflow)), 2).astype(str),
+    })
+    frame.loc[[3, 17], '主力净流入-净额'] = '-'
+    frame.loc[[5, 40], '主力净流入-净额'] = np.nan
+    frame.loc[8, '主力净流入-净额'] = str(frame.loc[8, '主力净流入-净额'])
+    return frame
+
+
+COLUMNS = {'名称': '股票名称', '代码': '股票代码', '主力净流入-净额': '净流入', '涨跌幅': '涨跌幅'}
+NUMERIC = {'净流入': 1 / 100000000, '涨跌幅': 1}
+
+
+@pytest.mark.parametrize('largest', [True, False])
+@pytest.mark.parametrize('n', [1, 10, 200])
+def test_matches_naive(flow, largest, n):
+    """最大/最小的前 N 行，N 大于有效行数时返回全部有效行"""
+    expected = _naive(flow, '主力净流入-净额', n, COLUMNS, largest, NUMERIC)
+    result = top_n_records(flow, '主力净流入-净额', n, COLUMNS, largest, NUMERIC)
+    assert result == [
+        {key: pytest.approx(value) if isinstance(value, float) else value for key, value in record.items()}
+        for record in expected
+    ]
+    assert len(result) == min(n, len(flow) - 4)
+
+
+def test_empty_inputs(flow):
+    assert top_n_records(flow, '主力净流入-净额', 0, COLUMNS) == []
+    assert top_n_records(flow.iloc[:0], '主力净流入-净额', 5, COLUMNS) == []
+    assert top_n_records(None, '主力净流入-净额', 5, COLUMNS) == []
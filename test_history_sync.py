@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史序列增量同步测试（模拟接口，不访问网络）
+运行: python -m pytest test_history_sync.py
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+import history_sync
+from data_cache import last_closed_trade_date
+from data_warehouse import MarketWarehouse
+from history_sync import HistorySync
+
+BEIJING = timezone(timedelta(hours=8))
+
+
+class _FakeFetcher:
+    """按顺序返回预设的北向资金历史"""
+    
+    def __init__(self, *frames):
+        self.frames = list(frames)
+        self.calls = 0
+    
+    def _call(self, func_name, **kwargs):
+        self.calls += 1
+        return self.frames.pop(0)
+
+
+def _north(*rows):
+    return pd.DataFrame(rows, columns=['date', '当日资金流入'])
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    warehouse = MarketWarehouse(db_path=str(tmp_path / 'warehouse.sqlite'))
+    yield warehouse
+    warehouse.close()
+
+
+def _trading_day(monkeypatch, trade_date, closed_through):
+    monkeypatch.setattr(history_sync, 'current_trade_date', lambda: trade_date)
+    monkeypatch.setattr(history_sync, 'last_closed_trade_date', lambda: closed_through)
+
+
+def test_last_closed_trade_date():
+    """收盘前归属上一个工作日，收盘后为当日"""
+    assert last_closed_trade_date(datetime(2024, 6, 3, 10, 0, tzinfo=BEIJING)) == '2024-05-31'
+    assert last_closed_trade_date(datetime(2024, 6, 3, 15, 0, tzinfo=BEIJING)) == '2024-06-03'
+    assert last_closed_trade_date(datetime(2024, 6, 4, 8, 0, tzinfo=BEIJING)) == '2024-06-03'
+    assert last_closed_trade_date(datetime(2024, 6, 8, 12, 0, tzinfo=BEIJING)) == '2024-06-07'
+
+
+def test_intraday_row_is_refetched_after_close(warehouse, monkeypatch):
+    """盘中写入的当日行不推进高水位，收盘后重新获取并覆盖"""
+    fetcher = _FakeFetcher(
+        _north(('2024-05-31', 10.0), ('2024-06-03', 1.0)),
+        _north(('2024-05-31', 10.0), ('2024-06-03', 5.0)),
+    )
+    sync = HistorySync(warehouse, fetcher)
+    
+    _trading_day(monkeypatch, '2024-06-03', '2024-05-31')
+    sync.sync_north_bound('沪股通')
+    assert warehouse.high_water_mark('north:沪股通') == '2024-05-31'
+    assert sync.latest('north:沪股通') == 1.0
+    
+    _trading_day(monkeypatch, '2024-06-03', '2024-06-03')
+    assert sync.sync_north_bound('沪股通') == 1
+    assert warehouse.high_water_mark('north:沪股通') == '2024-06-03'
+    assert sync.latest('north:沪股通') == 5.0
+    
+    assert sync.sync_north_bound('沪股通') == 0
+    assert fetcher.calls == 2
+
+
+def test_north_bound_summary_labels_stale_date(warehouse, monkeypatch):
+    """本地最新数据早于当前交易日时标注数据日期"""
+    fetcher = _FakeFetcher(_north(('2024-05-31', 10.0)), _north(('2024-05-31', -4.0)))
+    sync = HistorySync(warehouse, fetcher)
+    _trading_day(monkeypatch, '2024-06-03', '2024-05-31')
+    for channel in history_sync.NORTH_CHANNELS:
+        sync.sync_north_bound(channel)
+    
+    summary = sync.north_bound_summary(windows=(1,))
+    assert summary['合计'] == 6.0
+    assert summary['数据日期'] == '2024-05-31'
+    
+    monkeypatch.setattr(history_sync, 'current_trade_date', lambda: '2024-05-31')
+    assert '数据日期' not in sync.north_bound_summary(windows=(1,))
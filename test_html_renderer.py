@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告 HTML 渲染缓存测试
+运行: python -m pytest test_html_renderer.py
+"""
+
+import os
+
+import html_renderer
+from html_renderer import HtmlRenderer
+
+REPORT = "# A股复盘\n\n| 指数 | 涨跌幅 |\n|---|---|\n| 上证指数 | +0.53% |"
+
+
+def _cached_files(path):
+    return sorted(name for name in os.listdir(path) if name.endswith('.html'))
+
+
+def test_key_depends_on_content_and_template(monkeypatch):
+    """内容或页面模板变化时缓存键不同"""
+    key = HtmlRenderer.content_key(REPORT)
+    assert key == HtmlRenderer.content_key(REPORT)
+    assert key != HtmlRenderer.content_key(REPORT + "\n")
+    
+    monkeypatch.setattr(html_renderer, 'TEMPLATE_DIGEST', 'changed-style')
+    assert key != HtmlRenderer.content_key(REPORT)
+
+
+def test_disk_cache_is_shared_between_renderers(tmp_path):
+    """另一个渲染器（如邮件发送进程）直接读取磁盘上的渲染结果"""
+    page = HtmlRenderer(cache_dir=str(tmp_path)).render(REPORT)
+    assert '<table>' in page and page.startswith(html_renderer.HTML_HEAD)
+    assert _cached_files(tmp_path) == [f"{HtmlRenderer.content_key(REPORT)}.html"]
+    
+    renderer = HtmlRenderer(cache_dir=str(tmp_path))
+    renderer.convert = None  # 命中磁盘缓存时不会再转换
+    assert renderer.render(REPORT) == page
+
+
+def test_memory_and_disk_eviction(tmp_path):
+    renderer = HtmlRenderer(cache_dir=str(tmp_path), memory_entries=2, disk_entries=3)
+    for i in range(5):
+        renderer.render(f"{REPORT}\n\n第{i}版")
+    assert len(renderer._memory) == 2
+    assert len(_cached_files(tmp_path)) == 3
+
+
+def test_plain_fallback_is_not_cached_on_disk(tmp_path, monkeypatch):
+    """没有 markdown 库时的纯文本页面只保存在内存中"""
+    renderer = HtmlRenderer(cache_dir=str(tmp_path))
+    monkeypatch.setattr(renderer, '_get_converter', lambda: None)
+    page = renderer.render("<b>数据</b>")
+    assert '<pre>&lt;b&gt;数据&lt;/b&gt;</pre>' in page
+    assert _cached_files(tmp_path) == []
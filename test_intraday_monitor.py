@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘中轮询增量对比测试（两次合成快照，不访问网络）
+运行: python -m pytest test_intraday_monitor.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from intraday_monitor import IntradayMonitor, SnapshotState
+from market_snapshot import MarketSnapshot
+
+
+def _state(rows, limit_up, up, down, sectors):
+    frame = pd.DataFrame(rows, columns=['代码', '名称', '最新价', '成交量'])
+    snapshot = MarketSnapshot.from_spot(frame, fetched_at='2024-06-03 10:00:00')
+    stats = {'上涨家数': up, '下跌家数': down, '总家数': len(rows), '涨停家数': sum(limit_up), '跌停家数': 0}
+    return SnapshotState(snapshot, snapshot.code_numbers(), np.asarray(limit_up), stats, sectors)
+
+
+@pytest.fixture
+def monitor():
+    return IntradayMonitor(fetcher=object(), limit_up_threshold=2, breadth_threshold=10, rotation_threshold=2)
+
+
+@pytest.fixture
+def snapshots():
+    previous = _state(
+        [('600000', '甲', 11.00, 100.0), ('600001', '乙', 12.10, 200.0), ('600002', '丙', 5.50, 300.0),
+         ('600003', '丁', np.nan, np.nan), ('600004', '戊', 8.00, 50.0)],
+        [False, True, True, False, False], up=3, down=1, sectors=['半导体', '软件开发', '通信设备']
+    )
+    # 600000 退市，600005 为新股；600001 无变化，600002 开板，600003 仍停牌，600004 成交量变化
+    current = _state(
+        [('600001', '乙', 12.10, 200.0), ('600002', '丙', 5.40, 350.0), ('600003', '丁', np.nan, np.nan),
+         ('600004', '戊', 8.00, 80.0), ('600005', '己', 13.20, 10.0)],
+        [True, False, False, False, True], up=1, down=4, sectors=['煤炭', '银行', '半导体']
+    )
+    return previous, current
+
+
+def test_first_poll_saves_everything(monitor, snapshots):
+    _, current = snapshots
+    changed, events = monitor.diff(None, current)
+    assert changed.all()
+    assert events['领涨板块'] == ['煤炭', '银行', '半导体']
+    assert '新增涨停' not in events
+
+
+def test_diff_between_snapshots(monitor, snapshots):
+    """只保存新增或价格、成交量变化的股票；统计新增涨停、开板和板块轮动"""
+    previous, current = snapshots
+    changed, events = monitor.diff(previous, current)
+    
+    assert current.snapshot.codes()[changed].tolist() == ['600002', '600004', '600005']
+    assert (events['新增涨停'], events['新增涨停股票'], events['开板']) == (1, ['己'], 1)
+    assert (events['上涨家数变化'], events['下跌家数变化']) == (-2, 3)
+    assert events['上涨占比变化'] == -40.0
+    assert events['新进领涨板块'] == ['煤炭', '银行']
+    assert events['退出领涨板块'] == ['软件开发', '通信设备']
+
+
+def test_triggered_uses_cumulative_change_since_last_note(monitor, snapshots):
+    """没有基准时不触发；按上一次快讯以来的累计变化判断各项阈值"""
+    previous, current = snapshots
+    _, base = monitor.diff(None, previous)
+    _, events = monitor.diff(previous, current)
+    assert monitor.triggered(events) == []
+    
+    monitor.note_base = base
+    reasons = monitor.triggered(events)
+    assert reasons == ["上涨家数占比变化 -55.0 个百分点", "领涨板块轮动: 煤炭、银行"]
+    
+    monitor.note_base = dict(events)
+    assert monitor.triggered(dict(events, 开板=0)) == []
+    assert monitor.triggered(dict(events, 涨停家数=events['涨停家数'] + 2, 开板=2)) == [
+        "涨停家数较上次快讯+2", "开板 2 家"
+    ]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI 响应缓存测试（模拟模型客户端，不调用真实 API）
+运行: python -m pytest test_llm_cache.py
+"""
+
+import os
+
+import pytest
+
+from concurrency_limits import ConcurrencyLimiter
+from llm_cache import LLMResponseCache
+from multi_model_client import AIModelClient, MultiModelManager
+
+
+class _CountingClient(AIModelClient):
+    """返回固定内容并记录调用次数"""
+    
+    def __init__(self, name: str, text: str):
+        super().__init__('key', name)
+        self.text = text
+        self.calls = 0
+    
+    def generate(self, prompt: str, system_instruction: str = "") -> str:
+        self.calls += 1
+        return self.text
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(cache_dir=str(tmp_path), enabled=True, bypass=False)
+
+
+@pytest.fixture
+def make_manager(monkeypatch, cache):
+    monkeypatch.setattr(MultiModelManager, '_init_clients', lambda self: None)
+    
+    def make(clients):
+        manager = MultiModelManager(race=False, cache=cache, limiter=ConcurrencyLimiter())
+        manager.clients = clients
+        return manager
+    return make
+
+
+def test_key_covers_model_prompt_and_params():
+    """模型、系统指令、提示词或生成参数任一不同时键不同；参数顺序不影响键"""
+    key = LLMResponseCache.make_key('Gemini/pro', '系统', '提示词', {'temperature': 0.7, 'top_p': 0.9})
+    assert key == LLMResponseCache.make_key('Gemini/pro', '系统', '提示词', {'top_p': 0.9, 'temperature': 0.7})
+    assert len({
+        key,
+        LLMResponseCache.make_key('DeepSeek/chat', '系统', '提示词', {'temperature': 0.7, 'top_p': 0.9}),
+        LLMResponseCache.make_key('Gemini/pro', '', '提示词', {'temperature': 0.7, 'top_p': 0.9}),
+        LLMResponseCache.make_key('Gemini/pro', '系统', '提示词。', {'temperature': 0.7, 'top_p': 0.9}),
+        LLMResponseCache.make_key('Gemini/pro', '系统', '提示词', {'temperature': 0.2, 'top_p': 0.9}),
+    }) == 5
+
+
+def test_hit_miss_bypass_and_corrupt_entries(cache, tmp_path):
+    key = LLMResponseCache.make_key('Gemini/pro', '', '提示词')
+    assert cache.get(key) is None
+    
+    cache.put(key, '# 报告', 'Gemini')
+    assert cache.get(key)['content'] == '# 报告'
+    assert (cache.hits, cache.misses) == (1, 1)
+    
+    assert LLMResponseCache(cache_dir=str(tmp_path), enabled=True, bypass=True).get(key) is None
+    assert LLMResponseCache(cache_dir=str(tmp_path), enabled=False).get(key) is None
+    
+    with open(cache._key_path(key), 'w', encoding='utf-8') as f:
+        f.write('{"content": ')
+    assert cache.get(key) is None
+
+
+def test_empty_content_is_not_cached(cache):
+    key = LLMResponseCache.make_key('Gemini/pro', '', '提示词')
+    cache.put(key, '', 'Gemini')
+    assert not os.path.exists(cache._key_path(key))
+
+
+def test_manager_reuses_cached_response(make_manager):
+    """同一提示词第二次生成直接返回缓存；提示词变化时重新调用模型"""
+    client = _CountingClient('Gemini', '# 报告')
+    manager = make_manager([('Gemini', client)])
+    
+    assert manager.generate('提示词', '系统') == ('# 报告', 'Gemini')
+    assert manager.generate('提示词', '系统') == ('# 报告', 'Gemini')
+    assert client.calls == 1
+    
+    manager.generate('另一个提示词', '系统')
+    assert client.calls == 2
+
+
+def test_manager_checks_cache_in_model_order(make_manager, cache):
+    """首选模型没有缓存时使用其他模型已缓存的结果，不再调用模型"""
+    gemini = _CountingClient('Gemini', 'Gemini 报告')
+    deepseek = _CountingClient('DeepSeek', 'DeepSeek 报告')
+    cache.put(deepseek.cache_key('提示词'), '缓存的 DeepSeek 报告', 'DeepSeek')
+    manager = make_manager([('Gemini', gemini), ('DeepSeek', deepseek)])
+    
+    assert manager.generate('提示词', preferred_model='Gemini') == ('缓存的 DeepSeek 报告', 'DeepSeek')
+    assert gemini.calls == deepseek.calls == 0
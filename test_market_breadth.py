@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+市场宽度计算测试（与逐行计数的朴素实现对比）
+运行: python -m pytest test_market_breadth.py
+"""
+
+import numpy as np
+import pytest
+
+from market_breadth import DISTRIBUTION_BINS, BreadthEngine
+
+
+def _naive(pct, limit_up_pct=None, limit_down_pct=None):
+    """逐行比较计数（阈值按数据精度转换，与快照的 float32 列一致）"""
+    edge = pct.dtype.type
+    stats = {'上涨家数': 0, '下跌家数': 0, '平盘家数': 0, '涨停家数': 0, '跌停家数': 0}
+    distribution = dict.fromkeys([name for name, _, _ in DISTRIBUTION_BINS], 0)
+    for i, x in enumerate(pct):
+        if x != x:
+            continue
+        if x > 0:
+            stats['上涨家数'] += 1
+        elif x < 0:
+            stats['下跌家数'] += 1
+        else:
+            stats['平盘家数'] += 1
+        up = edge(9.9) if limit_up_pct is None else edge(limit_up_pct[i])
+        down = edge(-9.9) if limit_down_pct is None else edge(limit_down_pct[i])
+        stats['涨停家数'] += bool(x >= up)
+        stats['跌停家数'] += bool(x <= down)
+        for name, low, high in DISTRIBUTION_BINS:
+            if high is None:
+                hit = x >= edge(low)
+            elif low is None:
+                hit = x <= edge(high)
+            elif low >= 0:
+                hit = edge(low) <= x < edge(high) and x != 0
+            else:
+                hit = edge(low) < x <= edge(high) and x != 0
+            if hit:
+                distribution[name] += 1
+    stats['总家数'] = len(pct)
+    stats['涨跌比'] = f"{stats['上涨家数']}/{stats['下跌家数']}"
+    stats['涨跌分布'] = distribution
+    return stats
+
+
+# 每个分档边界、边界两侧各一个价位，以及停牌（NaN）
+EDGE_VALUES = [
+    value
+    for edge in (-29.9, -19.9, -9.9, -5.0, -3.0, -1.0, 0.0, 1.0, 3.0, 5.0, 9.9, 19.9, 29.9)
+    for value in (edge - 0.01, edge, edge + 0.01)
+] + [np.nan, np.nan, -35.0, 44.0]
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_edges_and_suspended(dtype):
+    """分档边界上的值与逐行计数一致，NaN 只计入总家数"""
+    pct = np.asarray(EDGE_VALUES, dtype=dtype)
+    assert BreadthEngine().compute(pct) == _naive(pct)
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_random_snapshot(dtype):
+    """随机快照（两位小数，含停牌）与逐行计数一致"""
+    rng = np.random.default_rng(20240603)
+    pct = np.round(rng.normal(0, 4, 5000).clip(-30, 30), 2)
+    pct[rng.choice(len(pct), 50, replace=False)] = np.nan
+    pct = pct.astype(dtype)
+    assert BreadthEngine().compute(pct) == _naive(pct)
+
+
+def test_per_stock_limits():
+    """逐只股票的涨跌停阈值"""
+    pct = np.asarray([4.99, 5.0, 10.0, 19.99, 20.0, -5.0, -20.0, np.nan], dtype=np.float32)
+    limit_up = np.asarray([5.0, 5.0, 10.0, 20.0, 20.0, 5.0, 20.0, 10.0])
+    limit_down = -limit_up
+    expected = _naive(pct, limit_up, limit_down)
+    assert BreadthEngine().compute(pct, limit_up, limit_down) == expected
+    assert (expected['涨停家数'], expected['跌停家数']) == (3, 2)
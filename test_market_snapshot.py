@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场行情快照测试（模拟 AkShare 行情表，不访问网络）
+运行: python -m pytest test_market_snapshot.py
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_cache import DataFrameCache
+from fetch_data import AStockDataFetcher
+from market_snapshot import MarketSnapshot
+
+
+SPOT = pd.DataFrame({
+    '序号': [1, 2, 3, 4],
+    '代码': ['600000', '000001', '300750', '830001'],
+    '名称': ['浦发银行', '平安银行', '宁德时代', '北交所'],
+    '最新价': [11.00, 9.00, '-', 10.50],
+    '涨跌幅': [10.0, -10.0, '-', 5.0],
+    '成交额': [1.2e9, 8.5e8, '-', 3.0e7],
+    '昨收': [10.00, 10.00, 180.00, 10.00],
+    '最高': [11.00, 10.10, '-', 10.80],
+})
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    """只返回行情快照的数据获取器，记录下载次数"""
+    monkeypatch.setenv('BOARD_INDEX_CACHE_DIR', str(tmp_path / 'board_index'))
+    fetcher = AStockDataFetcher(concurrent=False, cache=DataFrameCache(cache_dir=str(tmp_path), enabled=False))
+    fetcher.downloads = 0
+    
+    def call(endpoint, **kwargs):
+        assert endpoint == 'stock_zh_a_spot_em'
+        fetcher.downloads += 1
+        time.sleep(0.05)
+        return SPOT.copy()
+    
+    monkeypatch.setattr(fetcher, '_call', call)
+    return fetcher
+
+
+def test_from_spot_compacts_columns():
+    """只保留需要的列，停牌的 '-' 转为 NaN，价格为 float32"""
+    snapshot = MarketSnapshot.from_spot(SPOT)
+    assert '序号' not in snapshot.frame.columns
+    assert snapshot.frame['最新价'].dtype == np.float32
+    assert snapshot.frame['成交额'].dtype == np.float64
+    assert np.isnan(snapshot.column('涨跌幅')[2])
+    assert snapshot.code_numbers().tolist() == [600000, 1, 300750, 830001]
+    
+    found = snapshot.lookup(['300750', '000001', '999999'], columns=['名称', '昨收'])
+    assert sorted(found.index) == ['000001', '300750']
+    assert found.loc['300750', '昨收'] == 180.0
+
+
+def test_snapshot_is_downloaded_once(fetcher):
+    """多个线程同时读取快照时只下载一次"""
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetcher.get_market_snapshot())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert fetcher.downloads == 1
+    assert all(result is results[0] for result in results)
+    
+    fetcher.get_market_snapshot(refresh=True)
+    assert fetcher.downloads == 2
+
+
+def test_market_stats_from_snapshot(fetcher):
+    """市场统计直接由共享快照计算"""
+    stats = fetcher.fetch_market_stats()
+    assert fetcher.downloads == 1
+    assert (stats['上涨家数'], stats['下跌家数'], stats['总家数']) == (2, 1, 4)
+    assert (stats['涨停家数'], stats['跌停家数']) == (1, 1)
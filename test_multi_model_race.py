@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多模型竞速模式测试（本地模拟服务，不调用真实 API）
+运行: python -m pytest test_multi_model_race.py
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from concurrency_limits import ConcurrencyLimiter
+from multi_model_client import AIModelClient, MultiModelManager
+
+
+class _StalledHandler(BaseHTTPRequestHandler):
+    """返回响应头后不再发送内容"""
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        self.wfile.flush()
+        self.server.release.wait(10)
+    
+    def log_message(self, *args):
+        pass
+
+
+class _FakeClient(AIModelClient):
+    """延迟 delay 秒后返回 text"""
+    
+    def __init__(self, name: str, text: str = '', delay: float = 0.0):
+        super().__init__('key', name)
+        self.text = text
+        self.delay = delay
+        self.finished = threading.Event()
+    
+    def generate_stream(self, prompt: str, system_instruction: str = ""):
+        try:
+            time.sleep(self.delay)
+            yield self.text
+        finally:
+            self.finished.set()
+
+
+class _StalledClient(_FakeClient):
+    """流式请求收到响应头后一直收不到首个 token"""
+    
+    def generate_stream(self, prompt: str, system_instruction: str = ""):
+        try:
+            with self._post(f"{self.base_url}/stream", {}, {}, stream=True) as response:
+                for line in response.iter_lines():
+                    yield line
+        finally:
+            self.finished.set()
+
+
+@pytest.fixture
+def make_manager(monkeypatch, tmp_path):
+    monkeypatch.setattr(MultiModelManager, '_init_clients', lambda self: None)
+    monkeypatch.setenv('LLM_CACHE_DIR', str(tmp_path))
+    
+    def make(clients, **kwargs):
+        manager = MultiModelManager(race=True, limiter=ConcurrencyLimiter(), **kwargs)
+        manager.clients = clients
+        return manager
+    return make
+
+
+def test_budget_blocked_hedge_waits_for_running_call(make_manager):
+    """成本上限不允许启动对冲模型时，继续等待首选模型的结果"""
+    slow = _FakeClient('Gemini', text='首选模型的报告', delay=0.3)
+    manager = make_manager(
+        [('Gemini', slow), ('DeepSeek', _FakeClient('DeepSeek', text='对冲模型的报告'))],
+        hedge_delay=0.05, race_budget=2, costs={'Gemini': 2, 'DeepSeek': 1}
+    )
+    
+    result, errors, _ = manager._race('prompt', '', 'Gemini')
+    assert result == ('首选模型的报告', 'Gemini')
+    assert errors == []
+
+
+def test_cancel_closes_stalled_response(make_manager):
+    """胜出后立即关闭还未返回首个 token 的对冲调用"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StalledHandler)
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        stalled = _StalledClient('Gemini')
+        stalled.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        manager = make_manager(
+            [('Gemini', stalled), ('DeepSeek', _FakeClient('DeepSeek', text='对冲模型的报告', delay=0.1))],
+            hedge_delay=0.1, race_budget=2
+        )
+        
+        result, _, _ = manager._race('prompt', '', 'Gemini')
+        assert result == ('对冲模型的报告', 'DeepSeek')
+        assert stalled.finished.wait(2)
+    finally:
+        server.release.set()
+        server.shutdown()
+        server.server_close()
+
+
+class _HangingHandler(BaseHTTPRequestHandler):
+    """接受请求后一直不返回响应头"""
+    
+    def do_POST(self):
+        self.server.requests += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.release.wait(10)
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_read_timeout_is_not_retried():
+    """读取超时直接抛出交由故障转移，不再重试"""
+    import requests
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _HangingHandler)
+    server.requests = 0
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = _FakeClient('Gemini')
+        client.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        client.max_retries = 3
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            client._post(f"{client.base_url}/generate", {}, {}, timeout=0.2)
+        assert server.requests == 1
+    finally:
+        server.release.set()
+        server.shutdown()
+        server.server_close()
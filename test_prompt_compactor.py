@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑提示词测试（token 估算与按优先级裁剪）
+运行: python -m pytest test_prompt_compactor.py
+"""
+
+import pytest
+
+from prompt_compactor import compact_sections, estimate_tokens, fit_to_budget
+
+
+def _market_data():
+    index = {'收盘点位': 3050.12, '涨跌幅': 0.53, '涨跌点': 16.1, '成交额': 4200.0, '最高': 3060.0, '最低': 3030.0}
+    return {
+        '获取时间': '2024-06-03 15:05:00',
+        '数据来源': 'AkShare',
+        '指数数据': {'上证指数': index, '创业板指': dict(index, 收盘点位=2010.45, 涨跌幅=-1.25)},
+        '市场统计': {
+            '上涨家数': 2510, '下跌家数': 2456, '平盘家数': 100, '涨跌比': '2510/2456',
+            '涨停家数': 68, '跌停家数': 5, '炸板家数': 20, '封板率': '77.3%',
+            '分板块涨跌停': {'主板': {'总家数': 3000, '涨停': 50, '跌停': 4, '炸板': 15}},
+            '涨跌分布': {'涨幅≥9.9%': 68, '0~1%': 900},
+        },
+        '板块数据': {
+            '领涨板块': [{'板块名称': f"板块{i}", '涨跌幅': 5.0 - i, '领涨股票': f"股票{i}"} for i in range(10)],
+            '领跌板块': [{'板块名称': '煤炭', '涨跌幅': -2.1, '领涨股票': '中国神华'}],
+        },
+        '资金流向': {
+            '净流入TOP10': [{'股票名称': f"流入{i}", '净流入': 10.0 - i, '涨跌幅': 1.0} for i in range(10)],
+            '净流出TOP10': [{'股票名称': f"流出{i}", '净流出': -10.0 + i, '涨跌幅': -1.0} for i in range(10)],
+        },
+        '北向资金': {'沪股通': 10.0, '深股通': -4.0, '合计': 6.0, '5日累计': 30.0},
+        '技术指标': {'上证指数': {'MA5': 3040.0, 'MA20': 3020.0, 'MA60': None}},
+        '近期走势': [
+            {'交易日': f"2024-05-{day}", '上证指数': 3000.0 + day, '上证涨跌幅': 0.1, '创业板指': 2000.0,
+             '创业板涨跌幅': None, '两市成交额': 9000.0, '上涨家数': 2000, '下跌家数': 3000,
+             '涨停家数': 50, '跌停家数': None, '北向合计': None}
+            for day in range(20, 31)
+        ],
+    }
+
+
+PROVIDERS = ['Gemini', 'StepFun', 'DeepSeek']
+
+
+def _cost(text, reserved=0):
+    return max(estimate_tokens(text, provider) for provider in PROVIDERS) + reserved
+
+
+def test_estimate_tokens_by_provider():
+    """中文字符与其他字符分别折算"""
+    assert estimate_tokens('上证指数', 'Gemini') == 4
+    assert estimate_tokens('上证指数', 'DeepSeek') == 2
+    assert estimate_tokens('a' * 40, 'Gemini') == 10
+    assert estimate_tokens('a' * 35, 'unknown') == 10
+
+
+def test_sections_render_missing_values():
+    """缺失的均线和近期走势数值显示为 -"""
+    sections = {key: text for _, key, text in compact_sections(_market_data())}
+    assert list(sections) == ['core', 'sector', 'capital', 'north', 'breadth', 'indicator', 'history']
+    assert '|上证指数|3040.00|3020.00|-|' in sections['indicator']
+    assert '50/-' in sections['history']
+
+
+def test_generous_budget_keeps_everything():
+    sections = compact_sections(_market_data())
+    text, dropped = fit_to_budget(sections, 100000, PROVIDERS)
+    assert dropped == []
+    assert text == "\n\n".join(body for _, _, body in sections)
+
+
+@pytest.mark.parametrize('reserved', [0, 300])
+def test_tight_budget_drops_lowest_priority_first(reserved):
+    """从优先级最低的段落开始裁剪，结果不超过预算"""
+    sections = compact_sections(_market_data())
+    full = _cost("\n\n".join(body for _, _, body in sections), reserved)
+    history = next(body for _, key, body in sections if key == 'history')
+    
+    text, dropped = fit_to_budget(sections, full - 1, PROVIDERS, reserved)
+    assert dropped == [history.split("\n", 1)[0].lstrip('# ')]
+    assert _cost(text, reserved) <= full - 1
+    
+    core_only = _cost(sections[0][2], reserved)
+    text, dropped = fit_to_budget(sections, core_only, PROVIDERS, reserved)
+    assert text == sections[0][2]
+    assert dropped[:3] == ['近11个交易日', '指数均线', '分板块涨跌停']
+    assert dropped[-1] == '领涨板块'
+
+
+def test_core_is_kept_even_over_budget():
+    sections = compact_sections(_market_data())
+    text, _ = fit_to_budget(sections, 1, PROVIDERS)
+    assert text == sections[0][2]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+录制与回放测试（本地模拟 AI 接口，不访问网络）
+运行: python -m pytest test_replay.py
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from replay import FixtureBundle, RecordingSession, ReplaySession
+
+EVENTS = [b'data: {"text": "A"}\n\n', b'data: {"text": "B"}\n\n', b'data: [DONE]\n\n']
+
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    """先发送第一个事件，等测试读到后再发送其余事件"""
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        self.wfile.write(EVENTS[0])
+        self.wfile.flush()
+        self.server.release.wait(5)
+        for event in EVENTS[1:]:
+            self.wfile.write(event)
+        self.wfile.flush()
+        self.close_connection = True
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SSEHandler)
+    server.daemon_threads = True
+    server.release = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_stream_is_recorded_while_reading(server, tmp_path):
+    """流式响应不提前缓冲：服务端发送其余事件前即可读到第一个事件，关闭后完整写入夹具"""
+    bundle = FixtureBundle(str(tmp_path))
+    session = RecordingSession(requests.Session(), bundle)
+    url = f"http://127.0.0.1:{server.server_address[1]}/chat?key=secret"
+    
+    with session.post(url, json={'prompt': '复盘'}, stream=True) as response:
+        lines = response.iter_lines(decode_unicode=True)
+        assert next(lines) == 'data: {"text": "A"}'
+        assert bundle.load_http() == []
+        server.release.set()
+        assert [line for line in lines if line] == ['data: {"text": "B"}', 'data: [DONE]']
+    
+    entries = bundle.load_http()
+    assert len(entries) == 1
+    assert entries[0]['body'] == b''.join(EVENTS).decode('utf-8')
+    assert 'secret' not in entries[0]['url']
+    
+    replayed = ReplaySession(entries).post(url, json={'prompt': '复盘'})
+    assert replayed.text == entries[0]['body']
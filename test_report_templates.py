@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告数据表格模板测试（字段缺失或为 None 时的渲染）
+运行: python -m pytest test_report_templates.py
+"""
+
+from report_templates import render_market_stats, render_tables
+
+
+def _market_data():
+    return {
+        '指数数据': {
+            '上证指数': {'收盘点位': 3050.12, '涨跌幅': 0.53, '涨跌点': 16.1, '成交额': 4200.0, '最高': 3060.0, '最低': 3030.0},
+            '北证50': {'收盘点位': 980.5, '涨跌幅': None, '涨跌点': None, '成交额': float('nan'), '最高': 990.0, '最低': 975.0},
+        },
+        '市场统计': {
+            '上涨家数': 2510, '下跌家数': 2456, '平盘家数': 100, '涨跌比': '2510/2456',
+            '涨停家数': 68, '跌停家数': 5, '炸板家数': 20, '封板率': '77.3%',
+        },
+        '板块数据': {'领涨板块': [{'板块名称': '半导体', '涨跌幅': 3.21, '领涨股票': None}], '领跌板块': []},
+        '资金流向': {'净流入TOP10': [{'股票名称': '贵州茅台', '净流入': 5.2, '涨跌幅': None}]},
+        '北向资金': {'沪股通': 10.0, '深股通': None, '合计': 6.0, '5日累计': None},
+        '技术指标': {'上证指数': {'MA5': 3040.0, 'MA20': None}, '北证50': {'MA5': 985.0}},
+    }
+
+
+def test_none_fields_render_as_dash():
+    """单个字段为 None 或 NaN 时显示为 -，其余行照常渲染"""
+    text = render_tables(_market_data(), ['indices', 'sectors', 'capital', 'north', 'indicators'])
+    assert "| 上证指数 | 3050.12 | +0.53% | +16.10 | 4200.00 | 3060.00 | 3030.00 |" in text
+    assert "| 北证50 | 980.50 | -% | - | - | 990.00 | 975.00 |" in text
+    assert "| 1 | 半导体 | +3.21% | - |" in text
+    assert "| 1 | 贵州茅台 | 5.20 | -% |" in text
+    assert "| +10.00 | - | +6.00 |" in text
+    assert "5日累计 -亿元" in text
+    assert "| 上证指数 | 3040.00 | - |" in text
+    assert "| 北证50 | 985.00 | - |" in text
+
+
+def test_unavailable_breadth():
+    """涨跌家数不可用时只列涨跌停；涨跌停也不可用时省略表格"""
+    stats = dict.fromkeys(('上涨家数', '下跌家数', '平盘家数', '总家数', '涨跌比', '涨停家数', '跌停家数'))
+    assert render_market_stats({'市场统计': stats}) == ""
+    
+    stats.update(涨停家数=40, 炸板家数=None, 封板率=None)
+    assert render_market_stats({'市场统计': stats}) == "| 涨停家数 | 跌停家数 |\n|---|---|\n| 40 | - |"
+    
+    stats.update(上涨家数=2510, 下跌家数=2456, 平盘家数=None, 涨跌比='2510/2456', 炸板家数=10, 封板率='80.0%')
+    text = render_market_stats({'市场统计': stats})
+    assert "| 2510 | 2456 | - | 2510/2456 | 40 | - |" in text
+    assert "炸板 10 家，封板率 80.0%。" in text
+
+
+def test_missing_section_is_skipped():
+    """整段数据缺失时跳过该表格，不影响其他表格"""
+    data = _market_data()
+    del data['北向资金']
+    text = render_tables(data, ['north', 'stats'])
+    assert '北向资金' not in text
+    assert "| 2510 | 2456 | 100 | 2510/2456 | 68 | 5 |" in text
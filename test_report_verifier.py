@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告数值校验测试
+运行: python -m pytest test_report_verifier.py
+"""
+
+from report_verifier import ReportVerifier
+
+
+MARKET_DATA = {
+    '指数数据': {
+        '上证指数': {'最新价': 3050.12, '涨跌幅': 0.53, '成交额': 4200.0},
+        '创业板指': {'最新价': 2010.45, '涨跌幅': -1.25, '成交额': 2100.0},
+    },
+    '市场统计': {'上涨家数': 2510, '下跌家数': 2456, '涨停家数': 68, '封板率': '62.8%'},
+    '板块数据': {
+        '领涨板块': [{'板块名称': '半导体', '涨跌幅': 3.21}],
+        '领跌板块': [{'板块名称': '煤炭', '涨跌幅': -2.10}],
+    },
+}
+
+
+def _verify(report):
+    return ReportVerifier(MARKET_DATA).verify(report)
+
+
+def test_index_and_sector_lines():
+    """涨跌统计关键词不会取代行内的指数、板块名称"""
+    result = _verify("上证指数上涨0.53%，收于3050.12点。\n半导体板块领涨，上涨3.21%。")
+    assert result['checked'] == 3
+    assert result['issues'] == []
+
+
+def test_breadth_counts():
+    """涨跌统计关键词只校验以“家”为单位的整数"""
+    result = _verify("上涨2510家，下跌2456家，涨停68家，封板率62.8%。")
+    assert result['checked'] == 4
+    assert result['issues'] == []
+    
+    result = _verify("上证指数上涨0.53%，上涨2600家。")
+    assert [issue['value'] for issue in result['issues']] == ['2600家']
+
+
+def test_signed_values():
+    """方向词或符号与真实数据相反时报错"""
+    assert _verify("创业板指下跌1.25%，煤炭板块领跌，下跌2.10%。")['issues'] == []
+    assert _verify("创业板指-1.25%，半导体+3.21%。")['issues'] == []
+    
+    result = _verify("上证指数下跌0.53%。\n创业板指上涨1.25%。\n半导体板块-3.21%。")
+    assert [issue['line'] for issue in result['issues']] == [1, 2, 3]
+
+
+def test_unsigned_values_and_levels():
+    """没有方向词的数值正负均可；“跌破”“涨至”后的点位不计方向"""
+    assert _verify("创业板指涨跌幅1.25%，盘中跌破3000点后回升至2010.45点。")['issues'] == []
+
+
+def test_turnover():
+    """成交额可以是两市合计，也可以是单个指数的成交额"""
+    assert _verify("两市成交额6300.00亿元，创业板成交额2100.00亿元，约0.63万亿元。")['issues'] == []
+    
+    result = _verify("创业板成交额2000.00亿元。")
+    assert [issue['value'] for issue in result['issues']] == ['2000.00亿']
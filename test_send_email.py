@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量发送测试（本地最小 SMTP 服务，不连接外部邮件服务器）
+运行: python -m pytest test_send_email.py
+"""
+
+import base64
+import socketserver
+import threading
+
+import pytest
+
+from send_email import EmailSender
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """最小 SMTP 会话：AUTH PLAIN、按收件人拒收、按已接收封数断开连接"""
+    
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+    
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self._reply("220 localhost ESMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode('utf-8').rstrip('\r\n')
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self.wfile.write(b"250-localhost\r\n250 AUTH PLAIN\r\n")
+            elif command == 'AUTH':
+                credentials = base64.b64decode(line.split()[-1]).split(b'\0')
+                if credentials[2].decode('utf-8') == server.password:
+                    self._reply("235 2.7.0 Authentication successful")
+                else:
+                    self._reply("535 5.7.8 Authentication credentials invalid")
+            elif command == 'MAIL':
+                recipients = []
+                self._reply("250 OK")
+            elif command == 'RCPT':
+                recipient = line.split(':', 1)[1].strip().strip('<>')
+                if recipient in server.refused:
+                    self._reply("550 5.1.1 No such user")
+                else:
+                    recipients.append(recipient)
+                    self._reply("250 OK")
+            elif command == 'DATA':
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk == b".\r\n":
+                        break
+                    data.append(chunk)
+                with server.lock:
+                    server.messages.append((recipients, b"".join(data)))
+                    drop = len(server.messages) in server.drop_after
+                self._reply("250 OK: queued")
+                if drop:
+                    return
+            elif command == 'RSET':
+                recipients = []
+                self._reply("250 OK")
+            elif command == 'QUIT':
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.messages = []
+    server.refused = set()
+    server.drop_after = set()
+    server.password = 'secret'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def report(tmp_path):
+    path = tmp_path / 'report.md'
+    path.write_text("# A股复盘\n\n上证指数上涨0.53%。", encoding='utf-8')
+    return str(path)
+
+
+def _sender(server, password='secret'):
+    return EmailSender(
+        smtp_server='127.0.0.1', smtp_port=server.server_address[1],
+        sender_email='bot@example.com', sender_password=password, use_tls=False
+    )
+
+
+def test_one_envelope_per_recipient(smtp_server, report):
+    """每个收件人单独一封邮件，共用一个 SMTP 连接"""
+    recipients = ['a@example.com', 'b@example.com', 'c@example.com']
+    result = _sender(smtp_server).send_report_batch(recipients, report, "复盘")
+    
+    assert result['sent'] == recipients
+    assert result['failed'] == {}
+    assert smtp_server.connections == 1
+    assert [envelope for envelope, _ in smtp_server.messages] == [[r] for r in recipients]
+    for recipient, (_, data) in zip(recipients, smtp_server.messages):
+        headers = data.split(b"\r\n\r\n", 1)[0].split(b"\r\n")
+        assert [h for h in headers if h.startswith(b"To: ")] == [f"To: {recipient}".encode('utf-8')]
+        assert sum(h.startswith(b"Message-ID: ") for h in headers) == 1
+    message_ids = {data.split(b"Message-ID: ", 1)[1].split(b"\r\n", 1)[0] for _, data in smtp_server.messages}
+    assert len(message_ids) == len(recipients)
+
+
+def test_reconnects_after_disconnect(smtp_server, report):
+    """服务器断开连接后重连，继续发送剩余收件人"""
+    smtp_server.drop_after = {1}
+    recipients = ['a@example.com', 'b@example.com']
+    result = _sender(smtp_server).send_report_batch(recipients, report, "复盘")
+    
+    assert result['sent'] == recipients
+    assert smtp_server.connections == 2
+    assert len(smtp_server.messages) == 2
+
+
+def test_refused_recipient_does_not_stop_batch(smtp_server, report):
+    """被拒收的收件人单独记录失败，其余收件人照常发送"""
+    smtp_server.refused = {'nobody@example.com'}
+    recipients = ['a@example.com', 'nobody@example.com', 'b@example.com']
+    result = _sender(smtp_server).send_report_batch(recipients, report, "复盘")
+    
+    assert result['sent'] == ['a@example.com', 'b@example.com']
+    assert list(result['failed']) == ['nobody@example.com']
+    assert '550' in result['failed']['nobody@example.com']
+    assert smtp_server.connections == 1
+
+
+def test_auth_failure_fails_all_recipients(smtp_server, report):
+    """认证失败时所有收件人都记录为失败，不逐个重试"""
+    recipients = ['a@example.com', 'b@example.com']
+    result = _sender(smtp_server, password='wrong').send_report_batch(recipients, report, "复盘")
+    
+    assert result['sent'] == []
+    assert set(result['failed']) == set(recipients)
+    assert all('认证失败' in error for error in result['failed'].values())
+    assert smtp_server.connections == 1
+    assert smtp_server.messages == []